@@ -122,7 +122,7 @@ class AssistantEngine:
         # Build system prompt with emotion context
         base_prompt = self.personality.get_system_prompt()
         enhanced_prompt = self.emotion_aware.enhance_prompt_with_emotion(
-            base_prompt, emotion_data, user_message
+            base_prompt, emotion_data, user_message, self.personality.personality_type.value
         )
         
         # Get conversation context
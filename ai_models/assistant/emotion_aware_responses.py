@@ -6,6 +6,8 @@ Adjusts assistant responses based on detected emotional state
 from typing import Dict, Optional, List
 from enum import Enum
 
+from .response_catalogue import DEFAULT_PERSONALITY, ResponseCatalogue, get_catalogue
+
 class EmotionCategory(Enum):
     """Emotion categories"""
     POSITIVE = "positive"
@@ -43,32 +45,26 @@ class EmotionAwareResponses:
         "don't want to live", "better off dead"
     ]
     
-    def __init__(self):
-        self.emotion_context_templates = self._init_templates()
+    def __init__(self, catalogue: Optional[ResponseCatalogue] = None):
+        # Templates, guidance and safety copy live in the reloadable catalogue
+        self.catalogue = catalogue or get_catalogue()
+    
+    @property
+    def emotion_context_templates(self) -> Dict:
+        """Emotion-specific response templates of the live catalogue version"""
+        templates = self.catalogue.current.sections[DEFAULT_PERSONALITY]["templates"]
+        return {category: templates.get(category.value, {}) for category in EmotionCategory}
+    
+    def get_templates(self, emotion: str, score: float = 0.5,
+                      personality: str = DEFAULT_PERSONALITY) -> Dict[str, str]:
+        """Templates for this emotion, already rendered"""
+        return self._entry(emotion, score, personality).templates
     
-    def _init_templates(self) -> Dict:
-        """Initialize emotion-specific response templates"""
-        return {
-            EmotionCategory.POSITIVE: {
-                "acknowledgment": "I'm glad to hear you're feeling {emotion}!",
-                "follow_up": "What's contributing to these positive feelings?",
-                "reinforcement": "It's wonderful that you're experiencing {emotion}. Let's explore what's working well for you."
-            },
-            EmotionCategory.NEGATIVE: {
-                "acknowledgment": "I understand you're feeling {emotion}. That must be difficult.",
-                "validation": "It's completely okay to feel {emotion}. Your feelings are valid.",
-                "support": "I'm here to help you through this {emotion}. Would you like to talk about what's causing it?"
-            },
-            EmotionCategory.NEUTRAL: {
-                "acknowledgment": "I'm here to listen and support you.",
-                "engagement": "How are things going for you today?"
-            },
-            EmotionCategory.CRISIS: {
-                "immediate": "I'm really concerned about what you're sharing. Your safety is the top priority.",
-                "resource": "Please reach out to a crisis helpline immediately: National Suicide Prevention Lifeline: 988 or 1-800-273-8255",
-                "urgent": "If you're in immediate danger, please call 911 or go to your nearest emergency room."
-            }
-        }
+    def _entry(self, emotion: str, score: float, personality: str):
+        category = self.get_emotion_category(emotion, score)
+        # The catalogue renders crisis copy for the high risk level
+        risk_level = "high" if category == EmotionCategory.CRISIS else "low"
+        return self.catalogue.lookup(emotion, risk_level, personality)
     
     def detect_crisis(self, text: str) -> bool:
         """Detect if text contains crisis indicators"""
@@ -83,12 +79,13 @@ class EmotionAwareResponses:
         
         return self.EMOTION_CATEGORIES.get(emotion.lower(), EmotionCategory.NEUTRAL)
     
-    def create_emotion_context(self, emotion_data: Dict) -> str:
+    def create_emotion_context(self, emotion_data: Dict, personality: str = DEFAULT_PERSONALITY) -> str:
         """
         Create context string for LLM based on detected emotion
         
         Args:
             emotion_data: {emotion, score, confidence, stress_level, etc.}
+            personality: PersonalityType value selecting catalogue overrides
         
         Returns:
             Context string to prepend to system prompt
@@ -108,33 +105,8 @@ CURRENT USER EMOTIONAL STATE:
 RESPONSE GUIDANCE:
 """
         
-        if category == EmotionCategory.CRISIS:
-            context += """
-- CRISIS DETECTED: Prioritize immediate safety
-- Provide crisis resources
-- Encourage professional help
-- Be supportive but directive
-"""
-        elif category == EmotionCategory.NEGATIVE:
-            context += """
-- Validate their feelings
-- Show empathy and understanding
-- Offer support and coping strategies
-- Ask open-ended questions to explore
-"""
-        elif category == EmotionCategory.POSITIVE:
-            context += """
-- Celebrate their positive state
-- Explore what's working well
-- Reinforce healthy behaviors
-- Build on strengths
-"""
-        else:
-            context += """
-- Maintain supportive presence
-- Encourage open communication
-- Assess needs
-"""
+        # Guidance is pre-rendered per (emotion, risk, personality)
+        context += "\n" + self._entry(emotion, score, personality).guidance
         
         return context
     
@@ -143,30 +115,20 @@ RESPONSE GUIDANCE:
         if not crisis_detected:
             return None
         
-        return """I'm very concerned about what you're sharing, and I want you to know that your safety is the most important thing right now.
-
-Please reach out to one of these resources immediately:
-
-🆘 **Crisis Resources:**
-- National Suicide Prevention Lifeline: **988** or **1-800-273-8255** (24/7)
-- Crisis Text Line: Text **HOME** to **741741**
-- International: findahelpline.com
-
-If you're in immediate danger, please call **911** or go to your nearest emergency room.
-
-You don't have to go through this alone. These trained professionals are ready to help you right now. Would you like to talk about reaching out to them?"""
+        return self.catalogue.safety_response()
     
     def enhance_prompt_with_emotion(
         self,
         base_prompt: str,
         emotion_data: Optional[Dict] = None,
-        user_message: Optional[str] = None
+        user_message: Optional[str] = None,
+        personality: str = DEFAULT_PERSONALITY
     ) -> str:
         """Enhance system prompt with emotional context"""
         if not emotion_data:
             return base_prompt
         
-        emotion_context = self.create_emotion_context(emotion_data)
+        emotion_context = self.create_emotion_context(emotion_data, personality)
         
         # Check for crisis in user message
         if user_message and self.detect_crisis(user_message):
@@ -0,0 +1,209 @@
+"""
+Response Catalogue
+Response templates and recommendations compiled once per version and served by key lookup
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .personality import PersonalityType
+
+RISK_LEVELS = ("low", "medium", "high")
+DEFAULT_PERSONALITY = PersonalityType.EMPATHETIC.value
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "response_catalogue.json")
+
+
+class ResponseEntry(NamedTuple):
+    """Everything pre-rendered for one (emotion, risk level, personality) key"""
+    emotion: str
+    risk_level: str
+    personality: str
+    category: str
+    templates: Dict[str, str]
+    guidance: str
+    recommendations: Tuple[str, ...]
+
+
+def _merge(base: Dict, override: Dict) -> Dict:
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class CompiledCatalogue:
+    """
+    One immutable version of the catalogue
+
+    Every known emotion x risk level x personality is rendered up front
+    (``{emotion}`` substituted, guidance joined, recommendation lists
+    concatenated) and the strings are interned, so a lookup is a single dict
+    access returning shared objects.
+    """
+
+    def __init__(self, data: Dict):
+        self.version = str(data.get("version", "0"))
+        # Identifies the content itself (the same on every worker), for keying rendered results
+        self.fingerprint = hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self.personalities = [p.value for p in PersonalityType]
+        self.sections = {
+            personality: _merge(data, data.get("personality_overrides", {}).get(personality, {}))
+            for personality in self.personalities
+        }
+        self.entries: Dict[Tuple[str, str, str], ResponseEntry] = {}
+        for personality, section in self.sections.items():
+            for emotion in section["emotion_categories"]:
+                for risk_level in RISK_LEVELS:
+                    self.entries[(emotion, risk_level, personality)] = self._compile(emotion, risk_level, personality)
+
+    def _compile(self, emotion: str, risk_level: str, personality: str) -> ResponseEntry:
+        section = self.sections[personality]
+        # High risk always gets crisis guidance, whatever the emotion
+        category = "crisis" if risk_level == "high" else section["emotion_categories"].get(emotion, "neutral")
+        templates = {
+            name: sys.intern(template.format(emotion=emotion))
+            for name, template in section["templates"].get(category, {}).items()
+        }
+        guidance = sys.intern("".join(f"- {line}\n" for line in section["guidance"].get(category, [])))
+        recommendations = section["recommendations"]
+        return ResponseEntry(
+            emotion=sys.intern(emotion),
+            risk_level=risk_level,
+            personality=personality,
+            category=category,
+            templates=templates,
+            guidance=guidance,
+            recommendations=tuple(sys.intern(text) for text in (
+                recommendations["risk"].get(risk_level, recommendations["risk"]["low"])
+                + recommendations["emotion"].get(emotion, [])
+            ))
+        )
+
+    def lookup(self, emotion: str, risk_level: str = "low", personality: str = DEFAULT_PERSONALITY) -> ResponseEntry:
+        emotion = (emotion or "neutral").lower()
+        if risk_level not in RISK_LEVELS:
+            risk_level = "low"
+        if personality not in self.sections:
+            personality = DEFAULT_PERSONALITY
+        entry = self.entries.get((emotion, risk_level, personality))
+        if entry is None:
+            # Emotion outside the catalogue: render on demand, not cached
+            entry = self._compile(emotion, risk_level, personality)
+        return entry
+
+    def rag_response(self, key: str, personality: str = DEFAULT_PERSONALITY) -> Optional[str]:
+        section = self.sections.get(personality, self.sections[DEFAULT_PERSONALITY])
+        return section["rag_responses"].get(key)
+
+    def safety_response(self, personality: str = DEFAULT_PERSONALITY) -> str:
+        section = self.sections.get(personality, self.sections[DEFAULT_PERSONALITY])
+        return section["safety_response"]
+
+
+class ResponseCatalogue:
+    """
+    Hot-reloadable response catalogue backed by a JSON file
+
+    The file's mtime is checked at most every ``check_interval`` seconds on
+    lookup; when it changed, the new version is compiled off to the side and
+    swapped in with one assignment, so readers never see a half-built
+    catalogue. A file that fails to parse is reported and the previous
+    version keeps serving.
+
+    Usage:
+        catalogue = get_catalogue()
+        entry = catalogue.lookup("sadness", "medium", "gentle")
+        entry.recommendations, entry.guidance, entry.templates["validation"]
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self._compiled = self._load()
+        self._next_check = time.monotonic() + check_interval
+
+    @classmethod
+    def from_env(cls) -> "ResponseCatalogue":
+        return cls(
+            path=os.getenv("RESPONSE_CATALOGUE_PATH") or DEFAULT_PATH,
+            check_interval=float(os.getenv("RESPONSE_CATALOGUE_CHECK_SECONDS", "2"))
+        )
+
+    def _file_stamp(self) -> Tuple[float, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime, stat.st_size
+
+    def _load(self) -> CompiledCatalogue:
+        with open(self.path, encoding="utf-8") as f:
+            return CompiledCatalogue(json.load(f))
+
+    def reload_if_changed(self) -> bool:
+        """Recompile if the file changed since the last load; True if a new version is live"""
+        if not self._reload_lock.acquire(blocking=False):
+            return False  # another thread is already reloading
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                stamp = self._file_stamp()
+                if stamp == self._stamp:
+                    return False
+                compiled = self._load()
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"[CATALOGUE] Keeping version {self._compiled.version}; reload of {self.path} failed: {e}")
+                return False
+            self._compiled, self._stamp = compiled, stamp
+            print(f"[CATALOGUE] Loaded response catalogue version {compiled.version}")
+            return True
+        finally:
+            self._reload_lock.release()
+
+    @property
+    def current(self) -> CompiledCatalogue:
+        if self.check_interval >= 0 and time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._compiled
+
+    @property
+    def version(self) -> str:
+        return self.current.version
+
+    @property
+    def fingerprint(self) -> str:
+        return self.current.fingerprint
+
+    def lookup(self, emotion: str, risk_level: str = "low", personality: str = DEFAULT_PERSONALITY) -> ResponseEntry:
+        return self.current.lookup(emotion, risk_level, personality)
+
+    def recommendations(self, emotion: str, risk_level: str = "low",
+                        personality: str = DEFAULT_PERSONALITY) -> List[str]:
+        return list(self.lookup(emotion, risk_level, personality).recommendations)
+
+    def rag_response(self, key: str, personality: str = DEFAULT_PERSONALITY) -> Optional[str]:
+        return self.current.rag_response(key, personality)
+
+    def safety_response(self, personality: str = DEFAULT_PERSONALITY) -> str:
+        return self.current.safety_response(personality)
+
+
+_catalogue: Optional[ResponseCatalogue] = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue() -> ResponseCatalogue:
+    """The process-wide catalogue, loaded on first use"""
+    global _catalogue
+    if _catalogue is None:
+        with _catalogue_lock:
+            if _catalogue is None:
+                _catalogue = ResponseCatalogue.from_env()
+    return _catalogue
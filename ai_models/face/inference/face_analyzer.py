@@ -8,10 +8,23 @@ sys.path.append(parent_dir)
 
 try:
     from model.emotion_cnn import EmotionCNN
+    from model.face_tracking import FaceTracker
 except ImportError:
     # Fallback if relative import fails (e.g. running from different dir)
     sys.path.append(os.path.dirname(parent_dir))
     from face.model.emotion_cnn import EmotionCNN
+    from face.model.face_tracking import FaceTracker
+
+# Face score (0-1 scale, higher = more positive emotion)
+EMOTION_SCORES = {
+    'Happy': 1.0,
+    'Surprise': 0.8,
+    'Neutral': 0.5,
+    'Sad': 0.3,
+    'Fear': 0.2,
+    'Angry': 0.1,
+    'Disgust': 0.1
+}
 
 class FaceAnalyzer:
     def __init__(self, model_path=None):
@@ -27,21 +40,52 @@ class FaceAnalyzer:
         """
         emotion_label, confidence, _ = self.cnn.predict_emotion(image_data)
         
-        # Calculate face score (0-1 scale, higher = more positive emotion)
-        emotion_scores = {
-            'Happy': 1.0,
-            'Surprise': 0.8,
-            'Neutral': 0.5,
-            'Sad': 0.3,
-            'Fear': 0.2,
-            'Angry': 0.1,
-            'Disgust': 0.1
-        }
-        
-        face_score = emotion_scores.get(emotion_label, 0.5)
+        face_score = EMOTION_SCORES.get(emotion_label, 0.5)
         
         return emotion_label, face_score, confidence
 
+    def analyze_faces(self, images, trackers=None):
+        """
+        Analyze every face in many images with one batched model call
+        Args:
+            images: list of image file bytes
+            trackers: optional FaceTracker (or None) per image, for video frames
+        Returns:
+            one list per image of {"box", "emotion", "face_score", "confidence", "probabilities"}
+        """
+        results = self.cnn.predict_batch(images, trackers=trackers)
+        for faces in results:
+            for face in faces:
+                face["face_score"] = EMOTION_SCORES.get(face["emotion"], 0.5)
+        return results
+
+    def analyze_batch(self, images):
+        """
+        Batched analyze_emotion: one (emotion_label, face_score, confidence)
+        per image, from its first detected face
+        """
+        results = []
+        for faces in self.analyze_faces(images):
+            if faces:
+                results.append((faces[0]["emotion"], faces[0]["face_score"], faces[0]["confidence"]))
+            else:
+                results.append(("Neutral", 0.5, 0.5))
+        return results
+
+    def new_tracker(self):
+        """Face tracker for one video stream (FACE_STREAM_* settings)"""
+        return FaceTracker.from_env()
+
+    def analyze_stream(self, frames):
+        """
+        Batched analyze_faces for video frames
+        Args:
+            frames: list of (image file bytes, FaceTracker of the frame's stream)
+        """
+        images = [image for image, _ in frames]
+        trackers = [tracker for _, tracker in frames]
+        return self.analyze_faces(images, trackers=trackers)
+
     def analyze_micro_expressions(self, image_data):
         """
         Analyze micro-expressions from image data (Phase 4 placeholder)
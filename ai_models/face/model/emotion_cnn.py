@@ -7,6 +7,9 @@ import cv2
 import numpy as np
 import os
 
+from .face_detection import DetectionConfig, detect_faces
+from .inference_engine import engine_from_env
+
 # Try importing tensorflow/keras, handle if missing
 try:
     from tensorflow import keras
@@ -19,25 +22,34 @@ except ImportError:
     HAS_TF = False
 
 class EmotionCNN:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, detection_config=None):
         """
         Initialize the CNN model for emotion detection
         """
         self.img_size = (48, 48)
+        self.detection_config = detection_config or DetectionConfig.from_env()
         self.emotions = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
         self.model = None
+        self.engine = None
         self.face_cascade = None
         
-        if not HAS_TF:
+        if HAS_TF:
+            try:
+                if model_path and os.path.exists(model_path):
+                    self.model = load_model(model_path)
+                else:
+                    # Build new model (random weights)
+                    self.model = self._build_model()
+            except Exception as e:
+                print(f"Error initializing EmotionCNN: {e}")
+        
+        # Compiled inference path (FACE_INFERENCE_ENGINE); an exported
+        # TFLite/ONNX/NumPy model also works without TensorFlow
+        self.engine = engine_from_env(self.model)
+        if self.engine is None:
             return
-
+        
         try:
-            if model_path and os.path.exists(model_path):
-                self.model = load_model(model_path)
-            else:
-                # Build new model (random weights)
-                self.model = self._build_model()
-            
             # Load face cascade for detection
             cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
             self.face_cascade = cv2.CascadeClassifier(cascade_path)
@@ -96,75 +108,141 @@ class EmotionCNN:
         
         return model
     
+    @staticmethod
+    def decode_gray(image_data):
+        """
+        Decode encoded image bytes (bytes, bytearray or memoryview) straight
+        to an 8-bit grayscale frame. The buffer is wrapped without copying and
+        decoded with IMREAD_GRAYSCALE, so no BGR frame is ever materialized.
+        A 2-D uint8 array is taken as an already decoded frame.
+        """
+        if isinstance(image_data, np.ndarray) and image_data.ndim == 2:
+            return image_data
+        gray = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("Could not decode image")
+        return gray
+    
     def detect_faces(self, image_data):
         """
         Detect faces in the image
+        
+        The cascade runs on a copy bounded by ``detection_config.max_side``;
+        boxes are returned in the coordinates of the full-resolution frame,
+        which is returned alongside them so crops keep the original detail.
         """
         if self.face_cascade is None:
             return [], None
 
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(30, 30)
-        )
+        gray = self.decode_gray(image_data)
+        faces = detect_faces(self.face_cascade, gray, self.detection_config)
         
         return faces, gray
     
+    def track_faces(self, image_data, tracker):
+        """
+        Faces in one frame of a stream: detected when ``tracker`` asks for it
+        (every few frames, or after losing a face) and template-tracked otherwise
+        Returns: (boxes, track_ids, gray)
+        """
+        gray = self.decode_gray(image_data)
+        if tracker.needs_detection(gray):
+            faces, _ = self.detect_faces(gray)
+            tracks = tracker.update(gray, faces)
+        else:
+            tracks = tracker.track(gray)
+        return [track.box for track in tracks], [track.track_id for track in tracks], gray
+    
+    def preprocess_faces(self, face_rois):
+        """
+        Preprocess face ROIs into one model input batch of shape (N, 48, 48, 1)
+        """
+        batch = np.empty((len(face_rois), self.img_size[1], self.img_size[0], 1), dtype=np.float32)
+        for i, face_roi in enumerate(face_rois):
+            # Resize to model input size and normalize pixel values; crops from
+            # large frames are area-averaged rather than point-sampled
+            shrink = face_roi.shape[0] > self.img_size[1] or face_roi.shape[1] > self.img_size[0]
+            interpolation = cv2.INTER_AREA if shrink else cv2.INTER_LINEAR
+            batch[i, :, :, 0] = cv2.resize(face_roi, self.img_size, interpolation=interpolation).astype('float32') / 255.0
+        return batch
+    
     def preprocess_face(self, face_roi):
         """
         Preprocess face ROI for model input
         """
-        # Resize to model input size
-        face_roi = cv2.resize(face_roi, self.img_size)
+        return self.preprocess_faces([face_roi])
+    
+    def predict_batch(self, images, batch_size=None, trackers=None):
+        """
+        Predict the emotion of every face in every image with a single model call
         
-        # Normalize pixel values
-        face_roi = face_roi.astype('float32') / 255.0
+        Faces are detected per image, all crops are stacked into one tensor and
+        classified together (``batch_size`` crops per engine call, 256 by
+        default), so the per-call overhead of the model is paid once rather
+        than once per face. With ``trackers`` (one FaceTracker or None per
+        image) video frames are located by ``track_faces`` instead, and each
+        face also carries its "track_id".
+        Returns: one list per image of
+            {"box": [x, y, w, h], "emotion", "confidence", "probabilities"}
+        (empty when no face was found or the image could not be decoded)
+        """
+        results = [[] for _ in images]
+        if self.engine is None or not images:
+            return results
         
-        # Reshape for model input
-        face_roi = np.expand_dims(face_roi, axis=0)
-        face_roi = np.expand_dims(face_roi, axis=-1)
+        crops, owners = [], []
+        for i, image_data in enumerate(images):
+            tracker = trackers[i] if trackers else None
+            try:
+                if tracker is None:
+                    faces, gray = self.detect_faces(image_data)
+                    track_ids = [None] * len(faces)
+                else:
+                    faces, track_ids, gray = self.track_faces(image_data, tracker)
+            except Exception as e:
+                print(f"Error detecting faces in image {i}: {str(e)}")
+                continue
+            for (x, y, w, h), track_id in zip(faces, track_ids):
+                crops.append(gray[y:y+h, x:x+w])
+                owners.append((i, [int(x), int(y), int(w), int(h)], track_id))
+        if not crops:
+            return results
         
-        return face_roi
+        batch = self.preprocess_faces(crops)
+        batch_size = batch_size or 256
+        predictions = np.concatenate([
+            self.engine.predict(batch[start:start + batch_size]) for start in range(0, len(batch), batch_size)
+        ])
+        for (i, box, track_id), probabilities in zip(owners, predictions):
+            emotion_idx = int(np.argmax(probabilities))
+            face = {
+                "box": box,
+                "emotion": self.emotions[emotion_idx],
+                "confidence": float(probabilities[emotion_idx]),
+                "probabilities": probabilities.tolist()
+            }
+            if track_id is not None:
+                face["track_id"] = track_id
+            results[i].append(face)
+        return results
     
     def predict_emotion(self, image_data):
         """
         Predict emotion from image
         Returns: (emotion_label, confidence, all_probabilities)
         """
-        if not HAS_TF or self.model is None:
+        if self.engine is None:
             return "Neutral", 0.5, [0.14] * 7
 
         try:
-            # Detect faces
-            faces, gray = self.detect_faces(image_data)
+            faces = self.predict_batch([image_data])[0]
             
             if len(faces) == 0:
                 return "Neutral", 0.5, [0.14] * 7  # Default if no face detected
             
             # Use the first detected face
-            (x, y, w, h) = faces[0]
-            face_roi = gray[y:y+h, x:x+w]
-            
-            # Preprocess
-            face_input = self.preprocess_face(face_roi)
-            
-            # Predict
-            predictions = self.model.predict(face_input, verbose=0)[0]
-            
-            # Get emotion with highest probability
-            emotion_idx = np.argmax(predictions)
-            emotion_label = self.emotions[emotion_idx]
-            confidence = float(predictions[emotion_idx])
-            
-            return emotion_label, confidence, predictions.tolist()
+            face = faces[0]
+            return face["emotion"], face["confidence"], face["probabilities"]
             
         except Exception as e:
             print(f"Error in emotion prediction: {str(e)}")
@@ -0,0 +1,91 @@
+"""
+Face Detection on a Bounded Working Resolution
+Haar cascade detection on a downscaled frame, with boxes mapped back to the original
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+
+class DetectionConfig:
+    """
+    Cascade parameters for one deployment
+
+    ``max_side`` bounds the longer side of the frame the cascade runs on
+    (0 disables downscaling). ``min_size`` and ``max_size`` are face sizes
+    in pixels of the original frame; ``max_size`` of 0 means unbounded.
+    A 12MP phone frame is shrunk about 6x per side at the default 640, so
+    the cascade scans ~36x fewer pixels at every pyramid level; faces that
+    fill a meaningful part of the frame are still far above the cascade's
+    24px window.
+    """
+
+    def __init__(self, max_side: int = 640, scale_factor: float = 1.1, min_neighbors: int = 5,
+                 min_size: int = 30, max_size: int = 0):
+        if scale_factor <= 1.0:
+            raise ValueError("scale_factor must be greater than 1")
+        self.max_side = max_side
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.max_size = max_size
+
+    @classmethod
+    def from_env(cls) -> "DetectionConfig":
+        return cls(
+            max_side=int(os.getenv("FACE_DETECT_MAX_SIDE", "640")),
+            scale_factor=float(os.getenv("FACE_DETECT_SCALE_FACTOR", "1.1")),
+            min_neighbors=int(os.getenv("FACE_DETECT_MIN_NEIGHBORS", "5")),
+            min_size=int(os.getenv("FACE_DETECT_MIN_SIZE", "30")),
+            max_size=int(os.getenv("FACE_DETECT_MAX_SIZE", "0"))
+        )
+
+
+def downscale(gray, max_side):
+    """
+    Shrink ``gray`` so its longer side is at most ``max_side``
+    Returns: (working_frame, scale) with scale = working / original (1.0 when untouched)
+    """
+    height, width = gray.shape[:2]
+    longest = max(height, width)
+    if not max_side or longest <= max_side:
+        return gray, 1.0
+    scale = max_side / float(longest)
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    # INTER_AREA averages every source pixel, so fine detail is not aliased away
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA), scale
+
+
+def map_boxes(boxes, scale, shape):
+    """Map (x, y, w, h) boxes found at ``scale`` back onto a frame of ``shape``, clipped to its bounds"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if scale != 1.0:
+        boxes = boxes / scale
+    height, width = shape[:2]
+    x0 = np.clip(np.floor(boxes[:, 0]), 0, width)
+    y0 = np.clip(np.floor(boxes[:, 1]), 0, height)
+    x1 = np.clip(np.ceil(boxes[:, 0] + boxes[:, 2]), 0, width)
+    y1 = np.clip(np.ceil(boxes[:, 1] + boxes[:, 3]), 0, height)
+    mapped = np.stack([x0, y0, x1 - x0, y1 - y0], axis=1).astype(np.int32)
+    return mapped[(mapped[:, 2] > 0) & (mapped[:, 3] > 0)]
+
+
+def detect_faces(cascade, gray, config=None):
+    """
+    Run ``cascade`` on a downscaled copy of ``gray``
+    Returns: int32 array of (x, y, w, h) boxes in original-frame coordinates
+    """
+    config = config or DetectionConfig()
+    working, scale = downscale(gray, config.max_side)
+    min_side = max(1, int(round(config.min_size * scale)))
+    max_side = int(round(config.max_size * scale)) if config.max_size else 0
+    faces = cascade.detectMultiScale(
+        working,
+        scaleFactor=config.scale_factor,
+        minNeighbors=config.min_neighbors,
+        minSize=(min_side, min_side),
+        maxSize=(max_side, max_side)
+    )
+    return map_boxes(faces, scale, gray.shape)
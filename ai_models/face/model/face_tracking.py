@@ -0,0 +1,129 @@
+"""
+Face Tracking Between Detections
+Template matching that carries face boxes across the frames of a video stream
+"""
+
+import itertools
+import os
+
+import cv2
+import numpy as np
+
+from .face_detection import downscale, map_boxes
+
+
+class Track:
+    """One face followed across frames: a stable id, its box in frame coordinates and its template"""
+
+    def __init__(self, track_id, box, template):
+        self.track_id = track_id
+        self.box = box
+        self.template = template
+
+
+def _iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTracker:
+    """
+    Face boxes of one stream, re-detected every ``detect_every`` frames
+
+    Between detections each face is found by normalized cross-correlation
+    of the template cut at its last detection, searched in a window of
+    ``search_margin`` template sizes around its previous position, on a copy
+    of the frame bounded by ``max_side``. That is a few small
+    ``matchTemplate`` calls instead of a cascade pyramid over the frame. A
+    face whose best match scores below ``min_score`` is dropped and forces a
+    detection on the next frame, as does a change of frame size. Detected
+    faces keep the id of the previous track they overlap (IoU of at least
+    ``match_iou``), so per-face smoothing survives re-detection.
+
+    Not thread-safe: a stream submits one frame at a time.
+    """
+
+    def __init__(self, detect_every: int = 5, max_side: int = 320, search_margin: float = 0.5,
+                 min_score: float = 0.5, match_iou: float = 0.3):
+        self.detect_every = max(1, detect_every)
+        self.max_side = max_side
+        self.search_margin = search_margin
+        self.min_score = min_score
+        self.match_iou = match_iou
+        self.tracks = []
+        self.last_detected = False
+        self._shape = None
+        self._since_detection = 0
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_env(cls) -> "FaceTracker":
+        return cls(
+            detect_every=int(os.getenv("FACE_STREAM_DETECT_EVERY", "5")),
+            max_side=int(os.getenv("FACE_STREAM_TRACK_MAX_SIDE", "320")),
+            min_score=float(os.getenv("FACE_STREAM_TRACK_MIN_SCORE", "0.5"))
+        )
+
+    def needs_detection(self, gray) -> bool:
+        return (
+            not self.tracks
+            or self._since_detection >= self.detect_every
+            or gray.shape != self._shape
+        )
+
+    def update(self, gray, boxes):
+        """Replace the tracks with freshly detected ``boxes`` (frame coordinates)"""
+        small, scale = downscale(gray, self.max_side)
+        previous = list(self.tracks)
+        tracks = []
+        for box in boxes:
+            box = [int(v) for v in box]
+            overlaps = [_iou(box, track.box) for track in previous]
+            best = int(np.argmax(overlaps)) if overlaps else -1
+            if best >= 0 and overlaps[best] >= self.match_iou:
+                track_id = previous.pop(best).track_id
+            else:
+                track_id = next(self._ids)
+            x, y, w, h = (int(round(v * scale)) for v in box)
+            template = small[y:y + h, x:x + w].copy()
+            if template.shape[0] >= 2 and template.shape[1] >= 2:
+                tracks.append(Track(track_id, box, template))
+        self.tracks = tracks
+        self.last_detected = True
+        self._shape = gray.shape
+        # Frames located since the last detection, counting that one
+        self._since_detection = 1
+        return tracks
+
+    def track(self, gray):
+        """Move every track to its best template match in ``gray``; returns the tracks still held"""
+        small, scale = downscale(gray, self.max_side)
+        height, width = small.shape[:2]
+        kept = []
+        for track in self.tracks:
+            th, tw = track.template.shape[:2]
+            x, y = int(round(track.box[0] * scale)), int(round(track.box[1] * scale))
+            mx, my = int(tw * self.search_margin) + 1, int(th * self.search_margin) + 1
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(width, x + tw + mx), min(height, y + th + my)
+            window = small[y0:y1, x0:x1]
+            if window.shape[0] < th or window.shape[1] < tw:
+                continue
+            result = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (px, py) = cv2.minMaxLoc(result)
+            if score < self.min_score:
+                continue
+            mapped = map_boxes([[x0 + px, y0 + py, tw, th]], scale, gray.shape)
+            if len(mapped):
+                track.box = [int(v) for v in mapped[0]]
+                kept.append(track)
+        self._since_detection += 1
+        if len(kept) < len(self.tracks):
+            # A face was lost: look for it again on the next frame
+            self._since_detection = self.detect_every
+        self.tracks = kept
+        self.last_detected = False
+        return kept
@@ -0,0 +1,305 @@
+"""
+Inference Engines for the Face Emotion CNN
+Interchangeable runtimes for a preprocessed (N, 48, 48, 1) batch -> (N, 7) probabilities
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ENGINES = ("keras", "keras-predict", "tflite", "onnx", "numpy")
+
+
+class InferenceEngine:
+    """
+    Runs the emotion model on a batch of preprocessed faces
+
+    Every engine takes float32 input of shape (N, 48, 48, 1) scaled to
+    [0, 1] and returns float32 probabilities of shape (N, 7), so they can be
+    swapped without touching detection or preprocessing.
+    """
+
+    name = "base"
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class KerasPredictEngine(InferenceEngine):
+    """``model.predict``: builds a tf.data pipeline on every call (the baseline)"""
+
+    name = "keras-predict"
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict(batch, verbose=0), dtype=np.float32)
+
+
+class KerasFunctionEngine(InferenceEngine):
+    """
+    The model's forward pass traced once with ``tf.function``
+
+    The input signature leaves the batch dimension open, so every batch
+    size reuses the same graph instead of retracing.
+    """
+
+    name = "keras"
+
+    def __init__(self, model):
+        import tensorflow as tf
+        self.model = model
+        signature = tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32)
+        self._forward = tf.function(lambda x: model(x, training=False), input_signature=[signature])
+
+    def predict(self, batch):
+        return self._forward(np.asarray(batch, dtype=np.float32)).numpy()
+
+
+def _tflite_interpreter(model_path=None, model_content=None, num_threads=None):
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter(model_path=model_path, model_content=model_content, num_threads=num_threads)
+
+
+def export_tflite(model, path):
+    """Convert a Keras model to a .tflite flatbuffer"""
+    import tensorflow as tf
+    content = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+class TFLiteEngine(InferenceEngine):
+    """
+    TensorFlow Lite interpreter on CPU
+
+    Needs only ``tflite_runtime`` when given an exported file. The input is
+    resized when the batch size changes; an interpreter is not thread-safe,
+    so calls are serialized.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path=None, model=None, num_threads=None):
+        content = None
+        if path is None:
+            import tensorflow as tf
+            content = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+        self.interpreter = _tflite_interpreter(path, content, num_threads or os.cpu_count())
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]["index"]
+        self._output = self.interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input, list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output).copy()
+
+
+def export_onnx(model, path):
+    """Convert a Keras model to ONNX with a dynamic batch dimension (needs tf2onnx)"""
+    import tensorflow as tf
+    import tf2onnx
+    signature = [tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=signature, output_path=path)
+    return path
+
+
+class OnnxEngine(InferenceEngine):
+    """ONNX Runtime on CPU (sessions are thread-safe)"""
+
+    name = "onnx"
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input: np.asarray(batch, dtype=np.float32)})[0]
+
+
+def _activate(x, activation):
+    if activation in (None, "linear"):
+        return x
+    if activation == "relu":
+        return np.maximum(x, 0, out=x)
+    if activation == "sigmoid":
+        return 1.0 / (1.0 + np.exp(-x))
+    if activation == "softmax":
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return x / x.sum(axis=-1, keepdims=True)
+    raise ValueError(f"Unsupported activation: {activation}")
+
+
+class NumpyEngine(InferenceEngine):
+    """
+    Pure NumPy forward pass (the reference implementation)
+
+    ``layers`` is a list of ``(spec, weights)`` pairs: conv2d (valid or same
+    padding, as a strided window view contracted with the kernel),
+    batch_norm (folded into one scale and shift at load time), max_pool,
+    flatten and dense. Dropout is the identity at inference and is dropped.
+    ``save`` writes the layers as .npz so the reference runs without
+    TensorFlow installed.
+    """
+
+    name = "numpy"
+
+    def __init__(self, layers):
+        self.layers = []
+        for spec, weights in layers:
+            if spec["op"] == "batch_norm":
+                scale = weights["gamma"] / np.sqrt(weights["variance"] + spec.get("epsilon", 1e-3))
+                weights = {"scale": scale, "shift": weights["beta"] - weights["mean"] * scale}
+            elif spec["op"] == "conv2d" and spec.get("padding") == "same" and list(spec.get("strides", [1, 1])) != [1, 1]:
+                raise ValueError("Only stride 1 is supported with same padding")
+            elif spec["op"] not in ("conv2d", "max_pool", "flatten", "dense"):
+                raise ValueError(f"Unsupported layer: {spec['op']}")
+            self.layers.append((spec, {key: np.asarray(value, dtype=np.float32) for key, value in weights.items()}))
+
+    @classmethod
+    def from_keras(cls, model):
+        """Read the architecture and weights of a Sequential Keras model"""
+        layers = []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            config = layer.get_config()
+            weights = layer.get_weights()
+            if kind == "Conv2D":
+                layers.append(({"op": "conv2d", "activation": config["activation"], "padding": config["padding"],
+                                "strides": list(config["strides"])},
+                               {"kernel": weights[0], "bias": weights[1] if config["use_bias"] else
+                                np.zeros(weights[0].shape[-1])}))
+            elif kind == "BatchNormalization":
+                names = (["gamma"] if config["scale"] else []) + (["beta"] if config["center"] else []) + ["mean", "variance"]
+                values = dict(zip(names, weights))
+                values.setdefault("gamma", np.ones_like(values["mean"]))
+                values.setdefault("beta", np.zeros_like(values["mean"]))
+                layers.append(({"op": "batch_norm", "epsilon": config["epsilon"]}, values))
+            elif kind == "MaxPooling2D":
+                if list(config["strides"]) != list(config["pool_size"]) or config["padding"] != "valid":
+                    raise ValueError("Only non-overlapping valid max pooling is supported")
+                layers.append(({"op": "max_pool", "pool_size": list(config["pool_size"])}, {}))
+            elif kind == "Flatten":
+                layers.append(({"op": "flatten"}, {}))
+            elif kind == "Dense":
+                layers.append(({"op": "dense", "activation": config["activation"]},
+                               {"kernel": weights[0], "bias": weights[1] if config["use_bias"] else
+                                np.zeros(weights[0].shape[-1])}))
+            elif kind in ("Dropout", "InputLayer"):
+                continue
+            else:
+                raise ValueError(f"Unsupported layer: {kind}")
+        return cls(layers)
+
+    def save(self, path):
+        """Write the (folded) layers to an .npz file"""
+        arrays = {}
+        specs = []
+        for i, (spec, weights) in enumerate(self.layers):
+            specs.append(spec if spec["op"] != "batch_norm" else {"op": "affine"})
+            for key, value in weights.items():
+                arrays[f"{i}/{key}"] = value
+        np.savez(path, __specs__=np.array(json.dumps(specs)), **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        engine = cls([])
+        for i, spec in enumerate(json.loads(str(data["__specs__"]))):
+            prefix = f"{i}/"
+            weights = {key[len(prefix):]: data[key] for key in data.files if key.startswith(prefix)}
+            engine.layers.append((spec, weights))
+        return engine
+
+    @staticmethod
+    def _conv2d(x, spec, weights):
+        kernel = weights["kernel"]
+        kh, kw = kernel.shape[:2]
+        if spec.get("padding", "valid") == "same":
+            pad_h, pad_w = kh - 1, kw - 1
+            x = np.pad(x, ((0, 0), (pad_h // 2, pad_h - pad_h // 2), (pad_w // 2, pad_w - pad_w // 2), (0, 0)))
+        sh, sw = spec.get("strides", [1, 1])
+        # (N, H', W', C, kh, kw) view, no copy until the contraction
+        windows = sliding_window_view(x, (kh, kw), axis=(1, 2))[:, ::sh, ::sw]
+        out = np.tensordot(windows, kernel, axes=([3, 4, 5], [2, 0, 1]))
+        out += weights["bias"]
+        return _activate(out, spec.get("activation"))
+
+    def predict(self, batch):
+        x = np.asarray(batch, dtype=np.float32)
+        for spec, weights in self.layers:
+            op = spec["op"]
+            if op == "conv2d":
+                x = self._conv2d(x, spec, weights)
+            elif op in ("batch_norm", "affine"):
+                x = x * weights["scale"] + weights["shift"]
+            elif op == "max_pool":
+                ph, pw = spec["pool_size"]
+                n, h, w, c = x.shape
+                x = x[:, :h - h % ph, :w - w % pw].reshape(n, h // ph, ph, w // pw, pw, c).max(axis=(2, 4))
+            elif op == "flatten":
+                x = x.reshape(len(x), -1)
+            elif op == "dense":
+                x = _activate(x @ weights["kernel"] + weights["bias"], spec.get("activation"))
+        return x
+
+
+def create_engine(kind, model=None, path=None):
+    """
+    Engine ``kind`` over a Keras ``model`` or an exported ``path``
+    (.tflite, .onnx, or .npz written by NumpyEngine.save)
+    """
+    if kind == "keras":
+        return KerasFunctionEngine(model)
+    if kind == "keras-predict":
+        return KerasPredictEngine(model)
+    if kind == "tflite":
+        return TFLiteEngine(path=path, model=model)
+    if kind == "onnx":
+        if path is None:
+            raise ValueError("The onnx engine needs an exported model (FACE_INFERENCE_ENGINE_PATH)")
+        return OnnxEngine(path)
+    if kind == "numpy":
+        return NumpyEngine.load(path) if path else NumpyEngine.from_keras(model)
+    raise ValueError(f"Unknown inference engine: {kind} (expected one of {', '.join(ENGINES)})")
+
+
+def engine_from_env(model=None):
+    """
+    The engine named by FACE_INFERENCE_ENGINE (default keras), falling back
+    to ``model.predict`` when it cannot be built; None without any model
+    """
+    kind = os.getenv("FACE_INFERENCE_ENGINE", "keras").lower()
+    path = os.getenv("FACE_INFERENCE_ENGINE_PATH") or None
+    if model is None and path is None:
+        return None
+    try:
+        return create_engine(kind, model=model, path=path)
+    except Exception as e:
+        if model is None:
+            print(f"Error creating {kind} face inference engine: {e}")
+            return None
+        print(f"Warning: {kind} face inference engine unavailable ({e}), using model.predict")
+        return KerasPredictEngine(model)
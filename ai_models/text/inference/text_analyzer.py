@@ -1,10 +1,21 @@
 import torch
 from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
 import numpy as np
+from contextlib import nullcontext
 from typing import Tuple, Dict, List, Any
 import os
 
+# Upper bound on tokens per input; journal snippets are short, and capping the
+# padded length keeps one long entry from inflating the whole batch
+MAX_SEQUENCE_LENGTH = 256
+
+def _no_span(stage: str):
+    return nullcontext()
+
 class TextAnalyzer:
+    # Per-stage timing hook (tokenize, forward); services swap in their own tracer
+    span = staticmethod(_no_span)
+
     def __init__(self, model_path=None):
         """
         Initialize the Text Analyzer with DistilRoBERTa model
@@ -12,6 +23,8 @@ class TextAnalyzer:
         self.model_name = "j-hartmann/emotion-english-distilroberta-base"
         self.emotions = ["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]
         self.is_mock = False
+        self.model_version = "mock"
+        self.batch_size = int(os.getenv("TEXT_INFERENCE_BATCH_SIZE", "32"))
         
         try:
             # Check if Lite Mode is enabled
@@ -30,16 +43,34 @@ class TextAnalyzer:
             if model_path and os.path.exists(model_path):
                 print(f"Loading local model from {model_path}...")
                 self.classifier = pipeline("text-classification", model=model_path, return_all_scores=True, device=device)
+                self.model_version = self._resolve_model_version(model_path)
             else:
                 # Download/Load from Hugging Face
                 print(f"Loading model {self.model_name} from Hugging Face...")
                 self.classifier = pipeline("text-classification", model=self.model_name, return_all_scores=True, device=device)
+                self.model_version = self._resolve_model_version(self.model_name)
                 
         except Exception as e:
             print(f"Warning: Could not load model {self.model_name}. Using mock implementation. Error: {str(e)}")
             self.is_mock = True
+            self.model_version = "mock"
             self._init_mock()
 
+    def _resolve_model_version(self, source: str) -> str:
+        """
+        Identify the loaded weights so cached predictions can be tied to them.
+        Uses the Hub commit hash when known, otherwise the local files' mtime.
+        """
+        commit_hash = getattr(self.classifier.model.config, "_commit_hash", None)
+        if commit_hash:
+            return f"{source}@{commit_hash}"
+        if os.path.isdir(source):
+            mtimes = [os.path.getmtime(os.path.join(source, name)) for name in os.listdir(source)]
+            return f"{source}@{int(max(mtimes, default=os.path.getmtime(source)))}"
+        if os.path.exists(source):
+            return f"{source}@{int(os.path.getmtime(source))}"
+        return source
+
     def _init_mock(self):
         """Initialize mock weights for fallback"""
         self.mock_weights = {
@@ -65,13 +96,12 @@ class TextAnalyzer:
         
         try:
             # Run inference
-            results = self.classifier(text)[0]
-            # results is a list of dicts: [{'label': 'anger', 'score': 0.01}, ...]
+            row = self._forward([text])[0]
             
             # Find max score
-            top_result = max(results, key=lambda x: x['score'])
-            emotion_label = top_result['label']
-            confidence = top_result['score']
+            top_idx = int(np.argmax(row))
+            emotion_label = self._id2label[top_idx]
+            confidence = float(row[top_idx])
             
             # For compatibility with existing system, we return confidence as score too
             # In a more complex system, score might be intensity
@@ -83,6 +113,57 @@ class TextAnalyzer:
             print(f"Error during inference: {e}. Falling back to mock.")
             return self._analyze_mock(text)
 
+    def analyze_batch(self, texts: List[str]) -> List[Tuple[str, float, float]]:
+        """
+        Analyze many texts with a single padded forward pass
+        Returns: list of (emotion_label, emotion_score, confidence), one per input
+        """
+        results: List[Tuple[str, float, float]] = [("neutral", 0.0, 0.0)] * len(texts)
+        pending = [i for i, text in enumerate(texts) if text]
+        if not pending:
+            return results
+
+        if self.is_mock:
+            for i in pending:
+                results[i] = self._analyze_mock(texts[i])
+            return results
+
+        try:
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                probabilities = self._forward([texts[i] for i in chunk])
+                for i, row in zip(chunk, probabilities):
+                    top_idx = int(np.argmax(row))
+                    confidence = float(row[top_idx])
+                    results[i] = (self._id2label[top_idx], confidence, confidence)
+            return results
+        except Exception as e:
+            print(f"Error during batch inference: {e}. Falling back to per-text analysis.")
+            for i in pending:
+                results[i] = self.analyze_emotion(texts[i])
+            return results
+
+    @property
+    def _id2label(self) -> Dict[int, str]:
+        return self.classifier.model.config.id2label
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        """Tokenize texts with dynamic padding and run one forward pass"""
+        tokenizer = self.classifier.tokenizer
+        model = self.classifier.model
+        with self.span("tokenize"):
+            inputs = tokenizer(
+                texts,
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQUENCE_LENGTH,
+                return_tensors="pt"
+            )
+            inputs = {name: tensor.to(model.device) for name, tensor in inputs.items()}
+        with self.span("forward"), torch.inference_mode():
+            logits = model(**inputs).logits
+            return torch.softmax(logits, dim=-1).cpu().numpy()
+
     def _analyze_mock(self, text: str) -> Tuple[str, float, float]:
         """Mock analysis implementation"""
         text_lower = text.lower()
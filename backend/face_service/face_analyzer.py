@@ -15,11 +15,18 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-try:
-    from ai_models.face.inference.face_analyzer import FaceAnalyzer as SharedFaceAnalyzer
-except ImportError as e:
-    print(f"Warning: Could not import shared FaceAnalyzer: {e}")
-    SharedFaceAnalyzer = None
+sys.path.append(os.path.dirname(current_dir))
+
+from shared.lazy import lazy
+
+def _load_shared_analyzer():
+    """Import the shared CNN wrapper (pulls in torch/OpenCV) on first construction"""
+    try:
+        from ai_models.face.inference.face_analyzer import FaceAnalyzer
+        return FaceAnalyzer
+    except ImportError as e:
+        print(f"Warning: Could not import shared FaceAnalyzer: {e}")
+        return None
 
 class FaceAnalyzer:
     def __init__(self):
@@ -27,6 +34,7 @@ class FaceAnalyzer:
         Initialize the face analyzer
         """
         self.initialized = True
+        SharedFaceAnalyzer = _load_shared_analyzer()
         if SharedFaceAnalyzer:
             try:
                 self.analyzer = SharedFaceAnalyzer()
@@ -53,6 +61,65 @@ class FaceAnalyzer:
         # Fallback
         return "Neutral", 0.5, 0.5
     
+    def analyze_batch(self, images):
+        """
+        Analyze emotion for many images with one batched model call
+        Returns:
+            list: one (emotion_label, face_score, confidence) per image
+        """
+        if self.analyzer:
+            try:
+                return self.analyzer.analyze_batch(images)
+            except Exception as e:
+                print(f"Error in shared batch face analysis: {str(e)}")
+        
+        # Fallback
+        return [("Neutral", 0.5, 0.5) for _ in images]
+    
+    def analyze_faces(self, images):
+        """
+        Every detected face in every image, with bounding boxes
+        Returns:
+            list: one list per image of {"box", "emotion", "face_score", "confidence", "probabilities"}
+        """
+        if self.analyzer:
+            try:
+                return self.analyzer.analyze_faces(images)
+            except Exception as e:
+                print(f"Error in shared batch face analysis: {str(e)}")
+        
+        # Fallback: no faces found
+        return [[] for _ in images]
+    
+    def new_tracker(self):
+        """
+        Face tracker for one video stream, or None when the shared
+        analyzer is unavailable (every frame is then fully detected)
+        """
+        if self.analyzer:
+            try:
+                return self.analyzer.new_tracker()
+            except Exception as e:
+                print(f"Error creating face tracker: {str(e)}")
+        return None
+    
+    def analyze_stream(self, frames):
+        """
+        Every face in a batch of video frames, from many streams
+        Args:
+            frames: list of (image bytes, tracker from new_tracker())
+        Returns:
+            list: one list per frame of {"box", "emotion", "face_score", "confidence", "probabilities", "track_id"}
+        """
+        if self.analyzer:
+            try:
+                return self.analyzer.analyze_stream(frames)
+            except Exception as e:
+                print(f"Error in shared stream face analysis: {str(e)}")
+        
+        # Fallback: no faces found
+        return [[] for _ in frames]
+    
     def analyze_micro_expressions(self, image_data):
         """
         Analyze micro-expressions from image data (Phase 4 placeholder)
@@ -72,5 +139,5 @@ class FaceAnalyzer:
             'note': 'This feature requires specialized ML model for detecting brief facial movements (40-500ms duration)'
         }
 
-# Global analyzer instance
-analyzer = FaceAnalyzer()
\ No newline at end of file
+# Global analyzer instance, built on first use or by warmup()
+analyzer = lazy("face_analyzer", FaceAnalyzer)
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Binary Image Uploads
+Request bodies streamed into pooled, reusable buffers instead of base64 JSON
+"""
+
+import os
+import threading
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+
+class ImageBufferPool:
+    """
+    Reusable upload buffers of ``buffer_bytes`` each
+
+    An upload is read straight into a pooled bytearray and handed to the
+    decoder as a memoryview of the filled prefix, so the bytes are never
+    copied between the socket and ``cv2.imdecode``. Buffers go back to the
+    pool once the analysis that reads them has finished, and at most
+    ``max_idle`` are kept. When the pool is empty, an upload of known size
+    (Content-Length) gets a buffer of exactly that size, which is not
+    pooled; only uploads of unknown size need a new full-size buffer.
+
+    Buffers handed out hold at most ``max_bytes`` between them; beyond that
+    ``acquire`` raises a 503 rather than allocating more.
+
+    Usage:
+        buffer, size = await read_request_body(request, pool)
+        try:
+            result = await analyze(memoryview(buffer)[:size])
+        finally:
+            pool.release(buffer)
+    """
+
+    def __init__(self, buffer_bytes: int = 8 * 1024 * 1024, max_idle: int = 8,
+                 max_bytes: int = 128 * 1024 * 1024, retry_after: int = 1):
+        self.buffer_bytes = buffer_bytes
+        self.max_idle = max_idle
+        self.max_bytes = max(max_bytes, buffer_bytes)
+        self.retry_after = retry_after
+        self._idle: List[bytearray] = []
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.in_use_bytes = 0
+        self.abandoned = 0
+
+    @classmethod
+    def from_env(cls) -> "ImageBufferPool":
+        return cls(
+            buffer_bytes=int(os.getenv("FACE_MAX_UPLOAD_BYTES", str(8 * 1024 * 1024))),
+            max_idle=int(os.getenv("FACE_UPLOAD_BUFFERS", "8")),
+            max_bytes=int(os.getenv("FACE_UPLOAD_MAX_INFLIGHT_BYTES", str(128 * 1024 * 1024))),
+            retry_after=int(os.getenv("INFERENCE_RETRY_AFTER", "1"))
+        )
+
+    def acquire(self, size: Optional[int] = None) -> bytearray:
+        """A buffer for an upload of ``size`` bytes (at most ``buffer_bytes``; None if unknown)"""
+        with self._lock:
+            if self._idle:
+                buffer = self._idle.pop()
+                self.in_use_bytes += len(buffer)
+                return buffer
+            length = self.buffer_bytes if size is None else min(size, self.buffer_bytes)
+            if self.in_use_bytes + length > self.max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many uploads in progress, please retry shortly",
+                    headers={"Retry-After": str(self.retry_after)}
+                )
+            self.in_use_bytes += length
+            self.allocated += 1
+        return bytearray(length)
+
+    def release(self, buffer: bytearray):
+        with self._lock:
+            self.in_use_bytes -= len(buffer)
+            if len(buffer) == self.buffer_bytes and len(self._idle) < self.max_idle:
+                self._idle.append(buffer)
+
+    def abandon(self, buffer: bytearray):
+        """
+        Stop accounting for a buffer that may still be read (its request was
+        cancelled mid-analysis); it is garbage collected, not pooled
+        """
+        with self._lock:
+            self.in_use_bytes -= len(buffer)
+            self.abandoned += 1
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Image larger than {limit} bytes"
+    )
+
+
+async def read_request_body(request: Request, pool: ImageBufferPool) -> Tuple[bytearray, int]:
+    """
+    Stream the raw request body into a pooled buffer; returns (buffer, size).
+    The caller must ``pool.release(buffer)`` when done with it.
+    """
+    declared: Optional[str] = request.headers.get("content-length")
+    expected = int(declared) if declared and declared.isdigit() else None
+    if expected is not None and expected > pool.buffer_bytes:
+        raise _too_large(pool.buffer_bytes)
+    buffer = pool.acquire(expected)
+    view = memoryview(buffer)
+    size = 0
+    try:
+        async for chunk in request.stream():
+            end = size + len(chunk)
+            if end > len(buffer):
+                raise _too_large(pool.buffer_bytes)
+            view[size:end] = chunk
+            size = end
+    except BaseException:
+        view.release()
+        pool.release(buffer)
+        raise
+    view.release()
+    return buffer, size
+
+
+async def read_upload(upload: UploadFile, pool: ImageBufferPool) -> Tuple[bytearray, int]:
+    """Read a multipart file part into a pooled buffer; returns (buffer, size)"""
+    if upload.size is not None and upload.size > pool.buffer_bytes:
+        raise _too_large(pool.buffer_bytes)
+    buffer = pool.acquire(upload.size)
+
+    def fill() -> int:
+        # The part is spooled by the multipart parser; readinto copies it once, with no intermediate bytes
+        with memoryview(buffer) as view:
+            size = 0
+            while True:
+                read = upload.file.readinto(view[size:])
+                if not read:
+                    break
+                size += read
+                if size == len(buffer) and upload.file.read(1):
+                    raise _too_large(pool.buffer_bytes)
+            return size
+
+    try:
+        return buffer, await run_in_threadpool(fill)
+    except BaseException:
+        pool.release(buffer)
+        raise
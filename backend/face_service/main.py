@@ -1,20 +1,36 @@
 import sys
 import os
+import asyncio
 import base64
 import random
 from datetime import datetime
+from typing import List
 from pydantic import BaseModel
 
 # Add the parent directory to the Python path to allow imports from shared
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from fastapi import FastAPI, HTTPException, status, APIRouter
+from fastapi import FastAPI, HTTPException, status, APIRouter, Request, UploadFile, File, Form, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from face_analyzer import analyzer
+from image_upload import ImageBufferPool, read_request_body, read_upload
+from stream import StreamConfig, serve_stream
 from shared.mongodb import face_collection, fix_id
+from shared.batching import MicroBatcher
+from shared.inference_executor import InferenceExecutor, InferenceSaturatedError, saturated_exception
+from shared.lazy import add_readiness_endpoint
+from shared.monitoring import add_metrics_endpoint
+from shared.rate_limiter import RateLimitPolicy, add_rate_limiting
 
 app = FastAPI(title="Face Analysis Service (MongoDB)", version="3.0.0")
 
+# Per-user limits (before CORS so preflights skip them); the chat page sends a
+# frame a second, batches carry many images per request
+add_rate_limiting(app, service="face", route_policies={
+    "/v1/analyze/face": RateLimitPolicy(120, 60, algorithm="token_bucket", burst=10),
+    "/v1/analyze/face/batch": RateLimitPolicy(10, 60, algorithm="token_bucket", burst=2)
+})
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -24,8 +40,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing and Prometheus metrics at /metrics
+add_metrics_endpoint(app)
+
+# Models load in the background after startup; /ready reports when they are warm
+add_readiness_endpoint(app, ["face_analyzer"])
+
 router = APIRouter()
 
+# Model calls run on a bounded pool so the event loop stays responsive
+inference_executor = InferenceExecutor.from_env("face")
+
+# Concurrent single-image requests share one batched CNN call
+face_batcher = MicroBatcher.from_env(
+    analyzer.method("analyze_batch"), prefix="FACE", max_batch_size=16, max_wait_ms=5, executor=inference_executor
+)
+
+# Images accepted by one /analyze/face/batch request
+MAX_BATCH_IMAGES = int(os.getenv("FACE_BATCH_MAX_IMAGES", "64"))
+
+# Reusable buffers for binary and multipart uploads
+upload_buffers = ImageBufferPool.from_env()
+
+# Video frames from every open stream share batched detection/tracking + CNN calls
+stream_batcher = MicroBatcher.from_env(
+    analyzer.method("analyze_stream"), prefix="FACE_STREAM", max_batch_size=32, max_wait_ms=5,
+    executor=inference_executor
+)
+stream_config = StreamConfig.from_env()
+
 class FaceAnalysisRequest(BaseModel):
     user_id: str
     image: str # Base64 string
@@ -36,23 +79,40 @@ class FaceAnalysisResponse(BaseModel):
     confidence: float
     timestamp: datetime
 
-@router.post("/analyze/face", response_model=FaceAnalysisResponse)
-async def analyze_face(request: FaceAnalysisRequest):
+class FaceBatchRequest(BaseModel):
+    user_id: str
+    images: List[str] # Base64 strings
+
+class DetectedFace(BaseModel):
+    box: List[int] # [x, y, width, height]
+    emotion: str
+    score: float
+    confidence: float
+
+class ImageFaces(BaseModel):
+    faces: List[DetectedFace]
+
+class FaceBatchResponse(BaseModel):
+    results: List[ImageFaces]
+    timestamp: datetime
+
+def decode_image(image: str) -> bytes:
+    """Base64 image, optionally as a data URL"""
+    if "," in image:
+        header, encoded = image.split(",", 1)
+    else:
+        encoded = image
+    return base64.b64decode(encoded)
+
+async def analyze_image(user_id: str, image_data) -> FaceAnalysisResponse:
+    """Classify one encoded image (bytes or a buffer view) and store the result"""
     try:
-        # Decode base64 image
-        if "," in request.image:
-            header, encoded = request.image.split(",", 1)
-        else:
-            encoded = request.image
-        
-        image_data = base64.b64decode(encoded)
-        
         # Analyze emotion
-        emotion_label, face_score, confidence = analyzer.analyze_emotion(image_data)
+        emotion_label, face_score, confidence = await face_batcher.submit(image_data)
         
         # Save to MongoDB
         doc = {
-            "user_id": str(request.user_id),
+            "user_id": str(user_id),
             "emotion_label": emotion_label,
             "face_score": float(face_score),
             "confidence": float(confidence),
@@ -68,15 +128,148 @@ async def analyze_face(request: FaceAnalysisRequest):
             timestamp=doc["created_at"]
         )
         
+    except InferenceSaturatedError as e:
+        raise saturated_exception(e)
     except Exception as e:
         print(f"Error: {e}")
-        # Fallback for demo/testing if analysis fails
-        return FaceAnalysisResponse(
-            emotion="Neutral",
-            score=0.5,
-            confidence=0.5,
-            timestamp=datetime.utcnow()
+        return fallback_response()
+
+def fallback_response() -> FaceAnalysisResponse:
+    # Fallback for demo/testing if analysis fails
+    return FaceAnalysisResponse(
+        emotion="Neutral",
+        score=0.5,
+        confidence=0.5,
+        timestamp=datetime.utcnow()
+    )
+
+async def analyze_buffer(user_id: str, buffer: bytearray, size: int) -> FaceAnalysisResponse:
+    """Analyze the filled prefix of a pooled upload buffer, then return the buffer to the pool"""
+    if size == 0:
+        upload_buffers.release(buffer)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty image")
+    try:
+        response = await analyze_image(user_id, memoryview(buffer)[:size])
+    except asyncio.CancelledError:
+        # The batched model call may still be reading it: not pooled, just collected once it is done
+        upload_buffers.abandon(buffer)
+        raise
+    except BaseException:
+        upload_buffers.release(buffer)
+        raise
+    upload_buffers.release(buffer)
+    return response
+
+@router.post("/analyze/face", response_model=FaceAnalysisResponse)
+async def analyze_face(request: FaceAnalysisRequest):
+    """Base64 image in a JSON body (kept for compatibility; prefer /analyze/face/raw)"""
+    try:
+        # Decode base64 image
+        image_data = decode_image(request.image)
+    except Exception as e:
+        print(f"Error: {e}")
+        return fallback_response()
+    return await analyze_image(request.user_id, image_data)
+
+@router.post("/analyze/face/raw", response_model=FaceAnalysisResponse)
+async def analyze_face_raw(user_id: str, request: Request):
+    """
+    Encoded image (JPEG/PNG/...) as the raw request body, e.g.
+    ``Content-Type: image/jpeg``; streamed into a reusable buffer and
+    decoded straight to grayscale
+    """
+    buffer, size = await read_request_body(request, upload_buffers)
+    return await analyze_buffer(user_id, buffer, size)
+
+@router.post("/analyze/face/upload", response_model=FaceAnalysisResponse)
+async def analyze_face_upload(user_id: str = Form(...), image: UploadFile = File(...)):
+    """Encoded image as a multipart/form-data file part"""
+    buffer, size = await read_upload(image, upload_buffers)
+    return await analyze_buffer(user_id, buffer, size)
+
+@router.post("/analyze/face/batch", response_model=FaceBatchResponse)
+async def analyze_face_batch(request: FaceBatchRequest):
+    """Every face in every image, classified in one batched model call"""
+    if len(request.images) > MAX_BATCH_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_IMAGES} images per request"
         )
+    try:
+        images = [decode_image(image) for image in request.images]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Images must be base64 encoded")
+    
+    try:
+        results = await inference_executor.run(analyzer.method("analyze_faces"), images)
+    except InferenceSaturatedError as e:
+        raise saturated_exception(e)
+    
+    created_at = datetime.utcnow()
+    # One record per image, from its first face, as /analyze/face stores it
+    docs = [
+        {
+            "user_id": str(request.user_id),
+            "emotion_label": faces[0]["emotion"],
+            "face_score": float(faces[0]["face_score"]),
+            "confidence": float(faces[0]["confidence"]),
+            "face_count": len(faces),
+            "created_at": created_at
+        }
+        for faces in results if faces
+    ]
+    if docs:
+        try:
+            await face_collection.insert_many(docs)
+        except Exception as e:
+            print(f"Error saving batch face analysis: {e}")
+    
+    return FaceBatchResponse(
+        results=[
+            ImageFaces(faces=[
+                DetectedFace(box=face["box"], emotion=face["emotion"], score=face["face_score"],
+                             confidence=face["confidence"])
+                for face in faces
+            ])
+            for faces in results
+        ],
+        timestamp=created_at
+    )
+
+@router.websocket("/analyze/face/stream")
+async def analyze_face_stream(websocket: WebSocket, user_id: str):
+    """
+    Live emotion updates for a video stream
+
+    The client sends encoded frames (JPEG/PNG) as binary messages and
+    receives one JSON "emotion" message per analyzed frame, with smoothed
+    per-face results. Frames arriving faster than they can be analyzed are
+    dropped (counted in "dropped"), never queued without bound. One summary
+    record is stored when the stream ends.
+    """
+    await websocket.accept()
+    tracker = await inference_executor.run(analyzer.method("new_tracker"))
+
+    async def analyze(frame, frame_tracker):
+        return await stream_batcher.submit((frame, frame_tracker))
+
+    started = datetime.utcnow()
+    summary = await serve_stream(websocket, analyze, tracker, stream_config)
+    if summary["emotion"] is None:
+        return
+    try:
+        await face_collection.insert_one({
+            "user_id": str(user_id),
+            "emotion_label": summary["emotion"],
+            "face_score": float(summary["score"]),
+            "confidence": float(summary["confidence"]),
+            "source": "stream",
+            "frame_count": summary["frames"],
+            "started_at": started,
+            "created_at": datetime.utcnow()
+        })
+    except Exception as e:
+        print(f"Error saving stream face analysis: {e}")
 
 @app.get("/")
 async def root():
@@ -0,0 +1,270 @@
+"""
+Real-Time Face Stream Analysis
+WebSocket video frames sampled to the service's pace, tracked between detections and smoothed per face
+"""
+
+import asyncio
+import math
+import os
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.inference_executor import InferenceSaturatedError
+from shared.monitoring import monitor
+
+# Class order of EmotionCNN's probability vectors
+EMOTIONS = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
+
+
+class StreamConfig:
+    """Per-connection limits of /analyze/face/stream"""
+
+    def __init__(self, max_fps: float = 10.0, queue_size: int = 4, smoothing_seconds: float = 1.0,
+                 max_frame_bytes: int = 2 * 1024 * 1024):
+        self.max_fps = max_fps
+        self.queue_size = max(1, queue_size)
+        self.smoothing_seconds = smoothing_seconds
+        self.max_frame_bytes = max_frame_bytes
+
+    @classmethod
+    def from_env(cls) -> "StreamConfig":
+        return cls(
+            max_fps=float(os.getenv("FACE_STREAM_MAX_FPS", "10")),
+            queue_size=int(os.getenv("FACE_STREAM_QUEUE_SIZE", "4")),
+            smoothing_seconds=float(os.getenv("FACE_STREAM_SMOOTHING_SECONDS", "1.0")),
+            max_frame_bytes=int(os.getenv("FACE_STREAM_MAX_FRAME_BYTES", str(2 * 1024 * 1024)))
+        )
+
+
+class FrameQueue:
+    """
+    Frames received but not yet analyzed, at most ``maxsize`` of them
+
+    The receiver never waits: a frame arriving at a full queue pushes out
+    the oldest one, so a client sending faster than frames are analyzed
+    (or than updates are read back) costs a bounded amount of memory.
+    The analysis loop always takes the newest frame and discards the
+    older ones, which are stale by then.
+    """
+
+    def __init__(self, maxsize: int):
+        self._frames = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.error: Optional[str] = None
+
+    def put(self, frame: bytes):
+        if len(self._frames) == self._frames.maxlen:
+            self.dropped += 1
+        self._frames.append(frame)
+        self._ready.set()
+
+    def reject(self, detail: str):
+        """Report a frame that was not queued to the client with the next update"""
+        self.error = detail
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def wait(self):
+        """Until a frame (or an error) is pending or the connection closed"""
+        await self._ready.wait()
+
+    def take_latest(self) -> Optional[bytes]:
+        """Newest frame (None if there is none); older pending frames count as dropped"""
+        if not self.closed:
+            self._ready.clear()
+        if not self._frames:
+            return None
+        frame = self._frames.pop()
+        self.dropped += len(self._frames)
+        self._frames.clear()
+        return frame
+
+
+class FrameSampler:
+    """
+    Paces analysis at no more than ``max_fps`` and no faster than it completes
+
+    The cost of a frame (including time queued behind other streams in the
+    shared batcher) is tracked as a moving average. Under load every stream
+    slows down to what the model can serve, rather than piling up work; the
+    frames skipped in the meantime are dropped by the FrameQueue.
+    """
+
+    def __init__(self, max_fps: float, alpha: float = 0.2):
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.alpha = alpha
+        self.cost = 0.0
+        self._next = 0.0
+
+    @property
+    def interval(self) -> float:
+        return max(self.min_interval, self.cost)
+
+    def delay(self, now: float) -> float:
+        """Seconds to wait before the next frame may be analyzed"""
+        return max(0.0, self._next - now)
+
+    def record(self, started: float, finished: float):
+        elapsed = finished - started
+        self.cost = elapsed if self.cost == 0.0 else self.alpha * elapsed + (1 - self.alpha) * self.cost
+        self._next = started + self.interval
+
+
+class EmotionSmoother:
+    """
+    Exponential moving average of each tracked face's emotion probabilities
+
+    The weight of a new frame is ``1 - exp(-dt / time_constant)``, so the
+    smoothing spans the same wall-clock time whatever rate frames are
+    analyzed at. A face's state is dropped once it is no longer tracked.
+    """
+
+    def __init__(self, time_constant: float = 1.0):
+        self.time_constant = time_constant
+        self._state: Dict[Any, Dict[str, Any]] = {}
+
+    def update(self, faces: List[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+        smoothed = []
+        state = {}
+        for index, face in enumerate(faces):
+            key = face.get("track_id", -(index + 1))
+            probabilities = [float(p) for p in face["probabilities"]]
+            score = float(face["face_score"])
+            previous = self._state.get(key)
+            if previous is not None and self.time_constant > 0:
+                weight = 1.0 - math.exp(-max(0.0, now - previous["time"]) / self.time_constant)
+                probabilities = [
+                    old + weight * (new - old) for old, new in zip(previous["probabilities"], probabilities)
+                ]
+                score = previous["score"] + weight * (score - previous["score"])
+            state[key] = {"probabilities": probabilities, "score": score, "time": now}
+            best = max(range(len(probabilities)), key=probabilities.__getitem__)
+            smoothed.append({
+                "id": key,
+                "box": face["box"],
+                "emotion": EMOTIONS[best] if best < len(EMOTIONS) else face["emotion"],
+                "score": score,
+                "confidence": probabilities[best],
+                "raw_emotion": face["emotion"]
+            })
+        self._state = state
+        return smoothed
+
+
+async def _receive_frames(websocket: WebSocket, queue: FrameQueue, config: StreamConfig):
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            frame = message.get("bytes")
+            if frame is None:
+                queue.reject("Frames must be sent as binary messages (encoded JPEG/PNG)")
+            elif len(frame) > config.max_frame_bytes:
+                queue.reject(f"Frame larger than {config.max_frame_bytes} bytes")
+            elif frame:
+                queue.put(frame)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        queue.close()
+
+
+async def serve_stream(
+    websocket: WebSocket,
+    analyze: Callable[[bytes, Any], Awaitable[List[Dict[str, Any]]]],
+    tracker: Any = None,
+    config: Optional[StreamConfig] = None
+) -> Dict[str, Any]:
+    """
+    Run one accepted stream until the client disconnects
+
+    ``analyze(frame, tracker)`` returns the faces of one encoded frame
+    (FaceAnalyzer.analyze_faces format with "track_id"). Each analyzed frame
+    is answered with one "emotion" message of smoothed per-face results.
+    Frames are only read by a separate task, so a client that stops reading
+    updates holds up analysis (and its own queue) but never grows memory.
+    Returns: a session summary for storage
+    """
+    config = config or StreamConfig.from_env()
+    queue = FrameQueue(config.queue_size)
+    sampler = FrameSampler(config.max_fps)
+    smoother = EmotionSmoother(config.smoothing_seconds)
+    receiver = asyncio.create_task(_receive_frames(websocket, queue, config))
+    analyzed = 0
+    emotions = Counter()
+    scores: List[float] = []
+    confidences: List[float] = []
+
+    try:
+        while True:
+            await queue.wait()
+            delay = sampler.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if queue.closed:
+                break
+            if queue.error:
+                detail, queue.error = queue.error, None
+                await websocket.send_json({"type": "error", "detail": detail})
+            frame = queue.take_latest()
+            if frame is None:
+                continue
+
+            started = time.monotonic()
+            try:
+                faces = await analyze(frame, tracker)
+            except InferenceSaturatedError:
+                # Shared model queue is full: skip this frame, the sampler backs off
+                faces = None
+            except Exception as e:
+                print(f"Error in stream face analysis: {e}")
+                faces = None
+            finished = time.monotonic()
+            sampler.record(started, finished)
+            if faces is None:
+                queue.dropped += 1
+                continue
+
+            analyzed += 1
+            smoothed = smoother.update(faces, finished)
+            if smoothed:
+                emotions[smoothed[0]["emotion"]] += 1
+                scores.append(smoothed[0]["score"])
+                confidences.append(smoothed[0]["confidence"])
+            await websocket.send_json({
+                "type": "emotion",
+                "frame": analyzed,
+                "faces": smoothed,
+                "detected": bool(getattr(tracker, "last_detected", True)),
+                "latency_ms": round(1000 * (finished - started), 1),
+                "dropped": queue.dropped,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away while an update was being sent
+        pass
+    finally:
+        receiver.cancel()
+        monitor.increment_counter("face_stream.analyzed", analyzed)
+        monitor.increment_counter("face_stream.dropped", queue.dropped)
+
+    return {
+        "frames": analyzed,
+        "dropped": queue.dropped,
+        "emotion": emotions.most_common(1)[0][0] if emotions else None,
+        "score": sum(scores) / len(scores) if scores else None,
+        "confidence": sum(confidences) / len(confidences) if confidences else None
+    }
@@ -13,6 +13,8 @@ sys.path.insert(0, current_dir)
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from shared.lazy import add_readiness_endpoint
+
 # Create FastAPI app instance
 app = FastAPI(
     title="MindfulAI Backend API",
@@ -92,6 +94,10 @@ try:
 except Exception as e:
     print(f"✗ Failed to load face_service: {e}")
 
+# /health is liveness only; /ready turns 200 once every model singleton the
+# loaded services registered has been built (warmed up in the background)
+add_readiness_endpoint(app)
+
 # Endpoint to check loaded services
 @app.get("/api/services")
 async def get_loaded_services():
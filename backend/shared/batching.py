@@ -0,0 +1,157 @@
+"""
+Dynamic Micro-Batching for Model Inference
+Coalesces concurrent single-item requests into one batched model call
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from shared.inference_executor import InferenceExecutor, InferenceSaturatedError
+from shared.monitoring import add_spans, collect_spans
+
+
+class MicroBatcher:
+    """
+    Gathers items submitted from concurrent coroutines and runs them through a
+    batch function together.
+
+    A batch is dispatched as soon as it holds ``max_batch_size`` items or the
+    oldest queued item has waited ``max_wait_ms``, whichever comes first.
+    ``batch_fn`` receives a list of items and must return one result per item
+    in the same order. It is synchronous and runs on ``executor`` (or the
+    loop's default pool), never on the event loop itself.
+
+    While batches are running the collector keeps filling the next one, up
+    to one batch per executor worker. Submissions beyond ``max_pending``
+    queued items are rejected with ``InferenceSaturatedError``.
+
+    Stage spans recorded by ``batch_fn`` (tokenize, forward, ...) are
+    collected per batch and credited to every request in it, so each
+    request's Server-Timing includes the model time it waited on.
+
+    Usage:
+        batcher = MicroBatcher(analyzer.analyze_batch, max_batch_size=32, max_wait_ms=5)
+        label, score, confidence = await batcher.submit("I feel fine")
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "batcher",
+        executor: Optional[InferenceExecutor] = None,
+        max_pending: int = 1024
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self.executor = executor
+        self.max_pending = max(1, max_pending)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+
+    @classmethod
+    def from_env(cls, batch_fn: Callable, prefix: str, **defaults) -> "MicroBatcher":
+        """Build a batcher configured by ``{PREFIX}_BATCH_MAX_SIZE`` / ``{PREFIX}_BATCH_MAX_WAIT_MS``"""
+        prefix = prefix.upper()
+        return cls(
+            batch_fn,
+            max_batch_size=int(os.getenv(f"{prefix}_BATCH_MAX_SIZE", defaults.get("max_batch_size", 32))),
+            max_wait_ms=float(os.getenv(f"{prefix}_BATCH_MAX_WAIT_MS", defaults.get("max_wait_ms", 5.0))),
+            name=prefix.lower(),
+            executor=defaults.get("executor"),
+            max_pending=int(os.getenv(f"{prefix}_BATCH_MAX_PENDING", defaults.get("max_pending", 1024)))
+        )
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            retry_after = self.executor.retry_after if self.executor else 1
+            raise InferenceSaturatedError(self.name, retry_after)
+        result, spans = await future
+        add_spans(spans)
+        return result
+
+    def _ensure_worker(self):
+        """Start the collector task on the running loop (first use, or after a loop change)"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._slots = asyncio.Semaphore(self.executor.max_workers if self.executor else 1)
+            # Started in an empty context: it outlives the request that happened to start it
+            self._worker = contextvars.Context().run(loop.create_task, self._run())
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Block for the first item, then fill the batch until full or the deadline passes"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Drain anything already queued without waiting further
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            batch = await self._collect()
+            # Callers that gave up (e.g. client disconnect) don't need a result
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = self._loop.create_task(self._process(batch))
+            # Hold a reference until the batch finishes so it isn't garbage collected
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, batch: List[Tuple[Any, asyncio.Future]]):
+        items = [item for item, _ in batch]
+        try:
+            with collect_spans() as spans:
+                results = await self._dispatch(items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"{self.name}: batch function returned {len(results)} results for {len(items)} items"
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result((result, spans))
+
+    async def _dispatch(self, items: List[Any]) -> Sequence[Any]:
+        if self.executor is not None:
+            return await self.executor.run(self.batch_fn, items)
+        call = functools.partial(contextvars.copy_context().run, self.batch_fn, items)
+        return await self._loop.run_in_executor(None, call)
@@ -3,59 +3,400 @@ Caching Utilities for Backend Services
 Provides in-memory caching for AI models and frequently accessed data
 """
 
+import asyncio
+import dataclasses
 import functools
+import hashlib
+import heapq
+import inspect
+import itertools
+import json
+import sys
 import time
-from typing import Any, Callable, Dict, Optional
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from datetime import date, datetime, timedelta
 import threading
+import os
 
-class TTLCache:
-    """Time-To-Live cache implementation"""
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.monitoring import monitor
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate memory footprint of a cached value in bytes (containers are walked a few levels deep)"""
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _depth + 1) for item in value)
+    return size
+
+class LRUCache:
+    """
+    Size-bounded LRU cache with per-entry TTL
+    
+    Evicts least recently used entries once either ``max_entries`` or
+    ``max_bytes`` is exceeded. Expiry times are kept in a min-heap, so expired
+    entries are reclaimed from the top of the heap on every write instead of
+    by scanning the whole cache. Hits, misses and evictions are counted and,
+    when ``metrics_name`` is given, reported to the performance monitor as
+    ``{metrics_name}.hit`` / ``.miss`` / ``.eviction``.
+    """
+    
+    remote = False
     
-    def __init__(self, ttl_seconds: int = 3600):
-        self.cache: Dict[str, tuple] = {}  # {key: (value, expiry_time)}
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = 3600,
+        metrics_name: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
         self.ttl = ttl_seconds
+        self.metrics_name = metrics_name
+        self.cache: "OrderedDict[Hashable, tuple]" = OrderedDict()  # {key: (value, expiry_time, size)}
+        self.expiry_heap: List[Tuple[float, int, Hashable]] = []     # [(expiry_time, seq, key)]
+        self._seq = itertools.count()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
         self.lock = threading.Lock()
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache if not expired"""
+    def _record(self, event: str, count: int = 1):
+        if self.metrics_name and count:
+            monitor.increment_counter(f"{self.metrics_name}.{event}", count)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get value and mark it most recently used; None if missing or expired"""
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[1] is not None and time.time() >= entry[1]:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.cache.move_to_end(key)
+                self.hits += 1
+        self._record("hit" if entry is not None else "miss")
+        return entry[0] if entry is not None else None
+    
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Insert or replace a value, evicting LRU entries to stay within bounds"""
+        ttl = self.ttl if ttl_seconds is None else ttl_seconds
+        size = estimate_size(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Larger than the whole budget, not worth caching
+        
         with self.lock:
+            now = time.time()
+            self._reclaim_expired(now)
             if key in self.cache:
-                value, expiry = self.cache[key]
-                if time.time() < expiry:
-                    return value
-                else:
-                    # Expired, remove it
-                    del self.cache[key]
-            return None
-    
-    def set(self, key: str, value: Any) -> None:
-        """Set value in cache with TTL"""
+                self._remove(key)
+            expiry = now + ttl if ttl else None
+            self.cache[key] = (value, expiry, size)
+            self.current_bytes += size
+            if expiry is not None:
+                heapq.heappush(self.expiry_heap, (expiry, next(self._seq), key))
+            evicted = 0
+            while len(self.cache) > self.max_entries or (
+                self.max_bytes is not None and self.current_bytes > self.max_bytes
+            ):
+                # OrderedDict keeps recency order, so the LRU entry is always first
+                oldest_key = next(iter(self.cache))
+                self._remove(oldest_key)
+                evicted += 1
+            self.evictions += evicted
+            self._compact_heap()
+        self._record("eviction", evicted)
+    
+    def delete(self, key: Hashable) -> None:
+        with self.lock:
+            if key in self.cache:
+                self._remove(key)
+    
+    def incr(self, key: Hashable, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        """Atomically add to an integer counter; the TTL is applied when the counter is created"""
+        with self.lock:
+            now = time.time()
+            entry = self.cache.get(key)
+            if entry is not None and entry[1] is not None and now >= entry[1]:
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                value = entry[0] + amount
+                self.cache[key] = (value, entry[1], entry[2])
+                self.cache.move_to_end(key)
+                return value
+        self.set(key, amount, ttl_seconds)
+        return amount
+    
+    def _remove(self, key: Hashable):
+        # Heap entries for removed keys are left behind and skipped lazily
+        _, _, size = self.cache.pop(key)
+        self.current_bytes -= size
+    
+    def _reclaim_expired(self, now: float) -> int:
+        """Pop expired entries off the heap; cost is proportional to what actually expired"""
+        removed = 0
+        heap = self.expiry_heap
+        while heap and heap[0][0] <= now:
+            expiry, _, key = heapq.heappop(heap)
+            entry = self.cache.get(key)
+            # Skip heap records left over from replaced or evicted entries
+            if entry is not None and entry[1] == expiry:
+                self._remove(key)
+                removed += 1
+        return removed
+    
+    def _compact_heap(self):
+        # Stale records accumulate when keys are overwritten or evicted; rebuild
+        # once they outnumber live entries so the heap stays O(entries)
+        if len(self.expiry_heap) > 2 * len(self.cache) + 64:
+            self.expiry_heap = [
+                item for item in self.expiry_heap
+                if item[2] in self.cache and self.cache[item[2]][1] == item[0]
+            ]
+            heapq.heapify(self.expiry_heap)
+    
+    def cleanup_expired(self) -> int:
+        """Remove expired entries, returns number removed"""
         with self.lock:
-            expiry = time.time() + self.ttl
-            self.cache[key] = (value, expiry)
+            return self._reclaim_expired(time.time())
     
     def clear(self) -> None:
         """Clear all cache"""
         with self.lock:
             self.cache.clear()
+            self.expiry_heap.clear()
+            self.current_bytes = 0
+    
+    def __len__(self) -> int:
+        return len(self.cache)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.cache),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+class ShardedCache:
+    """
+    LRU/TTL cache split into independently locked shards
+    
+    Keys are spread across ``num_shards`` LRUCache instances by hash, so
+    concurrent threads rarely contend on the same lock. Entry and byte limits
+    are divided evenly between shards.
+    """
+    
+    remote = False
+    
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = 3600,
+        max_entries: int = 10000,
+        max_bytes: Optional[int] = None,
+        num_shards: int = 16,
+        metrics_name: Optional[str] = None
+    ):
+        self.ttl = ttl_seconds
+        self.num_shards = max(1, num_shards)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        per_shard_entries = max(1, -(-max_entries // self.num_shards))
+        per_shard_bytes = -(-max_bytes // self.num_shards) if max_bytes is not None else None
+        self.shards = [
+            LRUCache(
+                max_entries=per_shard_entries,
+                max_bytes=per_shard_bytes,
+                ttl_seconds=ttl_seconds,
+                metrics_name=metrics_name
+            )
+            for _ in range(self.num_shards)
+        ]
+    
+    def _shard(self, key: Hashable) -> LRUCache:
+        return self.shards[hash(key) % self.num_shards]
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get value from cache if not expired"""
+        return self._shard(key).get(key)
+    
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Set value in cache with TTL"""
+        self._shard(key).set(key, value, ttl_seconds)
+    
+    def delete(self, key: Hashable) -> None:
+        self._shard(key).delete(key)
+    
+    def incr(self, key: Hashable, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        return self._shard(key).incr(key, amount, ttl_seconds)
+    
+    def clear(self) -> None:
+        """Clear all cache"""
+        for shard in self.shards:
+            shard.clear()
     
     def cleanup_expired(self) -> int:
         """Remove expired entries, returns number removed"""
-        with self.lock:
-            current_time = time.time()
-            expired_keys = [k for k, (_, exp) in self.cache.items() if current_time >= exp]
-            for key in expired_keys:
-                del self.cache[key]
-            return len(expired_keys)
+        return sum(shard.cleanup_expired() for shard in self.shards)
+    
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+    
+    def stats(self) -> Dict[str, Any]:
+        totals = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0}
+        for shard in self.shards:
+            for name, value in shard.stats().items():
+                totals[name] += value
+        totals["shards"] = self.num_shards
+        return totals
+
+class TTLCache(ShardedCache):
+    """Time-To-Live cache implementation (sharded, size-bounded LRU)"""
+    
+    def __init__(
+        self,
+        ttl_seconds: int = 3600,
+        max_entries: int = 10000,
+        max_bytes: Optional[int] = None,
+        num_shards: int = 16,
+        metrics_name: Optional[str] = None
+    ):
+        super().__init__(
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            num_shards=num_shards,
+            metrics_name=metrics_name
+        )
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+def get_redis_client():
+    """
+    Shared Redis client when CACHE_BACKEND=redis and the server answers PING,
+    otherwise None. Connection failures are logged once and the process falls
+    back to in-memory caches.
+    """
+    global _redis_client
+    if os.getenv("CACHE_BACKEND", "memory").lower() != "redis":
+        return None
+    with _redis_lock:
+        if _redis_client is None:
+            from shared.redis_backend import RedisClient, RedisError
+            url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+            client = RedisClient.from_url(url, max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "32")))
+            try:
+                client.ping()
+                _redis_client = client
+                print(f"[CACHE] Using Redis backend at {url}")
+            except RedisError as e:
+                print(f"[CACHE] Redis unavailable ({e}), falling back to in-memory caches")
+                _redis_client = False
+        return _redis_client or None
+
+def create_cache(
+    namespace: str,
+    ttl_seconds: Optional[float] = 3600,
+    max_entries: int = 10000,
+    max_bytes: Optional[int] = None,
+    metrics_name: Optional[str] = None
+):
+    """
+    Build a shared cache for the configured backend
+    
+    With CACHE_BACKEND=redis (and Redis reachable) returns a RedisCache so
+    every worker and node sees the same entries; otherwise an in-process
+    TTLCache. Both expose get/set/delete/incr/clear/stats.
+    """
+    client = get_redis_client()
+    if client is not None:
+        from shared.redis_backend import RedisCache
+        prefix = os.getenv("CACHE_KEY_PREFIX", "mindful")
+        return RedisCache(client, namespace=f"{prefix}:{namespace}", ttl_seconds=ttl_seconds,
+                          metrics_name=metrics_name)
+    return TTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries, max_bytes=max_bytes, metrics_name=metrics_name)
+
+class LazyCache:
+    """
+    Shared cache whose backend is built by ``create_cache`` on first use
+    
+    Caches declared at import time (module globals, ``cache_result``
+    decorators, the rate limiter) would otherwise connect to Redis while
+    the service module is imported, making import order and test collection
+    depend on Redis being reachable. Every other attribute is forwarded to
+    the backend.
+    """
+    
+    def __init__(self, namespace: str, **options):
+        self.namespace = namespace
+        self.options = options
+        self._cache = None
+        self._lock = threading.Lock()
+    
+    def backend(self):
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = create_cache(self.namespace, **self.options)
+        return self._cache
+    
+    def __getattr__(self, item):
+        # Only reached for attributes not defined on LazyCache itself
+        if item.startswith("__") or item in ("_cache", "_lock", "namespace", "options"):
+            raise AttributeError(item)
+        return getattr(self.backend(), item)
+    
+    def __len__(self) -> int:
+        return len(self.backend())
 
 # Global caches
-model_cache = TTLCache(ttl_seconds=3600)  # 1 hour TTL for models
-data_cache = TTLCache(ttl_seconds=300)     # 5 minutes TTL for data
+model_cache = TTLCache(ttl_seconds=3600, max_entries=64, num_shards=1)  # 1 hour TTL for models
+data_cache = LazyCache("data", ttl_seconds=300, max_entries=50000, max_bytes=128 * 1024 * 1024)  # 5 minutes TTL for data
+
+async def _cache_get(cache, key: str) -> Any:
+    """``cache.get`` from a coroutine; network backends (Redis) run off the event loop"""
+    if getattr(cache, "remote", False):
+        return await asyncio.to_thread(cache.get, key)
+    return cache.get(key)
+
+async def _cache_set(cache, key: str, value: Any) -> None:
+    if getattr(cache, "remote", False):
+        await asyncio.to_thread(cache.set, key, value)
+    else:
+        cache.set(key, value)
 
 def cache_model(key: str):
-    """Decorator to cache model instances"""
+    """Decorator to cache model instances (works on sync and async loaders)"""
     def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cached_model = await _cache_get(model_cache, key)
+                if cached_model is not None:
+                    print(f"[CACHE HIT] Model '{key}' loaded from cache")
+                    return cached_model
+                
+                print(f"[CACHE MISS] Loading model '{key}'...")
+                model = await func(*args, **kwargs)
+                await _cache_set(model_cache, key, model)
+                print(f"[CACHE SET] Model '{key}' cached for reuse")
+                
+                return model
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             # Check cache first
@@ -76,28 +417,153 @@ def cache_model(key: str):
         return wrapper
     return decorator
 
-def cache_result(ttl_seconds: int = 300):
-    """Decorator to cache function results"""
-    cache = TTLCache(ttl_seconds=ttl_seconds)
+def _canonicalize(value: Any) -> Any:
+    """Reduce arguments to JSON-safe structures whose encoding doesn't depend on ordering or identity"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "model_dump"):  # pydantic v2
+        return _canonicalize(value.model_dump())
+    if hasattr(value, "dict") and hasattr(value, "__fields__"):  # pydantic v1
+        return _canonicalize(value.dict())
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _canonicalize(dataclasses.asdict(value))
+    if isinstance(value, dict):
+        return {"__dict__": sorted((json.dumps(_canonicalize(k), sort_keys=True), _canonicalize(v)) for k, v in value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": sorted(json.dumps(_canonicalize(item), sort_keys=True) for item in value)}
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return _canonicalize(value.value)
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": hashlib.sha256(value).hexdigest()}
+    return repr(value)
+
+def make_cache_key(func: Callable, args: tuple, kwargs: dict) -> str:
+    """
+    Stable cache key for a call: the function's qualified name plus a SHA-256
+    of its canonicalized arguments. Equal dicts, sets and pydantic models map
+    to the same key regardless of insertion order.
+    """
+    payload = json.dumps([_canonicalize(list(args)), _canonicalize(kwargs)], sort_keys=True, default=repr)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{func.__module__}.{func.__qualname__}:{digest}"
+
+class _SingleFlight:
+    """Ensures concurrent misses for one key share a single computation"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[str, "_Call"] = {}
+        self.tasks: Dict[Tuple[int, str], "asyncio.Task"] = {}
+    
+    def do(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Run ``compute`` once per key across threads; other callers wait for its result"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = compute()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+    
+    async def do_async(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``compute`` once per key on this event loop; concurrent callers await the same task"""
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        task = self.tasks.get(flight_key)
+        if task is None:
+            # Run as its own task so a cancelled caller doesn't cancel it for everyone else
+            task = loop.create_task(compute())
+            self.tasks[flight_key] = task
+            task.add_done_callback(lambda t: self._finish(flight_key, t))
+        return await asyncio.shield(task)
+    
+    def _finish(self, flight_key: Tuple[int, str], task: "asyncio.Task"):
+        self.tasks.pop(flight_key, None)
+        if not task.cancelled():
+            # Mark retrieved so an error whose waiters all went away isn't logged as unhandled
+            task.exception()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+def cache_result(ttl_seconds: int = 300, max_entries: int = 10000, max_bytes: Optional[int] = None):
+    """
+    Decorator to cache function results
+    
+    Works on plain and coroutine functions; for the latter the awaited result
+    is cached, never the coroutine object. Keys come from make_cache_key, and
+    concurrent misses for the same key are coalesced into one call whose
+    result (or exception) is shared by every waiter. The wrapper exposes the
+    underlying cache as ``.cache``.
+    """
+    flights = _SingleFlight()
     
     def decorator(func: Callable) -> Callable:
+        cache = LazyCache(
+            f"result:{func.__module__}.{func.__qualname__}",
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+            max_bytes=max_bytes
+        )
+        
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = make_cache_key(func, args, kwargs)
+                
+                cached_result = await _cache_get(cache, cache_key)
+                if cached_result is not None:
+                    return cached_result
+                
+                async def compute():
+                    result = await func(*args, **kwargs)
+                    await _cache_set(cache, cache_key, result)
+                    return result
+                
+                return await flights.do_async(cache_key, compute)
+            async_wrapper.cache = cache
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             # Create cache key from function name and args
-            cache_key = f"{func.__name__}:{str(args)}:{str(kwargs)}"
+            cache_key = make_cache_key(func, args, kwargs)
             
             # Check cache
             cached_result = cache.get(cache_key)
             if cached_result is not None:
                 return cached_result
             
-            # Execute function
-            result = func(*args, **kwargs)
-            
-            # Cache result
-            cache.set(cache_key, result)
+            def compute():
+                result = func(*args, **kwargs)
+                cache.set(cache_key, result)
+                return result
             
-            return result
+            # Execute function once for all concurrent callers
+            return flights.do(cache_key, compute)
+        wrapper.cache = cache
         return wrapper
     return decorator
 
@@ -0,0 +1,224 @@
+"""
+Streaming Latency Histograms
+Fixed-memory log-linear histograms with rolling 1m/5m/1h windows
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Durations are recorded in microseconds. Values below 2**SUB_BUCKET_BITS get
+# one bucket each; above that every power of two is split into HALF linear
+# sub-buckets, so a reported percentile is within 1/HALF (~3%) of the truth.
+SUB_BUCKET_BITS = 6
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF = SUB_BUCKETS >> 1
+MAX_VALUE_US = 3600 * 1000 * 1000  # anything slower than an hour is clamped
+NUM_BUCKETS = SUB_BUCKETS + (MAX_VALUE_US.bit_length() - SUB_BUCKET_BITS) * HALF
+
+# (name, slot width in seconds, number of slots)
+WINDOWS = (("1m", 10, 6), ("5m", 10, 30), ("1h", 60, 60))
+
+
+def bucket_index(value_ms: float) -> int:
+    """Map a duration in milliseconds to its bucket"""
+    value = min(MAX_VALUE_US, max(0, int(value_ms * 1000)))
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF + ((value >> shift) - HALF)
+
+
+def bucket_bounds(index: int) -> Tuple[float, float]:
+    """Lower (inclusive) and upper (exclusive) bound of a bucket, in milliseconds"""
+    if index < SUB_BUCKETS:
+        return index / 1000, (index + 1) / 1000
+    shift = (index - SUB_BUCKETS) // HALF + 1
+    mantissa = (index - SUB_BUCKETS) % HALF + HALF
+    return (mantissa << shift) / 1000, ((mantissa + 1) << shift) / 1000
+
+
+def bucket_value(index: int) -> float:
+    """Representative value (midpoint) of a bucket, in milliseconds"""
+    lower, upper = bucket_bounds(index)
+    return (lower + upper) / 2
+
+
+class LogLinearHistogram:
+    """
+    HDR-style histogram over a fixed array of NUM_BUCKETS counters
+
+    Recording is O(1) and a percentile query is one pass over the buckets,
+    regardless of how many values have been recorded. Not thread-safe on
+    its own; LatencySeries does the locking.
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        self.counts[bucket_index(value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentiles(self, percentiles: Iterable[float]) -> Dict[float, float]:
+        return _percentiles(enumerate(self.counts), self.count, percentiles, self.min, self.max)
+
+
+class _Slot:
+    """Sparse histogram for one time slot of a rolling window"""
+
+    __slots__ = ("slot_id", "counts", "count", "total", "min", "max")
+
+    def __init__(self, slot_id: int):
+        self.slot_id = slot_id
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, index: int, value_ms: float):
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+
+class _RollingWindow:
+    """Ring of time slots; slots older than the window are overwritten in place"""
+
+    def __init__(self, slot_seconds: int, num_slots: int):
+        self.slot_seconds = slot_seconds
+        self.slots: List[Optional[_Slot]] = [None] * num_slots
+
+    def record(self, index: int, value_ms: float, now: float):
+        slot_id = int(now // self.slot_seconds)
+        position = slot_id % len(self.slots)
+        slot = self.slots[position]
+        if slot is None or slot.slot_id != slot_id:
+            slot = self.slots[position] = _Slot(slot_id)
+        slot.record(index, value_ms)
+
+    def live_slots(self, now: float) -> List[_Slot]:
+        current = int(now // self.slot_seconds)
+        oldest = current - len(self.slots) + 1
+        return [slot for slot in self.slots if slot is not None and oldest <= slot.slot_id <= current]
+
+
+def _percentiles(buckets: Iterable[Tuple[int, int]], total: int, percentiles: Iterable[float],
+                 minimum: float, maximum: float) -> Dict[float, float]:
+    """Walk (index, count) pairs in index order and pick each percentile's bucket"""
+    wanted = sorted(percentiles)
+    results: Dict[float, float] = {}
+    if total == 0:
+        return {p: 0.0 for p in wanted}
+    targets = [(p, max(1, math.ceil(total * p / 100))) for p in wanted]
+    seen = 0
+    position = 0
+    for index, count in buckets:
+        if not count:
+            continue
+        seen += count
+        while position < len(targets) and seen >= targets[position][1]:
+            # Clamp so the estimate never falls outside what was observed
+            results[targets[position][0]] = min(maximum, max(minimum, bucket_value(index)))
+            position += 1
+        if position == len(targets):
+            break
+    return results
+
+
+def _summary(count: int, total: float, minimum: float, maximum: float,
+             percentiles: Dict[float, float]) -> Dict:
+    return {
+        "count": count,
+        "avg_ms": total / count if count else 0.0,
+        "min_ms": minimum if count else 0.0,
+        "max_ms": maximum,
+        "median_ms": percentiles.get(50, 0.0),
+        "p95_ms": percentiles.get(95, 0.0),
+        "p99_ms": percentiles.get(99, 0.0)
+    }
+
+
+class LatencySeries:
+    """
+    All-time histogram plus rolling 1m/5m/1h windows for one operation
+
+    Memory is bounded: one fixed bucket array for the lifetime totals and a
+    fixed number of sparse slots for the windows (90 in total).
+    """
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self):
+        self.histogram = LogLinearHistogram()
+        self.windows = {name: _RollingWindow(seconds, slots) for name, seconds, slots in WINDOWS}
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return self.histogram.count
+
+    @property
+    def total(self) -> float:
+        return self.histogram.total
+
+    def record(self, value_ms: float, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        index = bucket_index(value_ms)
+        with self._lock:
+            self.histogram.record(value_ms)
+            for window in self.windows.values():
+                window.record(index, value_ms, now)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            histogram = self.histogram
+            percentiles = histogram.percentiles(self.PERCENTILES)
+            return _summary(histogram.count, histogram.total, histogram.min, histogram.max, percentiles)
+
+    def window_summary(self, name: str, now: Optional[float] = None) -> Dict:
+        """Stats over the last 1m/5m/1h, at the granularity of the window's slots"""
+        now = time.time() if now is None else now
+        with self._lock:
+            slots = self.windows[name].live_slots(now)
+            merged: Dict[int, int] = {}
+            for slot in slots:
+                for index, count in slot.counts.items():
+                    merged[index] = merged.get(index, 0) + count
+            count = sum(slot.count for slot in slots)
+            total = sum(slot.total for slot in slots)
+            minimum = min((slot.min for slot in slots), default=0.0)
+            maximum = max((slot.max for slot in slots), default=0.0)
+        percentiles = _percentiles(sorted(merged.items()), count, self.PERCENTILES, minimum, maximum)
+        return _summary(count, total, minimum, maximum, percentiles)
+
+    def cumulative_buckets(self, bounds: Iterable[float]) -> List[Tuple[float, int]]:
+        """(upper bound in ms, cumulative count) pairs for Prometheus-style ``le`` buckets"""
+        with self._lock:
+            counts = list(self.histogram.counts)
+        result = []
+        seen = 0
+        index = 0
+        for bound in sorted(bounds):
+            while index < NUM_BUCKETS and bucket_bounds(index)[1] <= bound:
+                seen += counts[index]
+                index += 1
+            result.append((bound, seen))
+        return result
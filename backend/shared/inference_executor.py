@@ -0,0 +1,150 @@
+"""
+Bounded Inference Executor
+Runs blocking model inference off the event loop with admission control
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+
+
+class InferenceSaturatedError(Exception):
+    """Raised when the executor already holds as much work as it is allowed to queue"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} inference executor is saturated")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Dedicated worker pool for synchronous model calls.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` more
+    wait for a worker. Anything beyond that is rejected immediately with
+    ``InferenceSaturatedError`` rather than piling up behind the models, so
+    cheap endpoints such as ``/health`` keep answering under load.
+
+    Workers are threads: torch and TensorFlow release the GIL during
+    forward passes, and the callables submitted (``Lazy.method`` closures,
+    bound methods of model singletons) could not be pickled to a process.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 2,
+        max_queue: int = 32,
+        retry_after: int = 1
+    ):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "InferenceExecutor":
+        """
+        Build an executor configured by environment variables:
+            INFERENCE_EXECUTOR / {NAME}_INFERENCE_EXECUTOR: "thread" (the only kind)
+            INFERENCE_MAX_WORKERS / {NAME}_INFERENCE_MAX_WORKERS
+            INFERENCE_MAX_QUEUE / {NAME}_INFERENCE_MAX_QUEUE
+            INFERENCE_RETRY_AFTER / {NAME}_INFERENCE_RETRY_AFTER (seconds)
+        """
+        def setting(key: str, default: Any) -> str:
+            return os.getenv(f"{name.upper()}_{key}", os.getenv(key, str(default)))
+
+        kind = setting("INFERENCE_EXECUTOR", "thread").lower()
+        if kind != "thread":
+            raise ValueError(
+                f"{name.upper()}_INFERENCE_EXECUTOR={kind!r} is not supported: inference runs on a thread pool "
+                "because the model callables cannot be pickled to worker processes"
+            )
+
+        return cls(
+            name=name,
+            max_workers=int(setting("INFERENCE_MAX_WORKERS", defaults.get("max_workers", 2))),
+            max_queue=int(setting("INFERENCE_MAX_QUEUE", defaults.get("max_queue", 32))),
+            retry_after=int(setting("INFERENCE_RETRY_AFTER", defaults.get("retry_after", 1)))
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created lazily so importing a service never spawns workers
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"{self.name}-inference"
+                    )
+        return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise InferenceSaturatedError(self.name, self.retry_after)
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` on the pool, raising InferenceSaturatedError when full
+
+        The slot is released when the worker finishes, not when the caller
+        stops waiting: a cancelled request whose call already started still
+        occupies a worker, so it keeps counting against the capacity.
+        """
+        self._acquire()
+        try:
+            # Carry the caller's context (e.g. request spans) onto the worker thread
+            call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+            future = self._get_executor().submit(call)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight
+        }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+def saturated_exception(error: InferenceSaturatedError) -> HTTPException:
+    """Translate executor saturation into a 503 that tells clients when to retry"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"{error.name} service is at capacity, please retry shortly",
+        headers={"Retry-After": str(error.retry_after)}
+    )
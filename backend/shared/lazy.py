@@ -0,0 +1,170 @@
+"""
+Lazy Service Singletons
+Model-backed globals built on first use or by an explicit warmup, with readiness reporting
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Generic, Iterable, Optional, TypeVar
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+T = TypeVar("T")
+
+# Every Lazy created in this process, by name, for warmup() and /ready
+_registry: Dict[str, "Lazy"] = {}
+_registry_lock = threading.Lock()
+
+
+class Lazy(Generic[T]):
+    """
+    Thread-safe lazily constructed singleton
+
+    ``factory`` runs at most once, on the first ``get()`` (or attribute
+    access, which is forwarded to the instance) or on ``warmup()``;
+    concurrent callers block on the same construction instead of starting
+    their own. A failed construction is remembered for /ready and retried
+    on the next use.
+
+    Usage:
+        analyzer = lazy("text_analyzer", TextEmotionAnalyzer)
+        analyzer.analyze_emotion(text)   # builds on first call
+        await executor.run(analyzer.method("analyze_emotion"), text)
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        self.loading = False
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                self.loading = True
+                start = time.perf_counter()
+                try:
+                    self._instance = self._factory()
+                    self.error = None
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    self.loading = False
+                self.load_seconds = time.perf_counter() - start
+                print(f"[LAZY] {self.name} ready in {self.load_seconds:.2f}s")
+        return self._instance
+
+    def warmup(self) -> bool:
+        """Build the instance now; returns False (and records the error) if that fails"""
+        try:
+            self.get()
+            return True
+        except Exception as e:
+            print(f"[LAZY] Warmup of {self.name} failed: {e}")
+            return False
+
+    def method(self, name: str) -> Callable:
+        """
+        Function calling ``name`` on the instance, resolved at call time
+
+        Hand this to executors and batchers so a cold instance is built on
+        the worker thread rather than on the event loop.
+        """
+        def call(*args, **kwargs):
+            return getattr(self.get(), name)(*args, **kwargs)
+        call.__name__ = name
+        return call
+
+    def status(self) -> str:
+        if self.ready:
+            return "ready"
+        if self.loading:
+            return "loading"
+        return "failed" if self.error else "pending"
+
+    def __getattr__(self, item):
+        # Only reached for attributes not defined on Lazy itself
+        return getattr(self.get(), item)
+
+
+def lazy(name: str, factory: Callable[[], T]) -> Lazy[T]:
+    """Create and register a lazy singleton (re-registering a name replaces it)"""
+    instance = Lazy(name, factory)
+    with _registry_lock:
+        _registry[name] = instance
+    return instance
+
+
+def _selected(names: Optional[Iterable[str]]):
+    with _registry_lock:
+        if names is None:
+            return list(_registry.values())
+        return [_registry[name] for name in names if name in _registry]
+
+
+def warmup(names: Optional[Iterable[str]] = None) -> bool:
+    """Build the named singletons (all registered ones by default); True if all succeeded"""
+    results = [instance.warmup() for instance in _selected(names)]
+    return all(results)
+
+
+def warmup_in_background(names: Optional[Iterable[str]] = None) -> threading.Thread:
+    """Run ``warmup`` on a daemon thread so startup returns immediately"""
+    names = list(names) if names is not None else None
+    thread = threading.Thread(target=warmup, args=(names,), name="lazy-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness(names: Optional[Iterable[str]] = None) -> Dict:
+    components = {}
+    for instance in _selected(names):
+        entry = {"status": instance.status()}
+        if instance.load_seconds is not None:
+            entry["load_seconds"] = round(instance.load_seconds, 3)
+        if instance.error and not instance.ready:
+            entry["error"] = instance.error
+        components[instance.name] = entry
+    return {
+        "ready": all(entry["status"] == "ready" for entry in components.values()),
+        "components": components
+    }
+
+
+def add_readiness_endpoint(app: FastAPI, names: Optional[Iterable[str]] = None, mode: Optional[str] = None):
+    """
+    Add GET /ready (503 until the singletons are built) and start warming
+    them up when the app starts
+
+    ``mode`` (default from WARMUP_MODE): "background" warms up on a thread
+    so the app serves /health immediately, "startup" blocks startup until
+    warm, "lazy" leaves construction to the first request.
+    /health stays a pure liveness check.
+    """
+    names = list(names) if names is not None else None
+    mode = (mode or os.getenv("WARMUP_MODE", "background")).lower()
+
+    @app.on_event("startup")
+    async def _warmup():
+        if mode == "background":
+            warmup_in_background(names)
+        elif mode == "startup":
+            warmup(names)
+
+    @app.get("/ready")
+    async def ready():
+        report = readiness(names)
+        return JSONResponse(report, status_code=200 if report["ready"] else 503)
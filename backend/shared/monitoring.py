@@ -3,71 +3,143 @@ Performance Monitoring Utilities
 Track and report performance metrics for backend services
 """
 
+import os
+import sys
 import time
 import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Dict, List, Callable, Optional
 from datetime import datetime
 from collections import defaultdict
-import statistics
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.histogram import LatencySeries, WINDOWS
+
+# Upper bounds (ms) of the buckets exported to Prometheus
+PROMETHEUS_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
 
 class PerformanceMonitor:
-    """Track performance metrics across services"""
+    """
+    Track performance metrics across services
+    
+    Durations go into fixed-size streaming histograms, so memory stays flat
+    and percentile queries cost O(buckets) however long the process runs.
+    """
     
     def __init__(self):
-        self.metrics: Dict[str, List[float]] = defaultdict(list)
+        self.metrics: Dict[str, LatencySeries] = {}
         self.request_counts: Dict[str, int] = defaultdict(int)
         self.error_counts: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
     
-    def track_duration(self, operation: str, duration_ms: float):
+    def _series(self, operation: str) -> LatencySeries:
+        series = self.metrics.get(operation)
+        if series is None:
+            with self._lock:
+                series = self.metrics.setdefault(operation, LatencySeries())
+        return series
+    
+    def track_duration(self, operation: str, duration_ms: float, now: Optional[float] = None):
         """Track operation duration"""
-        self.metrics[operation].append(duration_ms)
+        self._series(operation).record(duration_ms, now)
     
     def increment_requests(self, endpoint: str):
         """Increment request counter"""
-        self.request_counts[endpoint] += 1
+        with self._lock:
+            self.request_counts[endpoint] += 1
     
     def increment_errors(self, endpoint: str):
         """Increment error counter"""
-        self.error_counts[endpoint] += 1
+        with self._lock:
+            self.error_counts[endpoint] += 1
+    
+    def increment_counter(self, name: str, value: int = 1):
+        """Increment a named event counter (e.g. cache hits); safe from worker threads"""
+        with self._lock:
+            self.counters[name] += value
     
-    def get_stats(self, operation: str) -> Optional[Dict]:
-        """Get statistics for an operation"""
-        if operation not in self.metrics or not self.metrics[operation]:
+    def _counter_snapshot(self):
+        """Copies of the request, error and event counters, taken together under the lock"""
+        with self._lock:
+            return dict(self.request_counts), dict(self.error_counts), dict(self.counters)
+    
+    def get_stats(self, operation: str, now: Optional[float] = None) -> Optional[Dict]:
+        """Get all-time and windowed (1m/5m/1h) statistics for an operation"""
+        series = self.metrics.get(operation)
+        if series is None or not series.count:
             return None
         
-        durations = self.metrics[operation]
         return {
             "operation": operation,
-            "count": len(durations),
-            "avg_ms": statistics.mean(durations),
-            "min_ms": min(durations),
-            "max_ms": max(durations),
-            "median_ms": statistics.median(durations),
-            "p95_ms": self._percentile(durations, 95),
-            "p99_ms": self._percentile(durations, 99)
+            **series.summary(),
+            "windows": {name: series.window_summary(name, now) for name, _, _ in WINDOWS}
         }
     
     def get_all_stats(self) -> Dict:
         """Get all statistics"""
+        requests, errors, counters = self._counter_snapshot()
         return {
-            "operations": {op: self.get_stats(op) for op in self.metrics.keys()},
-            "requests": dict(self.request_counts),
-            "errors": dict(self.error_counts)
+            "operations": {op: self.get_stats(op) for op in list(self.metrics.keys())},
+            "requests": requests,
+            "errors": errors,
+            "counters": counters
         }
     
-    def _percentile(self, data: List[float], percentile: float) -> float:
-        """Calculate percentile"""
-        if not data:
-            return 0.0
-        sorted_data = sorted(data)
-        index = int(len(sorted_data) * percentile / 100)
-        return sorted_data[min(index, len(sorted_data) - 1)]
+    def render_prometheus(self, prefix: str = "mindful") -> str:
+        """Render every metric in the Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            metrics = sorted(self.metrics.items())
+        
+        name = f"{prefix}_operation_duration_milliseconds"
+        lines.append(f"# HELP {name} Operation duration in milliseconds")
+        lines.append(f"# TYPE {name} histogram")
+        for operation, series in metrics:
+            label = f'operation="{_escape_label(operation)}"'
+            for bound, count in series.cumulative_buckets(PROMETHEUS_BUCKETS_MS):
+                lines.append(f'{name}_bucket{{{label},le="{bound:g}"}} {count}')
+            lines.append(f'{name}_bucket{{{label},le="+Inf"}} {series.count}')
+            lines.append(f"{name}_sum{{{label}}} {series.total:.3f}")
+            lines.append(f"{name}_count{{{label}}} {series.count}")
+        
+        name = f"{prefix}_operation_window_quantile_milliseconds"
+        lines.append(f"# HELP {name} Operation duration quantiles over rolling windows")
+        lines.append(f"# TYPE {name} gauge")
+        for operation, series in metrics:
+            label = f'operation="{_escape_label(operation)}"'
+            for window, _, _ in WINDOWS:
+                stats = series.window_summary(window)
+                for quantile, key in (("0.5", "median_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                    lines.append(f'{name}{{{label},window="{window}",quantile="{quantile}"}} {stats[key]:.3f}')
+        
+        requests, errors, counters = self._counter_snapshot()
+        for metric, label_name, values, help_text in (
+            ("requests_total", "endpoint", requests, "Requests handled"),
+            ("errors_total", "endpoint", errors, "Requests that failed"),
+            ("events_total", "event", counters, "Named event counters")
+        ):
+            name = f"{prefix}_{metric}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{{{label_name}="{_escape_label(key)}"}} {value}')
+        
+        return "\n".join(lines) + "\n"
     
     def reset(self):
         """Reset all metrics"""
-        self.metrics.clear()
-        self.request_counts.clear()
-        self.error_counts.clear()
+        with self._lock:
+            self.metrics.clear()
+            self.request_counts.clear()
+            self.error_counts.clear()
+            self.counters.clear()
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
 
 # Global monitor instance
 monitor = PerformanceMonitor()
@@ -110,6 +182,60 @@ def track_performance(operation_name: str):
     
     return decorator
 
+# Stage durations for the request being handled; set by the metrics middleware.
+# Worker threads see the same dict when work is submitted with a copied context.
+_request_spans: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_spans", default=None)
+
+@contextmanager
+def span(stage: str):
+    """
+    Time one pipeline stage
+    
+    The duration is recorded in the monitor as ``stage.<name>`` and, when a
+    request is being traced, added to that request's Server-Timing breakdown.
+    
+    Usage:
+        with span("retrieval"):
+            docs = vector_db.search_similar_documents(text)
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        monitor.track_duration(f"stage.{stage}", duration_ms)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans[stage] = spans.get(stage, 0.0) + duration_ms
+
+@contextmanager
+def collect_spans():
+    """
+    Gather the spans recorded inside the block (including on worker threads
+    it submits to with a copied context) in a dict of their own, instead of
+    crediting them to the current request
+    """
+    spans: Dict[str, float] = {}
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+def add_spans(spans: Dict[str, float]):
+    """Credit stage durations measured elsewhere (e.g. in a shared batch) to the current request"""
+    current = _request_spans.get()
+    if current is not None:
+        for stage, duration_ms in spans.items():
+            current[stage] = current.get(stage, 0.0) + duration_ms
+
+def format_server_timing(spans: Dict[str, float], total_ms: Optional[float] = None) -> str:
+    """Render stage durations as a Server-Timing header value"""
+    entries = [f"{stage};dur={duration:.2f}" for stage, duration in spans.items()]
+    if total_ms is not None:
+        entries.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(entries)
+
 class RequestTimer:
     """Context manager for timing requests"""
     
@@ -139,7 +265,7 @@ def get_performance_report() -> Dict:
     report = {
         "timestamp": datetime.utcnow().isoformat(),
         "summary": {
-            "total_operations": sum(len(v) for v in monitor.metrics.values()),
+            "total_operations": sum(series.count for series in list(monitor.metrics.values())),
             "total_requests": sum(monitor.request_counts.values()),
             "total_errors": sum(monitor.error_counts.values())
         },
@@ -147,11 +273,69 @@ def get_performance_report() -> Dict:
         "endpoints": {
             "requests": stats["requests"],
             "errors": stats["errors"]
-        }
+        },
+        "counters": stats["counters"]
     }
     
     return report
 
+def add_metrics_endpoint(app, prefix: str = "mindful", server_timing: Optional[bool] = None):
+    """
+    Time every request and expose GET /metrics in Prometheus text format
+    
+    Stage spans recorded while handling a request are returned in a
+    Server-Timing header when ``server_timing`` is on (default: the
+    SERVER_TIMING environment variable).
+    
+    Usage:
+        from shared.monitoring import add_metrics_endpoint
+        
+        app = FastAPI()
+        add_metrics_endpoint(app)
+    """
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+    
+    if server_timing is None:
+        server_timing = os.getenv("SERVER_TIMING", "false").lower() == "true"
+    
+    @app.middleware("http")
+    async def track_requests(request: Request, call_next):
+        start_time = time.perf_counter()
+        spans: Dict[str, float] = {}
+        token = _request_spans.set(spans)
+        try:
+            response = await call_next(request)
+        except Exception:
+            endpoint = _route_name(request)
+            monitor.increment_requests(endpoint)
+            monitor.increment_errors(endpoint)
+            raise
+        finally:
+            _request_spans.reset(token)
+        # Label by route template, not raw path, to keep cardinality bounded
+        endpoint = _route_name(request)
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        monitor.track_duration(f"http {endpoint}", duration_ms)
+        monitor.increment_requests(endpoint)
+        if response.status_code >= 500:
+            monitor.increment_errors(endpoint)
+        if server_timing:
+            response.headers["Server-Timing"] = format_server_timing(spans, duration_ms)
+        return response
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(
+            monitor.render_prometheus(prefix),
+            media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+def _route_name(request) -> str:
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    return f"{request.method} {path}"
+
 # Example usage
 if __name__ == "__main__":
     # Test decorator
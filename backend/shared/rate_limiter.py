@@ -5,125 +5,425 @@ Prevents API abuse and ensures fair usage
 
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
+import json
+import math
+import os
+import sys
+import threading
 import time
-from collections import defaultdict
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 import asyncio
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.cache import LazyCache
+
+
+class RateLimitPolicy:
+    """
+    Limit of ``limit`` requests per ``window_seconds``
+    
+    algorithm:
+        "sliding_window" - weighted sum of the current and previous fixed
+                           windows; two counters per client, no timestamp lists
+        "token_bucket"   - refills at limit/window per second up to ``burst``
+                           tokens (defaults to ``limit``)
+    per:
+        "user" - key on the request's user_id (query parameter or small
+                 JSON body, see request_user_id) and fall back to the
+                 client IP when there is none
+        "ip"   - always key on the client IP
+    """
+    
+    ALGORITHMS = ("sliding_window", "token_bucket")
+    
+    def __init__(
+        self,
+        limit: int,
+        window_seconds: float = 60,
+        algorithm: str = "sliding_window",
+        burst: Optional[int] = None,
+        per: str = "user"
+    ):
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.algorithm = algorithm
+        self.burst = burst or limit
+        self.per = per
+    
+    @property
+    def refill_rate(self) -> float:
+        """Tokens per second for the token bucket"""
+        return self.limit / self.window_seconds
+
+
+class RateLimitResult:
+    """Outcome of one check, with everything needed for the X-RateLimit-* headers"""
+    
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+    
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float, retry_after: float = 0.0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+    
+    def headers(self, now: Optional[float] = None) -> Dict[str, str]:
+        now = time.time() if now is None else now
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(now + self.reset_after))
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+# Atomic token bucket for Redis; tokens are returned as a string because Lua
+# numbers are truncated to integers on the way out
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
 
 class RateLimiter:
     """
-    Simple in-memory rate limiter
-    For production, use Redis-based rate limiting
+    Constant-memory rate limiter with per-route and per-user policies
+    
+    Each client costs O(1) state per policy: two window counters for the
+    sliding-window algorithm or (tokens, timestamp) for the token bucket, so
+    memory stays flat regardless of request rate. State lives in the
+    configured cache backend (see shared.cache.create_cache): in-process by
+    default, or Redis with CACHE_BACKEND=redis so every uvicorn worker and
+    node enforces the same limit.
+    
+    In-process checks never await, so they are atomic with respect to other
+    coroutines; striped locks make them safe from worker threads as well.
     """
-    def __init__(self, requests_per_minute: int = 60):
-        self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)
-        self.cleanup_interval = 60  # seconds
-        self.last_cleanup = time.time()
-    
-    def _cleanup_old_requests(self):
-        """Remove requests older than 1 minute"""
-        current_time = time.time()
-        if current_time - self.last_cleanup > self.cleanup_interval:
-            cutoff_time = current_time - 60
-            for ip in list(self.requests.keys()):
-                self.requests[ip] = [
-                    req_time for req_time in self.requests[ip]
-                    if req_time > cutoff_time
-                ]
-                if not self.requests[ip]:
-                    del self.requests[ip]
-            self.last_cleanup = current_time
+    
+    LOCK_STRIPES = 64
+    
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        backend=None,
+        default_policy: Optional[RateLimitPolicy] = None,
+        route_policies: Optional[Dict[str, RateLimitPolicy]] = None,
+        namespace: str = "ratelimit"
+    ):
+        self.default_policy = default_policy or RateLimitPolicy(
+            requests_per_minute,
+            60,
+            algorithm=os.getenv("RATE_LIMIT_ALGORITHM", "sliding_window")
+        )
+        # Longest prefix wins
+        self.route_policies: List[Tuple[str, RateLimitPolicy]] = sorted(
+            (route_policies or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+        self.backend = backend if backend is not None else LazyCache(
+            namespace, ttl_seconds=120, max_entries=int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+        )
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+    
+    @property
+    def requests_per_minute(self) -> int:
+        return self.default_policy.limit
+    
+    @property
+    def remote(self) -> bool:
+        return getattr(self.backend, "remote", False)
+    
+    def add_policy(self, route_prefix: str, policy: RateLimitPolicy):
+        """Apply ``policy`` to every path starting with ``route_prefix``"""
+        self.route_policies.append((route_prefix, policy))
+        self.route_policies.sort(key=lambda item: len(item[0]), reverse=True)
+    
+    def policy_for(self, path: str) -> Tuple[str, RateLimitPolicy]:
+        """Return (scope, policy) for a request path"""
+        for prefix, policy in self.route_policies:
+            if path.startswith(prefix):
+                return prefix, policy
+        return "default", self.default_policy
+    
+    def check(self, identity: str, policy: Optional[RateLimitPolicy] = None, scope: str = "default",
+              now: Optional[float] = None) -> RateLimitResult:
+        """Consume one request for ``identity`` under ``policy``"""
+        policy = policy or self.default_policy
+        now = time.time() if now is None else now
+        key = f"{scope}:{policy.algorithm}:{identity}"
+        if policy.algorithm == "token_bucket":
+            if self.remote:
+                return self._token_bucket_remote(key, policy, now)
+            return self._token_bucket_local(key, policy, now)
+        if self.remote:
+            return self._sliding_window_remote(key, policy, now)
+        return self._sliding_window_local(key, policy, now)
     
     def is_allowed(self, client_ip: str) -> tuple[bool, int]:
         """
-        Check if request is allowed
+        Check if request is allowed under the default policy
         Returns: (is_allowed, remaining_requests)
         """
-        self._cleanup_old_requests()
+        try:
+            result = self.check(f"ip:{client_ip}")
+        except Exception as e:
+            print(f"[RATE LIMIT] Backend error, allowing request: {e}")
+            return True, self.requests_per_minute
+        return result.allowed, result.remaining
+    
+    def _lock_for(self, key: str) -> threading.Lock:
+        return self._locks[hash(key) % self.LOCK_STRIPES]
+    
+    # Sliding window counter
+    
+    @staticmethod
+    def _sliding_result(policy: RateLimitPolicy, allowed: bool, current: int, previous: int,
+                        elapsed: float) -> RateLimitResult:
+        window = policy.window_seconds
+        weight = (window - elapsed) / window
+        estimated = previous * weight + current
+        retry_after = 0.0
+        if not allowed:
+            if current + 1 <= policy.limit and previous > 0:
+                # The previous window's share decays enough before this window ends
+                retry_after = (window - elapsed) - (policy.limit - 1 - current) * window / previous
+            else:
+                # Wait for the next window, where this window's count becomes the decaying part
+                retry_after = (window - elapsed) + window * max(0.0, 1 - (policy.limit - 1) / max(current, 1))
+        return RateLimitResult(
+            allowed=allowed,
+            limit=policy.limit,
+            remaining=max(0, int(policy.limit - estimated)),
+            reset_after=window - elapsed,
+            retry_after=max(0.0, retry_after)
+        )
+    
+    def _sliding_window_local(self, key: str, policy: RateLimitPolicy, now: float) -> RateLimitResult:
+        window = policy.window_seconds
+        window_id = int(now // window)
+        elapsed = now - window_id * window
         
-        current_time = time.time()
-        cutoff_time = current_time - 60
+        with self._lock_for(key):
+            state = self.backend.get(key)  # [window_id, current, previous]
+            if state is None or state[0] < window_id - 1:
+                current, previous = 0, 0
+            elif state[0] == window_id - 1:
+                current, previous = 0, state[1]
+            else:
+                current, previous = state[1], state[2]
+            
+            estimated = previous * (window - elapsed) / window + current
+            allowed = estimated + 1 <= policy.limit
+            if allowed:
+                current += 1
+            self.backend.set(key, [window_id, current, previous], ttl_seconds=2 * window)
         
-        # Get recent requests from this IP
-        recent_requests = [
-            req_time for req_time in self.requests[client_ip]
-            if req_time > cutoff_time
-        ]
+        return self._sliding_result(policy, allowed, current, previous, elapsed)
+    
+    def _sliding_window_remote(self, key: str, policy: RateLimitPolicy, now: float) -> RateLimitResult:
+        window = policy.window_seconds
+        window_id = int(now // window)
+        elapsed = now - window_id * window
         
-        # Check if limit exceeded
-        if len(recent_requests) >= self.requests_per_minute:
-            return False, 0
+        # One round trip: count this request and read the previous window
+        current, previous = self.backend.incr_and_peek(
+            f"{key}:{window_id}", f"{key}:{window_id - 1}", 1, ttl_seconds=2 * window
+        )
+        allowed = previous * (window - elapsed) / window + current <= policy.limit
+        if not allowed:
+            # Rejected requests don't consume quota
+            current = self.backend.incr(f"{key}:{window_id}", -1, ttl_seconds=2 * window)
         
-        # Add current request
-        self.requests[client_ip].append(current_time)
-        remaining = self.requests_per_minute - len(recent_requests) - 1
+        return self._sliding_result(policy, allowed, current, previous, elapsed)
+    
+    # Token bucket
+    
+    @staticmethod
+    def _bucket_result(policy: RateLimitPolicy, allowed: bool, tokens: float) -> RateLimitResult:
+        rate = policy.refill_rate
+        return RateLimitResult(
+            allowed=allowed,
+            limit=policy.burst,
+            remaining=int(tokens),
+            reset_after=(policy.burst - tokens) / rate,
+            retry_after=0.0 if allowed else (1 - tokens) / rate
+        )
+    
+    def _token_bucket_local(self, key: str, policy: RateLimitPolicy, now: float) -> RateLimitResult:
+        rate = policy.refill_rate
+        with self._lock_for(key):
+            state = self.backend.get(key)  # [tokens, last_refill]
+            if state is None:
+                tokens = float(policy.burst)
+            else:
+                tokens = min(policy.burst, state[0] + max(0.0, now - state[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # Idle buckets refill completely by this time, so they can be dropped
+            self.backend.set(key, [tokens, now], ttl_seconds=policy.burst / rate + 1)
         
-        return True, remaining
+        return self._bucket_result(policy, allowed, tokens)
+    
+    def _token_bucket_remote(self, key: str, policy: RateLimitPolicy, now: float) -> RateLimitResult:
+        ttl_ms = int((policy.burst / policy.refill_rate + 1) * 1000)
+        allowed, tokens = self.backend.eval(
+            TOKEN_BUCKET_SCRIPT, [key], [policy.burst, policy.refill_rate, now, ttl_ms]
+        )
+        return self._bucket_result(policy, bool(allowed), float(tokens))
 
 
-# Global rate limiter instance
-rate_limiter = RateLimiter(requests_per_minute=60)
+# JSON bodies larger than this are not parsed for a user_id (e.g. base64 images)
+IDENTITY_BODY_LIMIT = int(os.getenv("RATE_LIMIT_IDENTITY_BODY_BYTES", str(64 * 1024)))
 
 
-async def rate_limit_middleware(request: Request, call_next):
+async def request_user_id(request: Request) -> Optional[str]:
     """
-    Rate limiting middleware
-    
-    Usage:
-        from shared.rate_limiter import rate_limit_middleware
-        
-        app = FastAPI()
-        app.middleware("http")(rate_limit_middleware)
+    The ``user_id`` a request is made for: the query parameter (history
+    endpoints, raw uploads) or the field of a small JSON body. Multipart and
+    raw bodies are never read here so uploads keep streaming.
     """
-    # Get client IP
-    client_ip = request.client.host
-    
-    # Skip rate limiting for health checks
-    if request.url.path in ["/health", "/", "/docs", "/redoc", "/openapi.json"]:
+    user_id = request.query_params.get("user_id")
+    if user_id:
+        return user_id
+    if request.headers.get("content-type", "").split(";")[0].strip() != "application/json":
+        return None
+    declared = request.headers.get("content-length")
+    if not declared or not declared.isdigit() or int(declared) > IDENTITY_BODY_LIMIT:
+        return None
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        return None
+    if isinstance(body, dict) and body.get("user_id") not in (None, ""):
+        return str(body["user_id"])
+    return None
+
+
+async def client_identity(request: Request, policy: RateLimitPolicy) -> str:
+    """Rate-limit key for a request: the user it is made for when known, else the client IP"""
+    if policy.per == "user":
+        user_id = await request_user_id(request)
+        if user_id is not None:
+            return f"user:{user_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter(requests_per_minute=int(os.getenv("RATE_LIMIT_PER_MINUTE", "60")))
+
+# Paths that are never rate limited
+EXEMPT_PATHS = {"/health", "/ready", "/metrics", "/", "/docs", "/redoc", "/openapi.json"}
+
+
+async def enforce_rate_limit(limiter: RateLimiter, request: Request, call_next):
+    """Check ``request`` against ``limiter``; 429 with Retry-After when over the limit"""
+    # Skip rate limiting for health checks and CORS preflights
+    if request.url.path in EXEMPT_PATHS or request.method == "OPTIONS":
         return await call_next(request)
     
-    # Check rate limit
-    is_allowed, remaining = rate_limiter.is_allowed(client_ip)
+    scope, policy = limiter.policy_for(request.url.path)
+    identity = await client_identity(request, policy)
+    
+    # Check rate limit (remote backends do network I/O, keep it off the event loop)
+    try:
+        if limiter.remote:
+            result = await asyncio.to_thread(limiter.check, identity, policy, scope)
+        else:
+            result = limiter.check(identity, policy, scope)
+    except Exception as e:
+        # Fail open: a cache outage must not take the API down with it
+        print(f"[RATE LIMIT] Backend error, allowing request: {e}")
+        return await call_next(request)
     
-    if not is_allowed:
+    now = time.time()
+    if not result.allowed:
         return JSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             content={
                 "error": "Rate limit exceeded",
                 "detail": f"Too many requests. Please try again later.",
-                "retry_after": 60
+                "retry_after": max(1, math.ceil(result.retry_after))
             },
-            headers={
-                "X-RateLimit-Limit": str(rate_limiter.requests_per_minute),
-                "X-RateLimit-Remaining": "0",
-                "X-RateLimit-Reset": str(int(time.time()) + 60),
-                "Retry-After": "60"
-            }
+            headers=result.headers(now)
         )
     
     # Process request
     response = await call_next(request)
     
     # Add rate limit headers
-    response.headers["X-RateLimit-Limit"] = str(rate_limiter.requests_per_minute)
-    response.headers["X-RateLimit-Remaining"] = str(remaining)
-    response.headers["X-RateLimit-Reset"] = str(int(time.time()) + 60)
+    response.headers.update(result.headers(now))
     
     return response
 
 
-def add_rate_limiting(app, requests_per_minute: int = 60):
+def make_rate_limit_middleware(limiter: RateLimiter):
+    """HTTP middleware enforcing ``limiter``"""
+    
+    async def middleware(request: Request, call_next):
+        return await enforce_rate_limit(limiter, request, call_next)
+    
+    return middleware
+
+
+async def rate_limit_middleware(request: Request, call_next):
     """
-    Add rate limiting to FastAPI app
+    Rate limiting middleware using the global ``rate_limiter``
+    
+    Usage:
+        from shared.rate_limiter import rate_limit_middleware
+        
+        app = FastAPI()
+        app.middleware("http")(rate_limit_middleware)
+    """
+    return await enforce_rate_limit(rate_limiter, request, call_next)
+
+
+def add_rate_limiting(app, requests_per_minute: Optional[int] = None,
+                      route_policies: Optional[Dict[str, RateLimitPolicy]] = None,
+                      service: Optional[str] = None) -> RateLimiter:
+    """
+    Add rate limiting to FastAPI app; returns the app's limiter
+    
+    Each app gets its own limiter, so services sharing a process do not
+    replace each other's policies; ``service`` keeps their counters apart
+    when they share a Redis backend. Call it before adding CORSMiddleware so
+    preflights are answered first and 429s still carry CORS headers.
     
     Usage:
-        from shared.rate_limiter import add_rate_limiting
+        from shared.rate_limiter import add_rate_limiting, RateLimitPolicy
         
         app = FastAPI()
-        add_rate_limiting(app, requests_per_minute=100)
+        add_rate_limiting(app, requests_per_minute=100, service="face", route_policies={
+            "/v1/analyze/face": RateLimitPolicy(10, 60, algorithm="token_bucket", burst=5)
+        })
     """
-    global rate_limiter
-    rate_limiter = RateLimiter(requests_per_minute=requests_per_minute)
-    app.middleware("http")(rate_limit_middleware)
+    if requests_per_minute is None:
+        requests_per_minute = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+    limiter = RateLimiter(
+        requests_per_minute=requests_per_minute,
+        route_policies=route_policies,
+        namespace=f"ratelimit:{service}" if service else "ratelimit"
+    )
+    app.middleware("http")(make_rate_limit_middleware(limiter))
+    app.state.rate_limiter = limiter
+    return limiter
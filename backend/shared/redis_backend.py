@@ -0,0 +1,345 @@
+"""
+Redis Cache Backend
+Minimal RESP2 client with connection pooling and pipelining, plus a cache
+adapter that mirrors the in-process TTLCache interface
+"""
+
+import pickle
+import queue
+import socket
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+
+from shared.monitoring import monitor
+
+
+class RedisError(Exception):
+    """Error reply returned by the server"""
+
+
+class RedisConnectionError(RedisError):
+    """Socket-level failure talking to the server"""
+
+
+def _encode_command(args: Sequence[Any]) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode("utf-8")
+        else:
+            data = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+class RedisConnection:
+    """One blocking socket speaking RESP2"""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None,
+                 username: Optional[str] = None, timeout: float = 2.0):
+        try:
+            self.sock = socket.create_connection((host, port), timeout=timeout)
+        except OSError as e:
+            raise RedisConnectionError(f"Could not connect to Redis at {host}:{port}: {e}")
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+        if password and username:
+            self.execute("AUTH", username, password)
+        elif password:
+            self.execute("AUTH", password)
+        if db:
+            self.execute("SELECT", db)
+
+    def send(self, commands: Iterable[Sequence[Any]]):
+        try:
+            self.sock.sendall(b"".join(_encode_command(command) for command in commands))
+        except OSError as e:
+            raise RedisConnectionError(str(e))
+
+    def read_reply(self) -> Any:
+        line = self.reader.readline()
+        if not line:
+            raise RedisConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            return RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count == -1:
+                return None
+            return [self.read_reply() for _ in range(count)]
+        raise RedisConnectionError(f"Unexpected reply type: {line!r}")
+
+    def execute(self, *args) -> Any:
+        self.send([args])
+        reply = self.read_reply()
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisClient:
+    """
+    Thread-safe Redis client backed by a bounded connection pool
+
+    Usage:
+        client = RedisClient.from_url("redis://localhost:6379/0")
+        client.execute("SET", "key", "value")
+        replies = client.pipeline([("INCRBY", "hits", 1), ("PEXPIRE", "hits", 60000)])
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, username: Optional[str] = None,
+                 max_connections: int = 32, timeout: float = 2.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.username = username
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._pool: "queue.LifoQueue[RedisConnection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisClient":
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=db,
+            password=unquote(parsed.password) if parsed.password else None,
+            username=unquote(parsed.username) if parsed.username else None,
+            **kwargs
+        )
+
+    def _acquire(self) -> RedisConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.max_connections
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return RedisConnection(self.host, self.port, self.db, self.password, self.username, self.timeout)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._pool.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RedisConnectionError("Timed out waiting for a pooled Redis connection")
+
+    def _release(self, conn: RedisConnection, broken: bool = False):
+        if broken:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+        else:
+            self._pool.put(conn)
+
+    def execute(self, *args) -> Any:
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands: List[Sequence[Any]]) -> List[Any]:
+        """
+        Send all commands in one write and read every reply in order.
+        Raises the first error reply after all replies have been consumed.
+        """
+        if not commands:
+            return []
+        conn = self._acquire()
+        try:
+            conn.send(commands)
+            replies = [conn.read_reply() for _ in commands]
+        except (RedisConnectionError, OSError, ValueError) as e:
+            self._release(conn, broken=True)
+            raise RedisConnectionError(str(e))
+        self._release(conn)
+
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def ping(self) -> bool:
+        return self.execute("PING") == "PONG"
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+class RedisCache:
+    """
+    Redis-backed cache exposing the same get/set/delete/incr/clear interface
+    as the in-process TTLCache, so either can back a shared cache
+
+    Values are pickled; only point this at a Redis instance you trust.
+    Keys are namespaced as ``{namespace}:{key}``. Network failures degrade to
+    cache misses rather than failing the caller, except for ``incr``, where
+    the caller decides how to fail. Hits and misses are reported as
+    ``{metrics_name}.hit`` / ``.miss`` like the in-process caches.
+    """
+
+    remote = True
+
+    def __init__(self, client: RedisClient, namespace: str, ttl_seconds: Optional[float] = 3600,
+                 metrics_name: Optional[str] = None):
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl_seconds
+        self.metrics_name = metrics_name
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _record(self, event: str, count: int = 1):
+        if self.metrics_name and count:
+            monitor.increment_counter(f"{self.metrics_name}.{event}", count)
+
+    def _key(self, key: Any) -> str:
+        return f"{self.namespace}:{key}"
+
+    @staticmethod
+    def _expiry_args(ttl: Optional[float]) -> Tuple:
+        return ("PX", max(1, int(ttl * 1000))) if ttl else ()
+
+    def get(self, key: Any) -> Optional[Any]:
+        try:
+            data = self.client.execute("GET", self._key(key))
+        except RedisError as e:
+            self.errors += 1
+            print(f"[CACHE] Redis GET failed for {self.namespace}: {e}")
+            self._record("miss")
+            return None
+        if data is None:
+            self.misses += 1
+            self._record("miss")
+            return None
+        self.hits += 1
+        self._record("hit")
+        return pickle.loads(data)
+
+    def get_many(self, keys: List[Any]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        try:
+            values = self.client.execute("MGET", *[self._key(key) for key in keys])
+        except RedisError as e:
+            self.errors += 1
+            print(f"[CACHE] Redis MGET failed for {self.namespace}: {e}")
+            self._record("miss", len(keys))
+            return [None] * len(keys)
+        found = sum(value is not None for value in values)
+        self.hits += found
+        self.misses += len(values) - found
+        self._record("hit", found)
+        self._record("miss", len(values) - found)
+        return [pickle.loads(value) if value is not None else None for value in values]
+
+    def set(self, key: Any, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl_seconds is None else ttl_seconds
+        try:
+            self.client.execute("SET", self._key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                                *self._expiry_args(ttl))
+        except RedisError as e:
+            self.errors += 1
+            print(f"[CACHE] Redis SET failed for {self.namespace}: {e}")
+
+    def delete(self, key: Any) -> None:
+        try:
+            self.client.execute("DEL", self._key(key))
+        except RedisError as e:
+            self.errors += 1
+            print(f"[CACHE] Redis DEL failed for {self.namespace}: {e}")
+
+    def incr(self, key: Any, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        """Atomically add to a counter; the TTL is applied when the counter is created"""
+        redis_key = self._key(key)
+        ttl = self.ttl if ttl_seconds is None else ttl_seconds
+        value, remaining = self.client.pipeline([("INCRBY", redis_key, amount), ("PTTL", redis_key)])
+        if ttl and remaining == -1:
+            self.client.execute("PEXPIRE", redis_key, max(1, int(ttl * 1000)))
+        return value
+
+    def incr_and_peek(self, key: Any, peek_key: Any, amount: int = 1,
+                      ttl_seconds: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Add to one counter and read another in a single round trip.
+        Returns (new value of key, current value of peek_key or 0).
+        """
+        redis_key = self._key(key)
+        ttl = self.ttl if ttl_seconds is None else ttl_seconds
+        value, remaining, peeked = self.client.pipeline([
+            ("INCRBY", redis_key, amount),
+            ("PTTL", redis_key),
+            ("GET", self._key(peek_key))
+        ])
+        if ttl and remaining == -1:
+            self.client.execute("PEXPIRE", redis_key, max(1, int(ttl * 1000)))
+        return value, int(peeked) if peeked is not None else 0
+
+    def eval(self, script: str, keys: List[Any], args: List[Any]) -> Any:
+        """Run a Lua script atomically on the server; keys are namespaced"""
+        return self.client.execute("EVAL", script, len(keys), *[self._key(key) for key in keys], *args)
+
+    def clear(self) -> None:
+        """Delete every key in this namespace (SCAN-based, never KEYS)"""
+        cursor = b"0"
+        try:
+            while True:
+                cursor, keys = self.client.execute("SCAN", cursor, "MATCH", f"{self.namespace}:*", "COUNT", 500)
+                if keys:
+                    self.client.execute("DEL", *keys)
+                if cursor in (b"0", "0", 0):
+                    break
+        except RedisError as e:
+            self.errors += 1
+            print(f"[CACHE] Redis clear failed for {self.namespace}: {e}")
+
+    def cleanup_expired(self) -> int:
+        # Redis expires keys itself
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors
+        }
@@ -22,6 +22,15 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+@pytest.fixture(scope="session", autouse=True)
+def runtime_paths(tmp_path_factory):
+    """Keep the caches the services write at runtime out of the source tree"""
+    root = tmp_path_factory.mktemp("runtime")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("EMBEDDING_CACHE_PATH", str(root / "embedding_cache.sqlite3"))
+        mp.setenv("VECTOR_INDEX_DIR", str(root / "vector_index"))
+        yield root
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database session for each test."""
@@ -0,0 +1,46 @@
+import asyncio
+from shared.batching import MicroBatcher
+
+def test_concurrent_submits_share_one_batch():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(text) for text in ["a", "b", "c"]))
+
+    results = asyncio.run(run())
+    assert results == ["A", "B", "C"]
+    assert calls == [["a", "b", "c"]]
+
+def test_batch_respects_max_size():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(len(items))
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+    assert max(calls) <= 2
+    assert sum(calls) == 5
+
+def test_batch_errors_propagate_to_callers():
+    def batch_fn(items):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.submit("x"), return_exceptions=True)
+
+    [result] = asyncio.run(run())
+    assert isinstance(result, ValueError)
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from shared.cache import LRUCache, TTLCache, cache_model, cache_result, model_cache
+
+def test_expired_entries_reclaimed_without_get():
+    cache = LRUCache(max_entries=100, ttl_seconds=0.01)
+    for i in range(10):
+        cache.set(f"k{i}", i)
+    time.sleep(0.02)
+    cache.set("fresh", 1, ttl_seconds=60)
+    assert len(cache) == 1
+    assert cache.get("fresh") == 1
+
+def test_overwrites_do_not_grow_expiry_heap():
+    cache = LRUCache(max_entries=10, ttl_seconds=60)
+    for i in range(10000):
+        cache.set("same", i)
+    assert len(cache) == 1
+    assert len(cache.expiry_heap) <= 2 * len(cache) + 64 + 1
+    assert cache.get("same") == 9999
+
+def test_ttl_cache_is_bounded_across_shards():
+    cache = TTLCache(ttl_seconds=60, max_entries=64, num_shards=8)
+    for i in range(1000):
+        cache.set(i, i)
+    assert len(cache) <= 64
+    assert cache.get(999) == 999
+    assert cache.stats()["evictions"] >= 1000 - 64
+
+def test_cleanup_expired_counts_removed():
+    cache = TTLCache(ttl_seconds=0.01, num_shards=4)
+    for i in range(20):
+        cache.set(i, i)
+    time.sleep(0.02)
+    assert cache.cleanup_expired() == 20
+    assert len(cache) == 0
+
+def test_async_functions_cache_results_not_coroutines():
+    calls = []
+
+    @cache_result(ttl_seconds=60)
+    async def fetch(user_id):
+        calls.append(user_id)
+        return {"user_id": user_id}
+
+    async def run():
+        first = await fetch(1)
+        second = await fetch(1)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"user_id": 1}
+    assert calls == [1]
+
+def test_async_model_loader_is_cached():
+    model_cache.clear()
+
+    @cache_model("async_test_model")
+    async def load():
+        return object()
+
+    async def run():
+        return await load(), await load()
+
+    first, second = asyncio.run(run())
+    assert first is second
+
+def test_cache_keys_are_stable_for_equivalent_arguments():
+    from shared.cache import make_cache_key
+
+    def fn():
+        pass
+
+    assert make_cache_key(fn, ({"a": 1, "b": {2, 3}},), {}) == make_cache_key(fn, ({"b": {3, 2}, "a": 1},), {})
+    assert make_cache_key(fn, (1,), {}) != make_cache_key(fn, ("1",), {})
+
+def test_pydantic_models_hash_by_content():
+    from pydantic import BaseModel
+    from shared.cache import make_cache_key
+
+    class Query(BaseModel):
+        user_id: str
+        days: int
+
+    def fn():
+        pass
+
+    assert make_cache_key(fn, (Query(user_id="u", days=7),), {}) == make_cache_key(fn, (Query(user_id="u", days=7),), {})
+    assert make_cache_key(fn, (Query(user_id="u", days=7),), {}) != make_cache_key(fn, (Query(user_id="u", days=30),), {})
+
+def test_concurrent_async_misses_share_one_call():
+    calls = []
+
+    @cache_result(ttl_seconds=60)
+    async def history(user_id, days=30):
+        calls.append(user_id)
+        await asyncio.sleep(0.02)
+        return {"user_id": user_id, "days": days}
+
+    async def run():
+        return await asyncio.gather(*(history("u1", days=7) for _ in range(20)))
+
+    results = asyncio.run(run())
+    assert all(result == {"user_id": "u1", "days": 7} for result in results)
+    assert calls == ["u1"]
+
+def test_concurrent_sync_misses_share_one_call():
+    import threading
+
+    calls = []
+    started = threading.Barrier(8)
+
+    @cache_result(ttl_seconds=60)
+    def summary(user_id):
+        calls.append(user_id)
+        time.sleep(0.05)
+        return user_id.upper()
+
+    results = []
+
+    def worker():
+        started.wait()
+        results.append(summary("u2"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["U2"] * 8
+    assert calls == ["u2"]
+
+def test_errors_are_shared_but_not_cached():
+    attempts = []
+
+    @cache_result(ttl_seconds=60)
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("database unavailable")
+        return "ok"
+
+    async def run():
+        first = await asyncio.gather(flaky(), flaky(), return_exceptions=True)
+        second = await flaky()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in first)
+    assert second == "ok"
+    assert len(attempts) == 2
@@ -0,0 +1,106 @@
+import sys
+import os
+import threading
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "text_service"))
+
+from embedding_service import EmbeddingService
+from vector_index import HashingEmbedder
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=32)
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return super().encode(texts)
+
+def test_cache_survives_restart_and_dedups(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder, cache_path=path, max_wait_ms=0)
+    first = service.encode(["calm", "calm", "restless"])
+    assert embedder.calls == [["calm", "restless"]]
+    np.testing.assert_allclose(first[0], first[1])
+
+    restarted = EmbeddingService(CountingEmbedder(), cache_path=path, max_wait_ms=0)
+    again = restarted.encode(["restless", "calm"])
+    assert restarted.embedder.calls == []
+    np.testing.assert_allclose(again[0], first[2])
+
+def test_concurrent_callers_share_batches():
+    gate = threading.Event()
+
+    class GatedEmbedder(CountingEmbedder):
+        def encode(self, texts):
+            gate.wait(timeout=5)
+            return super().encode(texts)
+
+    embedder = GatedEmbedder()
+    service = EmbeddingService(embedder, batch_size=64, max_wait_ms=20)
+    results = {}
+    def worker(i):
+        results[i] = service.encode_one(f"message {i}")
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    # The first caller is encoding; let it finish once the rest queued behind it
+    deadline = time.monotonic() + 5
+    while service._callers < 16 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 16
+    assert len(embedder.calls) == 2 and len(embedder.calls[1]) == 15
+    np.testing.assert_allclose(results[3], HashingEmbedder(32).encode(["message 3"])[0], rtol=1e-6)
+
+def test_leader_returns_while_others_keep_submitting():
+    class SlowEmbedder(HashingEmbedder):
+        def encode(self, texts):
+            time.sleep(0.005)
+            return super().encode(texts)
+
+    service = EmbeddingService(SlowEmbedder(dim=8), max_wait_ms=1)
+    stop = threading.Event()
+    def background(i):
+        n = 0
+        while not stop.is_set():
+            service.encode_one(f"background {i} {n}")
+            n += 1
+    threads = [threading.Thread(target=background, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        finished = []
+        for i in range(20):
+            caller = threading.Thread(target=lambda: finished.append(service.encode_one(f"foreground {i}")))
+            caller.start()
+            caller.join(timeout=2)
+            assert not caller.is_alive()
+        assert len(finished) == 20
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+def test_lone_caller_does_not_wait_for_a_batch():
+    service = EmbeddingService(HashingEmbedder(dim=8), max_wait_ms=500)
+    start = time.perf_counter()
+    service.encode_one("alone")
+    assert time.perf_counter() - start < 0.25
+
+def test_unwritable_cache_path_falls_back_to_no_cache(tmp_path):
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    service = EmbeddingService(HashingEmbedder(dim=8), cache_path=str(blocker / "cache.sqlite3"), max_wait_ms=0)
+    assert service.cache is None
+    assert service.encode_one("still works").shape == (8,)
+
+def test_chroma_and_langchain_adapters():
+    service = EmbeddingService(HashingEmbedder(dim=8), max_wait_ms=0)
+    assert len(service.chroma_function()(["a", "b"])) == 2
+    assert len(service.langchain_embeddings().embed_query("a")) == 8
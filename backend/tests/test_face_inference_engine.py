@@ -0,0 +1,68 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ai_models.face.model.inference_engine import NumpyEngine, create_engine
+
+def naive_conv(x, kernel, bias):
+    kh, kw, _, filters = kernel.shape
+    n, h, w, _ = x.shape
+    out = np.zeros((n, h - kh + 1, w - kw + 1, filters), dtype=np.float32)
+    for i in range(h - kh + 1):
+        for j in range(w - kw + 1):
+            patch = x[:, i:i + kh, j:j + kw, :]
+            out[:, i, j, :] = np.tensordot(patch, kernel, axes=([1, 2, 3], [0, 1, 2])) + bias
+    return out
+
+def small_network(rng):
+    return [
+        ({"op": "conv2d", "activation": "relu", "padding": "valid", "strides": [1, 1]},
+         {"kernel": rng.normal(size=(3, 3, 1, 4)), "bias": rng.normal(size=4)}),
+        ({"op": "batch_norm", "epsilon": 1e-3},
+         {"gamma": rng.uniform(0.5, 1.5, 4), "beta": rng.normal(size=4),
+          "mean": rng.normal(size=4), "variance": rng.uniform(0.5, 2.0, 4)}),
+        ({"op": "max_pool", "pool_size": [2, 2]}, {}),
+        ({"op": "flatten"}, {}),
+        ({"op": "dense", "activation": "softmax"}, {"kernel": rng.normal(size=(4 * 4 * 4, 7)), "bias": np.zeros(7)}),
+    ]
+
+def reference(layers, x):
+    conv, norm, _, _, dense = [weights for _, weights in layers]
+    x = np.maximum(naive_conv(x, conv["kernel"], conv["bias"]), 0)
+    x = norm["gamma"] * (x - norm["mean"]) / np.sqrt(norm["variance"] + 1e-3) + norm["beta"]
+    n, h, w, c = x.shape
+    x = x.reshape(n, h // 2, 2, w // 2, 2, c).max(axis=(2, 4)).reshape(n, -1)
+    logits = x @ dense["kernel"] + dense["bias"]
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def test_numpy_engine_matches_naive_forward_pass():
+    rng = np.random.default_rng(0)
+    layers = small_network(rng)
+    batch = rng.uniform(0, 1, size=(5, 10, 10, 1)).astype(np.float32)
+    probabilities = NumpyEngine(layers).predict(batch)
+    assert probabilities.shape == (5, 7) and probabilities.dtype == np.float32
+    np.testing.assert_allclose(probabilities, reference(layers, batch), rtol=1e-4, atol=1e-6)
+    np.testing.assert_allclose(probabilities.sum(axis=1), 1.0, rtol=1e-5)
+
+def test_same_padding_keeps_spatial_size():
+    rng = np.random.default_rng(1)
+    engine = NumpyEngine([
+        ({"op": "conv2d", "activation": "linear", "padding": "same", "strides": [1, 1]},
+         {"kernel": rng.normal(size=(3, 3, 1, 2)), "bias": np.zeros(2)}),
+    ])
+    batch = rng.uniform(size=(2, 6, 6, 1)).astype(np.float32)
+    out = engine.predict(batch)
+    assert out.shape == (2, 6, 6, 2)
+    padded = np.pad(batch, ((0, 0), (1, 1), (1, 1), (0, 0)))
+    np.testing.assert_allclose(out, naive_conv(padded, engine.layers[0][1]["kernel"], 0), rtol=1e-5, atol=1e-6)
+
+def test_exported_weights_round_trip(tmp_path):
+    rng = np.random.default_rng(2)
+    engine = NumpyEngine(small_network(rng))
+    path = engine.save(str(tmp_path / "face_model.npz"))
+    loaded = create_engine("numpy", path=path)
+    batch = rng.uniform(size=(3, 10, 10, 1)).astype(np.float32)
+    np.testing.assert_allclose(loaded.predict(batch), engine.predict(batch), rtol=1e-6)
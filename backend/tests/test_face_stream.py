@@ -0,0 +1,65 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "face_service"))
+
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from stream import EMOTIONS, EmotionSmoother, FrameQueue, StreamConfig, serve_stream
+
+def one_hot(emotion):
+    return [1.0 if name == emotion else 0.0 for name in EMOTIONS]
+
+def face(emotion, track_id=1):
+    return {"box": [10, 10, 50, 50], "emotion": emotion, "face_score": 1.0 if emotion == "Happy" else 0.3,
+            "confidence": 1.0, "probabilities": one_hot(emotion), "track_id": track_id}
+
+def test_full_queue_drops_oldest_and_serves_newest():
+    queue = FrameQueue(3)
+    for i in range(10):
+        queue.put(bytes([i]))
+    assert queue.dropped == 7
+    assert queue.take_latest() == bytes([9])
+    assert queue.dropped == 9
+    assert queue.take_latest() is None
+
+def test_smoothing_follows_wall_clock_per_track():
+    smoother = EmotionSmoother(time_constant=1.0)
+    assert smoother.update([face("Happy")], now=0.0)[0]["emotion"] == "Happy"
+    # A single contradicting frame 0.1s later does not flip the label...
+    update = smoother.update([face("Sad")], now=0.1)[0]
+    assert update["emotion"] == "Happy" and update["raw_emotion"] == "Sad"
+    # ...a sustained change does
+    assert smoother.update([face("Sad")], now=2.0)[0]["emotion"] == "Sad"
+    # A new track starts from its own first frame
+    assert smoother.update([face("Angry", track_id=2)], now=2.1)[0]["emotion"] == "Angry"
+
+def test_stream_answers_frames_and_reports_bad_messages():
+    seen = []
+    summaries = []
+
+    async def analyze(frame, tracker):
+        seen.append((frame, tracker))
+        return [face("Happy")]
+
+    app = FastAPI()
+
+    @app.websocket("/stream")
+    async def stream(websocket: WebSocket):
+        await websocket.accept()
+        summaries.append(await serve_stream(websocket, analyze, "tracker", StreamConfig(max_fps=0, max_frame_bytes=8)))
+
+    with TestClient(app).websocket_connect("/stream") as websocket:
+        websocket.send_bytes(b"frame-1")
+        update = websocket.receive_json()
+        assert update["type"] == "emotion" and update["frame"] == 1
+        assert update["faces"][0]["emotion"] == "Happy" and update["faces"][0]["id"] == 1
+        websocket.send_text("not a frame")
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_bytes(b"x" * 9)
+        assert "larger" in websocket.receive_json()["detail"]
+        websocket.send_bytes(b"frame-2")
+        assert websocket.receive_json()["frame"] == 2
+
+    assert seen == [(b"frame-1", "tracker"), (b"frame-2", "tracker")]
+    assert summaries[0]["frames"] == 2 and summaries[0]["emotion"] == "Happy"
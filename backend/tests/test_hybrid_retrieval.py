@@ -0,0 +1,73 @@
+from text_service.hybrid_retrieval import BM25Index, HybridRetriever, stem, tokenize
+from text_service.knowledge_base import KNOWLEDGE_BASE
+from text_service.retrieval import RetrievalContext, response_key
+from text_service.vector_index import HashingEmbedder, NumpyVectorIndex
+
+class HybridBackend:
+    def __init__(self, hybrid):
+        self.hybrid = hybrid
+
+    def hybrid_search(self, query, embedding=None, n_results=3):
+        return self.hybrid.search(query, embedding, n_results)
+
+def build():
+    bm25 = BM25Index()
+    bm25.add_documents(KNOWLEDGE_BASE)
+    dense = NumpyVectorIndex(HashingEmbedder())
+    dense.add_documents(KNOWLEDGE_BASE)
+    return bm25, HybridRetriever(dense, bm25)
+
+def test_stemming_and_phrase_terms():
+    assert stem("suicidal") == stem("suicide")
+    assert stem("anxious") == stem("anxiety")
+    assert stem("worthlessness") == stem("worthless")
+    assert "kill_myself" in tokenize("I want to kill myself")
+    assert "the" not in tokenize("the end")
+
+def test_bm25_ranks_lexical_matches():
+    bm25, _ = build()
+    assert bm25.search("I am so anxious and worried", 1)[0][0]["id"] == "mhk_002"
+    assert bm25.search("hello there", 5) == []
+
+def test_crisis_terms_are_recalled():
+    _, hybrid = build()
+    for text in ["I want to kill myself", "I want to end my life", "I feel suicidal", "I want to die"]:
+        retrieval = RetrievalContext(text, HybridBackend(hybrid))
+        assert retrieval.documents[0]["id"] == "mhk_009", text
+        assert retrieval.risk_level == "high"
+
+def test_everyday_distress_gets_a_specific_response():
+    _, hybrid = build()
+    for text, key in [("Im so stressed about exams", "stress"), ("panic attacks every night", "anxiety"),
+                      ("I feel anxious and worried all the time", "anxiety")]:
+        retrieval = RetrievalContext(text, HybridBackend(hybrid))
+        assert response_key(retrieval.documents, "neutral") == key, text
+        assert retrieval.risk_level == "low"
+
+def test_emotion_label_decides_when_nothing_is_retrieved():
+    assert response_key([], "fear") == "anxiety"
+    assert response_key([], "sadness") == "depression"
+    assert response_key([], "joy") == "general"
+    assert response_key([], None) == "general"
+
+def test_unrelated_text_retrieves_nothing():
+    _, hybrid = build()
+    assert hybrid.search("my life is great, had fun with friends") == []
+    assert hybrid.search("hello how are you") == []
+
+def test_fusion_prefers_documents_both_retrievers_rank():
+    bm25, hybrid = build()
+    hybrid.min_bm25 = 0.0
+    hybrid.min_similarity = -1.0
+    hits = hybrid.search("deep breathing and mindfulness for stress", n_results=5)
+    assert hits[0]["id"] == "mhk_005"
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+
+def test_serialized_index_is_reused(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    built = BM25Index.open_or_build(path, KNOWLEDGE_BASE)
+    loaded = BM25Index.open_or_build(path, KNOWLEDGE_BASE)
+    assert loaded.fingerprint == built.fingerprint
+    assert [doc["id"] for doc, _ in loaded.search("kill myself")] == [doc["id"] for doc, _ in built.search("kill myself")]
+    rebuilt = BM25Index.open_or_build(path, KNOWLEDGE_BASE[:2])
+    assert len(rebuilt) == 2
@@ -0,0 +1,70 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "face_service"))
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from image_upload import ImageBufferPool, read_request_body
+
+def make_app(pool):
+    app = FastAPI()
+
+    @app.post("/raw")
+    async def raw(request: Request):
+        buffer, size = await read_request_body(request, pool)
+        try:
+            body = bytes(memoryview(buffer)[:size])
+        finally:
+            pool.release(buffer)
+        return {"size": size, "head": body[:4].hex()}
+
+    return app
+
+def test_body_is_streamed_into_reused_buffers():
+    pool = ImageBufferPool(buffer_bytes=1024, max_idle=2)
+    client = TestClient(make_app(pool))
+    for payload in (b"\xff\xd8\xff\xe0" + b"x" * 500, b"\x89PNG" + b"y" * 10):
+        # Streamed without a Content-Length, so a full-size pooled buffer is needed
+        response = client.post("/raw", content=iter([payload]), headers={"Content-Type": "image/jpeg"})
+        assert response.json() == {"size": len(payload), "head": payload[:4].hex()}
+    assert pool.allocated == 1
+    # A known-size upload reuses the idle buffer too
+    assert client.post("/raw", content=b"x" * 100).json()["size"] == 100
+    assert pool.allocated == 1 and pool.in_use_bytes == 0
+
+def test_known_sizes_are_allocated_exactly_and_memory_is_capped():
+    pool = ImageBufferPool(buffer_bytes=1024, max_idle=2, max_bytes=2048)
+    small = pool.acquire(100)
+    assert len(small) == 100
+    full = pool.acquire()
+    assert len(full) == 1024 and pool.in_use_bytes == 1124
+    with pytest.raises(HTTPException) as error:
+        pool.acquire()
+    assert error.value.status_code == 503 and error.value.headers["Retry-After"] == "1"
+    pool.release(small)
+    pool.release(full)
+    # Only full-size buffers are kept for reuse
+    assert pool.in_use_bytes == 0 and pool.acquire(10) is full
+
+def test_abandoned_buffers_are_not_pooled():
+    pool = ImageBufferPool(buffer_bytes=64, max_idle=2, max_bytes=64)
+    buffer = pool.acquire()
+    pool.abandon(buffer)
+    assert pool.abandoned == 1 and pool.in_use_bytes == 0
+    assert pool.acquire() is not buffer
+
+def test_oversized_body_is_rejected_and_buffer_returned():
+    pool = ImageBufferPool(buffer_bytes=64, max_idle=2)
+    client = TestClient(make_app(pool))
+    assert client.post("/raw", content=b"z" * 65).status_code == 413
+
+    def chunks():
+        yield b"z" * 40
+        yield b"z" * 40
+
+    # No Content-Length: the limit is enforced while streaming
+    assert client.post("/raw", content=chunks()).status_code == 413
+    assert client.post("/raw", content=b"ok").json()["size"] == 2
+    assert pool.allocated == 1
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import pytest
+from shared.inference_executor import InferenceExecutor, InferenceSaturatedError, saturated_exception
+
+def test_run_returns_result_off_loop():
+    executor = InferenceExecutor("test", max_workers=1, max_queue=0)
+
+    async def run():
+        return await executor.run(lambda x: (x * 2, threading.current_thread().name), 21)
+
+    value, thread_name = asyncio.run(run())
+    assert value == 42
+    assert thread_name.startswith("test-inference")
+    executor.shutdown()
+
+def test_rejects_when_saturated():
+    executor = InferenceExecutor("test", max_workers=1, max_queue=1, retry_after=3)
+    release = threading.Event()
+
+    async def run():
+        first = asyncio.ensure_future(executor.run(release.wait))
+        second = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceSaturatedError) as exc_info:
+            await executor.run(release.wait)
+        release.set()
+        await asyncio.gather(first, second)
+        return exc_info.value
+
+    error = asyncio.run(run())
+    assert executor.in_flight == 0
+    http_error = saturated_exception(error)
+    assert http_error.status_code == 503
+    assert http_error.headers["Retry-After"] == "3"
+    executor.shutdown()
+
+def test_cancelled_caller_keeps_slot_until_worker_finishes():
+    executor = InferenceExecutor("test", max_workers=1, max_queue=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def work():
+        started.set()
+        release.wait()
+
+    async def run():
+        task = asyncio.ensure_future(executor.run(work))
+        await asyncio.to_thread(started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        try:
+            # The worker is still busy, so the slot is still taken
+            assert executor.in_flight == 1
+            with pytest.raises(InferenceSaturatedError):
+                await executor.run(work)
+        finally:
+            release.set()
+        for _ in range(100):
+            if executor.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert executor.in_flight == 0
+    executor.shutdown()
+
+def test_process_executor_is_rejected(monkeypatch):
+    monkeypatch.setenv("TEXT_INFERENCE_EXECUTOR", "process")
+    with pytest.raises(ValueError, match="TEXT_INFERENCE_EXECUTOR"):
+        InferenceExecutor.from_env("text")
+    monkeypatch.setenv("TEXT_INFERENCE_EXECUTOR", "thread")
+    assert InferenceExecutor.from_env("text", max_workers=3).max_workers == 3
@@ -0,0 +1,64 @@
+import sys
+import os
+import json
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "text_service"))
+
+from embedding_service import EmbeddingService
+from ingest import NearDuplicateFilter, build_artifact, chunk_text, read_markdown, read_sources
+from knowledge_artifact import current_version_dir, load_artifact
+from vector_index import HashingEmbedder
+
+def _embedder():
+    return EmbeddingService(HashingEmbedder(dim=64), cache_path=None, max_wait_ms=0)
+
+def test_chunks_respect_size_and_overlap():
+    text = " ".join(f"Sentence number {i} talks about sleep and stress." for i in range(60))
+    chunks = chunk_text(text, max_words=40, overlap_words=8)
+    assert len(chunks) > 1
+    assert all(len(chunk.split()) <= 40 for chunk in chunks)
+    assert chunks[0].split()[-8:] == chunks[1].split()[:8]
+    assert chunk_text("Short note.", max_words=40) == ["Short note."]
+
+def test_near_duplicates_are_dropped():
+    dedup = NearDuplicateFilter(max_distance=3)
+    base = ("Grounding exercises such as naming five things you can see and four things you can hear "
+            "help bring attention back to the present moment during a panic attack.")
+    assert not dedup.is_duplicate(base)
+    assert dedup.is_duplicate(base.upper())
+    assert dedup.is_duplicate(base.replace("panic attack.", "panic attack!"))
+    assert not dedup.is_duplicate("Regular sleep and daylight exposure help stabilise mood over several weeks.")
+
+def test_markdown_sections_become_documents(tmp_path):
+    path = tmp_path / "guide.md"
+    path.write_text("# Sleep\nKeep a regular schedule.\n\n## Stress\nTake short breaks.\n")
+    docs = list(read_markdown(str(path), {"category": "general", "severity": "low"}))
+    assert [doc["id"] for doc in docs] == ["guide#0", "guide#1"]
+    assert docs[1]["metadata"]["title"] == "Stress"
+    assert docs[1]["metadata"]["category"] == "general"
+
+def test_artifact_is_published_and_memory_mapped(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    records = [
+        {"id": "sleep", "content": "Insomnia and poor sleep often improve with a fixed wake time.", "category": "sleep"},
+        {"id": "copy", "content": "Insomnia and poor sleep often improve with a fixed wake time.", "category": "sleep"},
+        {"id": "crisis", "content": "If you are thinking about suicide, call a crisis line now.", "severity": "critical"},
+    ]
+    corpus.write_text("\n".join(json.dumps(record) for record in records) + "\n")
+    out = str(tmp_path / "index")
+    embedder = _embedder()
+
+    documents = read_sources([str(corpus)], {"category": "general", "severity": "low"})
+    manifest = build_artifact(documents, out, embedder, batch_size=2)
+    assert manifest["chunks"] == 2
+    assert manifest["duplicates_skipped"] == 1
+
+    artifact = load_artifact(out, embedder)
+    assert current_version_dir(out) == artifact.directory
+    assert isinstance(artifact.index._snapshot.vectors, np.memmap)
+    assert artifact.index.get_document_by_id("crisis")["metadata"]["severity"] == "critical"
+    assert artifact.index.search_similar_documents("trouble with insomnia", 1)[0]["id"] == "sleep"
+    assert artifact.bm25.search("suicide")[0][0]["id"] == "crisis"
+    ids, contents, metadatas, vectors = next(artifact.batches())
+    assert ids == ["sleep", "crisis"] and vectors.shape == (2, 64)
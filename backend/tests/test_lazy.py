@@ -0,0 +1,67 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from shared.lazy import Lazy, add_readiness_endpoint, lazy, readiness, warmup
+
+class Model:
+    built = 0
+
+    def __init__(self):
+        time.sleep(0.05)
+        Model.built += 1
+
+    def predict(self, x):
+        return x * 2
+
+def test_factory_runs_once_under_concurrency():
+    Model.built = 0
+    instance = Lazy("model", Model)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(instance.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert Model.built == 1
+    assert all(result is results[0] for result in results)
+
+def test_attribute_access_and_method_are_lazy():
+    Model.built = 0
+    instance = Lazy("model", Model)
+    predict = instance.method("predict")
+    assert Model.built == 0 and instance.status() == "pending"
+    assert predict(2) == 4
+    assert instance.predict(3) == 6
+    assert Model.built == 1
+
+def test_failed_construction_is_reported_and_retried():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("weights missing")
+        return Model()
+
+    lazy("flaky", factory)
+    assert warmup(["flaky"]) is False
+    report = readiness(["flaky"])
+    assert report["ready"] is False
+    assert report["components"]["flaky"]["status"] == "failed"
+    assert "weights missing" in report["components"]["flaky"]["error"]
+    assert warmup(["flaky"]) is True
+    assert readiness(["flaky"])["ready"] is True
+
+def test_ready_endpoint_separate_from_startup():
+    lazy("slow_model", Model)
+    app = FastAPI()
+    add_readiness_endpoint(app, ["slow_model"], mode="lazy")
+    with TestClient(app) as client:
+        assert client.get("/ready").status_code == 503
+        warmup(["slow_model"])
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["components"]["slow_model"]["status"] == "ready"
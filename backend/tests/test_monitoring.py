@@ -0,0 +1,128 @@
+import random
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from shared.histogram import NUM_BUCKETS, bucket_bounds, bucket_index
+from shared.monitoring import PerformanceMonitor, add_metrics_endpoint, monitor
+
+def test_buckets_cover_range_with_bounded_error():
+    for value_ms in (0.0, 0.05, 1.0, 12.345, 250.0, 9999.0, 3_600_000.0):
+        index = bucket_index(value_ms)
+        assert 0 <= index < NUM_BUCKETS
+        lower, upper = bucket_bounds(index)
+        assert lower <= round(value_ms * 1000) / 1000 < upper or value_ms >= 3_600_000
+        if lower >= 0.064:
+            assert (upper - lower) / lower <= 1 / 32 + 1e-9
+
+def test_percentiles_are_close_and_memory_is_fixed():
+    perf = PerformanceMonitor()
+    rng = random.Random(7)
+    values = [rng.uniform(1, 1000) for _ in range(50000)]
+    for value in values:
+        perf.track_duration("op", value, now=1000)
+    stats = perf.get_stats("op", now=1000)
+    exact = sorted(values)
+    assert stats["count"] == 50000
+    for key, pct in (("median_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+        truth = exact[int(len(exact) * pct / 100) - 1]
+        assert abs(stats[key] - truth) / truth < 0.03
+    assert len(perf.metrics["op"].histogram.counts) == NUM_BUCKETS
+
+def test_windows_forget_old_samples():
+    perf = PerformanceMonitor()
+    perf.track_duration("op", 500, now=0)
+    perf.track_duration("op", 5, now=400)
+    stats = perf.get_stats("op", now=400)
+    assert stats["count"] == 2
+    assert stats["windows"]["1m"]["count"] == 1
+    assert stats["windows"]["1m"]["max_ms"] == 5
+    assert stats["windows"]["1h"]["count"] == 2
+
+def test_counters_are_exact_under_concurrent_increments():
+    import threading
+    perf = PerformanceMonitor()
+
+    def bump(worker):
+        for i in range(2000):
+            perf.increment_counter("cache.hits")
+            perf.increment_counter(f"event.{worker}.{i % 50}")
+
+    threads = [threading.Thread(target=bump, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        perf.render_prometheus()
+    for thread in threads:
+        thread.join()
+    assert perf.get_all_stats()["counters"]["cache.hits"] == 16000
+    assert 'mindful_events_total{event="cache.hits"} 16000' in perf.render_prometheus()
+
+def test_prometheus_endpoint():
+    monitor.reset()
+    app = FastAPI()
+    add_metrics_endpoint(app)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    body = client.get("/metrics").text
+    assert 'mindful_requests_total{endpoint="GET /items/{item_id}"} 2' in body
+    assert 'mindful_operation_duration_milliseconds_count{operation="http GET /items/{item_id}"} 2' in body
+    assert 'le="+Inf"' in body
+
+def test_spans_reach_server_timing_through_executor():
+    from shared.inference_executor import InferenceExecutor
+    from shared.monitoring import span
+    monitor.reset()
+    executor = InferenceExecutor("test", max_workers=1)
+    app = FastAPI()
+    add_metrics_endpoint(app, server_timing=True)
+
+    def forward():
+        with span("forward"):
+            return "ok"
+
+    @app.get("/run")
+    async def run():
+        result = await executor.run(forward)
+        with span("mongo_insert"):
+            pass
+        return {"result": result}
+
+    response = TestClient(app).get("/run")
+    header = response.headers["Server-Timing"]
+    assert header.startswith("forward;dur=")
+    assert "mongo_insert;dur=" in header and "total;dur=" in header
+    assert monitor.get_stats("stage.forward")["count"] == 1
+    executor.shutdown()
+
+def test_batched_model_spans_reach_every_request():
+    from shared.batching import MicroBatcher
+    from shared.inference_executor import InferenceExecutor
+    from shared.monitoring import span
+    monitor.reset()
+    executor = InferenceExecutor("test", max_workers=1)
+    app = FastAPI()
+    add_metrics_endpoint(app, server_timing=True)
+
+    def forward(items):
+        with span("forward"):
+            return [item * 2 for item in items]
+
+    batcher = MicroBatcher(forward, max_wait_ms=1, executor=executor)
+
+    @app.get("/double/{value}")
+    async def double(value: int):
+        return {"result": await batcher.submit(value)}
+
+    with TestClient(app) as client:
+        for value in (1, 2):
+            response = client.get(f"/double/{value}")
+            assert response.json() == {"result": value * 2}
+            # Later requests are served by the batcher task the first one started
+            assert "forward;dur=" in response.headers["Server-Timing"], value
+    assert monitor.get_stats("stage.forward")["count"] == 2
+    executor.shutdown()
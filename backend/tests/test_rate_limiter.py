@@ -0,0 +1,115 @@
+import threading
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from shared.cache import TTLCache
+from shared.rate_limiter import RateLimiter, RateLimitPolicy, add_rate_limiting
+
+def make_limiter(**kwargs):
+    return RateLimiter(backend=TTLCache(120, max_entries=1000), **kwargs)
+
+def test_sliding_window_weights_previous_window():
+    limiter = make_limiter()
+    policy = RateLimitPolicy(10, window_seconds=60)
+    # Fill the window that starts at t=0
+    assert all(limiter.check("ip:a", policy, now=30).allowed for _ in range(10))
+    assert not limiter.check("ip:a", policy, now=59).allowed
+    # A quarter into the next window, 75% of the previous count still applies
+    results = [limiter.check("ip:a", policy, now=75).allowed for _ in range(5)]
+    assert results == [True, True, False, False, False]
+
+def test_sliding_window_retry_after_and_headers():
+    limiter = make_limiter()
+    policy = RateLimitPolicy(2, window_seconds=60)
+    limiter.check("ip:a", policy, now=10)
+    first = limiter.check("ip:a", policy, now=10)
+    assert first.allowed and first.remaining == 0
+    denied = limiter.check("ip:a", policy, now=10)
+    assert not denied.allowed
+    # Both requests land in the previous window at t=60; one slot frees at t=90
+    assert abs(denied.retry_after - 80) < 1e-6
+    headers = denied.headers(now=10)
+    assert headers["X-RateLimit-Limit"] == "2"
+    assert headers["X-RateLimit-Remaining"] == "0"
+    assert headers["X-RateLimit-Reset"] == "60"
+    assert headers["Retry-After"] == "80"
+    assert limiter.check("ip:a", policy, now=90).allowed
+
+def test_token_bucket_burst_and_refill():
+    limiter = make_limiter()
+    policy = RateLimitPolicy(60, window_seconds=60, algorithm="token_bucket", burst=3)
+    assert [limiter.check("user:1", policy, now=0).allowed for _ in range(4)] == [True, True, True, False]
+    denied = limiter.check("user:1", policy, now=0)
+    assert abs(denied.retry_after - 1.0) < 1e-6
+    assert limiter.check("user:1", policy, now=1.0).allowed
+    assert not limiter.check("user:1", policy, now=1.0).allowed
+
+def test_route_policies_use_longest_prefix():
+    strict = RateLimitPolicy(1)
+    limiter = make_limiter(requests_per_minute=100, route_policies={"/v1": RateLimitPolicy(50), "/v1/analyze/face": strict})
+    assert limiter.policy_for("/v1/analyze/face") == ("/v1/analyze/face", strict)
+    assert limiter.policy_for("/v1/history")[0] == "/v1"
+    assert limiter.policy_for("/other")[1] is limiter.default_policy
+
+def test_memory_is_constant_per_client():
+    limiter = make_limiter()
+    policy = RateLimitPolicy(1000)
+    for i in range(5000):
+        limiter.check("ip:a", policy, now=i * 0.01)
+    assert len(limiter.backend) == 1
+
+def test_concurrent_checks_never_exceed_limit():
+    limiter = make_limiter()
+    policy = RateLimitPolicy(100)
+    allowed = []
+    def hammer():
+        for _ in range(50):
+            allowed.append(limiter.check("ip:a", policy, now=1).allowed)
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(allowed) == 100
+
+def make_app(limit=2, **kwargs):
+    app = FastAPI()
+    add_rate_limiting(app, requests_per_minute=limit, **kwargs)
+
+    @app.post("/v1/analyze")
+    async def analyze(request: Request):
+        return await request.json()
+
+    @app.get("/v1/history")
+    async def history(user_id: str):
+        return {"user_id": user_id}
+
+    return TestClient(app)
+
+def test_limits_are_per_user_from_body_and_query():
+    client = make_app()
+    statuses = [client.post("/v1/analyze", json={"user_id": user, "text": "hi"}).status_code
+                for user in ("1", "1", "1", "2")]
+    assert statuses == [200, 200, 429, 200]
+    # The endpoint still sees the body the middleware read
+    assert client.post("/v1/analyze", json={"user_id": 3, "text": "hi"}).json() == {"user_id": 3, "text": "hi"}
+    assert [client.get("/v1/history", params={"user_id": "4"}).status_code for _ in range(3)] == [200, 200, 429]
+    assert client.get("/v1/history", params={"user_id": "5"}).status_code == 200
+
+def test_requests_without_a_user_id_share_the_client_ip_limit(monkeypatch):
+    monkeypatch.setattr("shared.rate_limiter.IDENTITY_BODY_LIMIT", 64)
+    client = make_app()
+    large = {"user_id": "1", "image": "x" * 100}  # too large to parse for identity
+    statuses = [client.post("/v1/analyze", json=large).status_code,
+                client.post("/v1/analyze", json={"text": "no user"}).status_code,
+                client.post("/v1/analyze", json=large).status_code]
+    assert statuses == [200, 200, 429]
+
+def test_route_policies_and_apps_are_independent():
+    face = make_app(limit=100, service="face", route_policies={"/v1/analyze": RateLimitPolicy(1)})
+    text = make_app(limit=100, service="text")
+    body = {"user_id": "1"}
+    assert [face.post("/v1/analyze", json=body).status_code for _ in range(2)] == [200, 429]
+    assert face.get("/v1/history", params=body).status_code == 200
+    assert text.post("/v1/analyze", json=body).status_code == 200
+    denied = face.post("/v1/analyze", json=body)
+    assert denied.headers["X-RateLimit-Limit"] == "1" and "Retry-After" in denied.headers
@@ -0,0 +1,211 @@
+import asyncio
+import socketserver
+import threading
+import time
+import fnmatch
+import pytest
+from shared.redis_backend import RedisCache, RedisClient, RedisError
+from shared.rate_limiter import RateLimiter
+from shared import cache as cache_module
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough RESP2 for the cache and rate limiter"""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write(b"$-1\r\n")
+        elif isinstance(value, bool):
+            self.wfile.write(b"+OK\r\n")
+        elif isinstance(value, int):
+            self.wfile.write(b":%d\r\n" % value)
+        elif isinstance(value, bytes):
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+        elif isinstance(value, list):
+            self.wfile.write(b"*%d\r\n" % len(value))
+            for item in value:
+                self.reply(item)
+        elif isinstance(value, Exception):
+            self.wfile.write(b"-ERR %s\r\n" % str(value).encode())
+        else:
+            self.wfile.write(b"+%s\r\n" % str(value).encode())
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            with self.server.lock:
+                self.server.commands.append(command)
+                now = time.time()
+                for key in [k for k, (_, exp) in store.items() if exp and exp <= now]:
+                    del store[key]
+                if command == b"PING":
+                    result = "PONG"
+                elif command == b"GET":
+                    result = store.get(args[1], (None, None))[0]
+                elif command == b"MGET":
+                    result = [store.get(key, (None, None))[0] for key in args[1:]]
+                elif command == b"SET":
+                    expiry = now + int(args[4]) / 1000 if len(args) > 3 and args[3].upper() == b"PX" else None
+                    store[args[1]] = (args[2], expiry)
+                    result = True
+                elif command == b"DEL":
+                    result = sum(1 for key in args[1:] if store.pop(key, None) is not None)
+                elif command == b"INCRBY":
+                    value, expiry = store.get(args[1], (b"0", None))
+                    value = int(value) + int(args[2])
+                    store[args[1]] = (str(value).encode(), expiry)
+                    result = value
+                elif command == b"PTTL":
+                    if args[1] not in store:
+                        result = -2
+                    else:
+                        expiry = store[args[1]][1]
+                        result = int((expiry - now) * 1000) if expiry else -1
+                elif command == b"PEXPIRE":
+                    if args[1] in store:
+                        store[args[1]] = (store[args[1]][0], now + int(args[2]) / 1000)
+                    result = 1 if args[1] in store else 0
+                elif command == b"SCAN":
+                    pattern = args[3].decode()
+                    result = [b"0", [key for key in store if fnmatch.fnmatchcase(key.decode(), pattern)]]
+                else:
+                    result = Exception(f"unknown command '{command.decode()}'")
+            self.reply(result)
+            self.wfile.flush()
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.store = {}
+        self.commands = []
+        self.lock = threading.Lock()
+
+@pytest.fixture
+def redis_client():
+    server = FakeRedisServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    client = RedisClient.from_url(f"redis://{host}:{port}/0", max_connections=4)
+    client.server = server
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+def test_cache_round_trip_and_ttl(redis_client):
+    cache = RedisCache(redis_client, namespace="test", ttl_seconds=60)
+    cache.set("user:1", {"emotion": "joy", "scores": (0.9, 0.1)})
+    assert cache.get("user:1") == {"emotion": "joy", "scores": (0.9, 0.1)}
+    assert cache.get("missing") is None
+    cache.set("short", "value", ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+
+def test_pipeline_sends_commands_together(redis_client):
+    replies = redis_client.pipeline([("INCRBY", "hits", 1), ("INCRBY", "hits", 2), ("GET", "hits")])
+    assert replies == [1, 3, b"3"]
+    with pytest.raises(RedisError):
+        redis_client.pipeline([("PING",), ("BOGUS",)])
+    # The connection stays usable after an error reply
+    assert redis_client.ping()
+
+def test_clear_only_touches_namespace(redis_client):
+    first = RedisCache(redis_client, namespace="a")
+    second = RedisCache(redis_client, namespace="b")
+    first.set("k", 1)
+    second.set("k", 2)
+    first.clear()
+    assert first.get("k") is None
+    assert second.get("k") == 2
+
+def test_rate_limit_is_shared_between_workers(redis_client):
+    # Two limiters stand in for two uvicorn workers pointed at the same Redis
+    worker_a = RateLimiter(requests_per_minute=3, backend=RedisCache(redis_client, namespace="ratelimit"))
+    worker_b = RateLimiter(requests_per_minute=3, backend=RedisCache(redis_client, namespace="ratelimit"))
+    results = [worker_a.is_allowed("10.0.0.1")[0], worker_b.is_allowed("10.0.0.1")[0],
+               worker_a.is_allowed("10.0.0.1")[0], worker_b.is_allowed("10.0.0.1")[0]]
+    assert results == [True, True, True, False]
+    assert worker_a.is_allowed("10.0.0.2") == (True, 2)
+
+def test_rate_limiter_fails_open_when_backend_down(redis_client):
+    limiter = RateLimiter(requests_per_minute=1, backend=RedisCache(redis_client, namespace="ratelimit"))
+    redis_client.port = 1  # nothing listens here
+    redis_client.close()
+    assert limiter.is_allowed("10.0.0.3")[0] is True
+
+def test_async_cached_calls_keep_redis_off_the_event_loop(redis_client, monkeypatch):
+    callers = []
+
+    class RecordingCache(RedisCache):
+        def get(self, key):
+            callers.append(threading.current_thread())
+            return super().get(key)
+
+        def set(self, key, value, ttl_seconds=None):
+            callers.append(threading.current_thread())
+            super().set(key, value, ttl_seconds)
+
+    monkeypatch.setattr(cache_module, "create_cache",
+                        lambda namespace, **kwargs: RecordingCache(redis_client, namespace=namespace))
+
+    @cache_module.cache_result(ttl_seconds=60)
+    async def lookup(user_id):
+        return {"user_id": user_id}
+
+    async def run():
+        return [await lookup(5), await lookup(5)], threading.current_thread()
+
+    results, loop_thread = asyncio.run(run())
+    assert results == [{"user_id": 5}, {"user_id": 5}]
+    assert len(callers) == 3  # miss, set, hit
+    assert loop_thread not in callers
+
+def test_redis_cache_reports_hits_and_misses(redis_client):
+    from shared.monitoring import monitor
+    monitor.reset()
+    cache = RedisCache(redis_client, namespace="metrics", metrics_name="redis_test_cache")
+    cache.set("present", 1)
+    cache.get("present")
+    cache.get("absent")
+    cache.get_many(["present", "absent", "gone"])
+    counters = monitor.get_all_stats()["counters"]
+    assert counters["redis_test_cache.hit"] == 2
+    assert counters["redis_test_cache.miss"] == 3
+
+def test_shared_caches_connect_on_first_use(redis_client, monkeypatch):
+    built = []
+
+    def recording_create_cache(namespace, **kwargs):
+        built.append(namespace)
+        return RedisCache(redis_client, namespace=namespace)
+
+    monkeypatch.setattr(cache_module, "create_cache", recording_create_cache)
+    limiter = RateLimiter(requests_per_minute=5)
+
+    @cache_module.cache_result(ttl_seconds=60)
+    def lookup(user_id):
+        return {"user_id": user_id}
+
+    assert built == []
+    assert limiter.is_allowed("10.0.0.4")[0] is True
+    assert lookup(7) == {"user_id": 7}
+    assert lookup.cache.get(cache_module.make_cache_key(lookup.__wrapped__, (7,), {})) == {"user_id": 7}
+    assert len(built) == 2
@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ai_models.assistant.emotion_aware_responses import EmotionAwareResponses
+from ai_models.assistant.response_catalogue import DEFAULT_PATH, ResponseCatalogue
+
+def write_catalogue(path, **changes):
+    with open(DEFAULT_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    data.update(changes)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+def test_lookup_returns_prerendered_entries():
+    catalogue = ResponseCatalogue()
+    entry = catalogue.lookup("sadness", "medium")
+    assert entry.category == "negative"
+    assert entry.recommendations[0].startswith("Consider scheduling an appointment")
+    assert "Consider journaling your thoughts and feelings." in entry.recommendations
+    assert entry.templates["validation"] == "It's completely okay to feel sadness. Your feelings are valid."
+    assert catalogue.lookup("sadness", "medium") is entry
+    assert catalogue.lookup("joy", "high").category == "crisis"
+    assert catalogue.recommendations("surprise", "bogus") == catalogue.recommendations("neutral", "low")
+
+def test_emotion_context_uses_catalogue_guidance():
+    responses = EmotionAwareResponses(ResponseCatalogue())
+    context = responses.create_emotion_context({"emotion": "fear", "score": 0.5})
+    assert "- Validate their feelings\n" in context
+    assert "CRISIS DETECTED" in responses.create_emotion_context({"emotion": "despair", "score": 0.5})
+    assert "988" in responses.get_safety_response(True)
+
+def test_hot_reload_and_personality_overrides(tmp_path):
+    path = str(tmp_path / "catalogue.json")
+    write_catalogue(path, version="1")
+    catalogue = ResponseCatalogue(path, check_interval=0)
+    assert catalogue.version == "1"
+
+    write_catalogue(path, version="2", personality_overrides={
+        "gentle": {"rag_responses": {"general": "Take your time. I'm here with you."}}
+    })
+    os.utime(path, (1, 1))
+    assert catalogue.version == "2"
+    assert catalogue.rag_response("general", "gentle") == "Take your time. I'm here with you."
+    assert catalogue.rag_response("general") != catalogue.rag_response("general", "gentle")
+
+def test_broken_file_keeps_serving_previous_version(tmp_path):
+    path = str(tmp_path / "catalogue.json")
+    write_catalogue(path, version="7")
+    catalogue = ResponseCatalogue(path, check_interval=0)
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert catalogue.version == "7"
+    assert catalogue.lookup("anger").recommendations
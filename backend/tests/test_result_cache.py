@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "text_service"))
+
+from ai_models.assistant import response_catalogue
+from shared.cache import LRUCache
+from shared.monitoring import monitor
+from text_service.result_cache import TextResultCache, normalize_text
+
+def test_normalized_inputs_share_an_entry():
+    cache = TextResultCache()
+    cache.set("emotion", "  I'm   fine\n", "v1", ("neutral", 0.9, 0.9))
+    assert normalize_text("  I'm   fine\n") == "I'm fine"
+    assert cache.get("emotion", "I'm fine", "v1") == ("neutral", 0.9, 0.9)
+    assert cache.get("context", "I'm fine", "v1") is None
+
+def test_model_change_invalidates_entries():
+    cache = TextResultCache()
+    cache.set("emotion", "feeling anxious today", "v1", ("fear", 0.8, 0.8))
+    assert cache.get("emotion", "feeling anxious today", "v2") is None
+    # Switching back must not resurrect labels from the old model
+    assert cache.get("emotion", "feeling anxious today", "v1") is None
+
+def test_lru_respects_entry_and_byte_limits():
+    monitor.reset()
+    cache = LRUCache(max_entries=2, max_bytes=10_000, metrics_name="test_cache")
+    cache.set("a", "x")
+    cache.set("b", "y")
+    cache.get("a")
+    cache.set("c", "z")
+    assert cache.get("b") is None
+    assert cache.get("a") == "x"
+    cache.set("big", "x" * 20_000)
+    assert cache.get("big") is None
+    assert cache.current_bytes <= 10_000
+    assert monitor.counters["test_cache.eviction"] == 1
+    assert monitor.counters["test_cache.hit"] == 2
+
+def test_catalogue_reload_changes_cached_context_response(tmp_path, monkeypatch):
+    import text_analyzer
+    with open(response_catalogue.DEFAULT_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    path = str(tmp_path / "catalogue.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    monkeypatch.setattr(response_catalogue, "_catalogue", response_catalogue.ResponseCatalogue(path, check_interval=0))
+
+    analyzer = text_analyzer.TextEmotionAnalyzer()
+    first = analyzer.analyze_with_context("Today was an ordinary day")
+    assert analyzer.analyze_with_context("Today was an ordinary day") == first
+    assert analyzer.result_cache.stats()["hits"] >= 1
+
+    data["recommendations"]["risk"]["low"] = ["Take a short walk outside."]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.utime(path, (1, 1))
+    second = analyzer.analyze_with_context("Today was an ordinary day")
+    assert second["recommendations"][0] == "Take a short walk outside."
+    assert second["recommendations"] != first["recommendations"]
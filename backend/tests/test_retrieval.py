@@ -0,0 +1,40 @@
+from text_service.retrieval import RetrievalContext, max_risk, risk_from_documents
+
+class CountingBackend:
+    def __init__(self):
+        self.embeds = 0
+        self.searches = 0
+        self.docs = [
+            {"id": "a", "content": "crisis", "metadata": {"severity": "critical"}, "distance": 0.1},
+            {"id": "b", "content": "coping", "metadata": {"severity": "low"}, "distance": 0.2},
+            {"id": "c", "content": "sleep", "metadata": {"severity": "low"}, "distance": 0.3}
+        ]
+
+    def embed_query(self, text):
+        self.embeds += 1
+        return [1.0, 0.0]
+
+    def search_by_embedding(self, embedding, n_results=3):
+        self.searches += 1
+        return self.docs[:n_results]
+
+def test_one_embedding_and_one_search_per_request():
+    backend = CountingBackend()
+    retrieval = RetrievalContext("I can't go on", backend, k=3)
+    assert [doc["id"] for doc in retrieval.documents] == ["a", "b", "c"]
+    assert [doc["id"] for doc in retrieval.top(2)] == ["a", "b"]
+    assert retrieval.risk_level == "high"
+    assert backend.embeds == 1 and backend.searches == 1
+
+def test_text_only_backends_are_searched_by_query():
+    class TextBackend:
+        def search_similar_documents(self, query, n_results=3):
+            return [{"id": query, "content": "", "metadata": {"severity": "high"}, "distance": 0.0}]
+    retrieval = RetrievalContext("hello", TextBackend())
+    assert retrieval.embedding is None
+    assert retrieval.top(1)[0]["id"] == "hello"
+    assert retrieval.risk_level == "medium"
+
+def test_risk_helpers():
+    assert risk_from_documents([]) == "low"
+    assert max_risk("low", "high", "medium") == "high"
@@ -0,0 +1,63 @@
+import numpy as np
+
+from shared.monitoring import monitor
+from text_service.hybrid_retrieval import BM25Index, HybridRetriever
+from text_service.knowledge_base import KNOWLEDGE_BASE
+from text_service.semantic_cache import SemanticQueryCache
+from text_service.vector_index import HashingEmbedder, NumpyVectorIndex
+
+def unit(seed, dim=16):
+    vector = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_exact_and_neighbour_hits():
+    monitor.reset()
+    cache = SemanticQueryCache(capacity=4, threshold=0.95)
+    query = unit(1)
+    cache.put(query, 3, [{"id": "a"}, {"id": "b"}, {"id": "c"}])
+    assert [doc["id"] for doc in cache.get(query, 2)] == ["a", "b"]
+    nearby = query + 0.05 * unit(2)
+    assert cache.get(nearby, 3)[0]["id"] == "a"
+    assert cache.get(unit(3), 3) is None
+    # Stored for k=3, so a longer list is a miss
+    assert cache.get(query, 5) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["near_hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.5
+    assert monitor.counters["semantic_cache.near_hit"] == 1
+
+def test_lru_eviction_and_clear():
+    cache = SemanticQueryCache(capacity=2, threshold=0.99)
+    cache.put(unit(1), 1, [{"id": "one"}])
+    cache.put(unit(2), 1, [{"id": "two"}])
+    cache.get(unit(1), 1)
+    cache.put(unit(3), 1, [{"id": "three"}])
+    assert cache.get(unit(2), 1) is None
+    assert cache.get(unit(1), 1)[0]["id"] == "one"
+    assert cache.evictions == 1 and len(cache) == 2
+    cache.clear()
+    assert cache.get(unit(1), 1) is None
+
+class CountingIndex(NumpyVectorIndex):
+    def __init__(self, embedder):
+        super().__init__(embedder)
+        self.searches = 0
+
+    def search_by_embedding(self, embedding, n_results=3):
+        self.searches += 1
+        return super().search_by_embedding(embedding, n_results)
+
+def test_paraphrase_reuses_dense_search_but_not_lexical():
+    index = CountingIndex(HashingEmbedder())
+    index.add_documents(KNOWLEDGE_BASE)
+    bm25 = BM25Index()
+    bm25.add_documents(KNOWLEDGE_BASE)
+    hybrid = HybridRetriever(index, bm25, cache=SemanticQueryCache(threshold=0.5))
+    hybrid.search("I feel so anxious about work")
+    hybrid.search("feeling so anxious about work")
+    assert index.searches == 1
+    # Lexical matching still runs on the actual text
+    assert hybrid.search("I want to kill myself")[0]["id"] == "mhk_009"
+    hybrid.invalidate()
+    hybrid.search("I feel so anxious about work")
+    assert index.searches == 3
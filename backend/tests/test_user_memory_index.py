@@ -0,0 +1,120 @@
+import numpy as np
+from text_service.user_memory_index import UserMemoryIndex
+
+def unit_vectors(count, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_search_is_partitioned_by_user():
+    index = UserMemoryIndex(dim=32)
+    vectors = unit_vectors(20)
+    index.add_many("alice", [(f"a{i}", f"alice {i}", {"i": i}) for i in range(10)], vectors[:10])
+    index.add_many("bob", [(f"b{i}", f"bob {i}", {"i": i}) for i in range(10)], vectors[10:])
+    hits = index.search("alice", vectors[3], k=3)
+    assert hits[0]["id"] == "a3" and abs(hits[0]["distance"]) < 1e-5
+    assert all(hit["id"].startswith("a") for hit in hits)
+    assert index.search("carol", vectors[3]) == []
+
+def test_deletes_are_tombstoned_then_compacted():
+    index = UserMemoryIndex(dim=32)
+    vectors = unit_vectors(200)
+    index.add_many("u", [(f"m{i}", "", {}) for i in range(200)], vectors)
+    assert index.delete("u", "m5") and not index.delete("u", "m5")
+    assert index.search("u", vectors[5], k=1)[0]["id"] != "m5"
+    for i in range(100):
+        index.delete("u", f"m{i}")
+    assert index.count("u") == 100
+    assert index.stats()["resident_vectors"] < 200
+
+def test_ivf_recall_on_large_partition():
+    # Embeddings of real text are clustered by topic; mimic that
+    rng = np.random.default_rng(1)
+    centers = unit_vectors(40, seed=3)
+    vectors = centers[rng.integers(0, 40, 5000)] + 0.35 * unit_vectors(5000, seed=4)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = UserMemoryIndex(dim=32, ivf_threshold=1000, nprobe=8)
+    index.add_many("heavy", [(f"m{i}", "", {}) for i in range(5000)], vectors)
+    assert index._partitions["heavy"].centroids is not None
+    queries = vectors[rng.integers(0, 5000, 50)] + 0.05 * unit_vectors(50, seed=2)
+    found = 0
+    for query in queries:
+        exact = {f"m{i}" for i in np.argsort(-(vectors @ query))[:5]}
+        found += len(exact & {hit["id"] for hit in index.search("heavy", query, k=5)})
+    assert found / (50 * 5) > 0.9
+
+def test_working_set_spills_and_reloads(tmp_path):
+    index = UserMemoryIndex(dim=32, directory=str(tmp_path), max_resident_vectors=50)
+    vectors = unit_vectors(100)
+    for user in range(10):
+        rows = vectors[user * 10:(user + 1) * 10]
+        index.add_many(user, [(f"{user}-{i}", f"text {i}", {"n": i}) for i in range(10)], rows)
+    assert index.stats()["resident_vectors"] <= 50
+    assert index.stats()["spills"] > 0
+    hits = index.search(0, vectors[4], k=1)
+    assert hits[0]["id"] == "0-4" and hits[0]["metadata"] == {"n": 4}
+    assert index.stats()["loads"] >= 1
+
+def test_recency_and_counters_are_incremental():
+    index = UserMemoryIndex(dim=32)
+    vectors = unit_vectors(6)
+    stamps = ["2024-01-01", "2024-01-03", "2024-01-02", "2024-01-05", "2024-01-04", "2024-01-06"]
+    emotions = ["joy", "sadness", "joy", "fear", "joy", "sadness"]
+    index.add_many("u", [(f"m{i}", f"t{i}", {"timestamp": stamps[i], "emotion": emotions[i]}) for i in range(6)], vectors)
+    assert [m["id"] for m in index.recent("u", 3)] == ["m5", "m3", "m4"]
+    assert index.label_counts("u") == {"joy": 3, "sadness": 2, "fear": 1}
+    index.delete("u", "m3")
+    assert [m["id"] for m in index.recent("u", 2)] == ["m5", "m4"]
+    assert index.label_counts("u") == {"joy": 3, "sadness": 2}
+    index._partitions["u"].compact()
+    assert [m["id"] for m in index.recent("u", 10)] == ["m5", "m4", "m1", "m2", "m0"]
+
+def test_quantized_search_reranks_with_exact_vectors(tmp_path):
+    rng = np.random.default_rng(5)
+    centers = unit_vectors(20, seed=6)
+    vectors = centers[rng.integers(0, 20, 2000)] + 0.3 * unit_vectors(2000, seed=7)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    full = UserMemoryIndex(dim=32)
+    quantized = UserMemoryIndex(dim=32, directory=str(tmp_path), quantize=True, rerank=4)
+    items = [(f"m{i}", "", {}) for i in range(2000)]
+    full.add_many("u", items, vectors)
+    quantized.add_many("u", items, vectors)
+    quantized.flush()
+    partition = quantized._partitions["u"]
+    assert partition.tail == [] and partition.exact_rows == 2000
+    assert quantized.stats()["resident_bytes"] * 3 < full.stats()["resident_bytes"]
+
+    queries = vectors[rng.integers(0, 2000, 30)] + 0.05 * unit_vectors(30, seed=8)
+    for query in queries:
+        expected = full.search("u", query, k=5)
+        hits = quantized.search("u", query, k=5)
+        assert [hit["id"] for hit in hits] == [hit["id"] for hit in expected]
+        # Re-ranked distances are the exact ones
+        assert abs(hits[0]["distance"] - expected[0]["distance"]) < 1e-5
+
+def test_quantized_partition_survives_compaction_and_reload(tmp_path):
+    index = UserMemoryIndex(dim=32, directory=str(tmp_path), quantize=True)
+    vectors = unit_vectors(300)
+    index.add_many("u", [(f"m{i}", "", {}) for i in range(300)], vectors)
+    for i in range(100):
+        index.delete("u", f"m{i}")
+    # Compaction rewrote the spill file, so the exact vectors are on disk again
+    assert index._partitions["u"].tail == []
+    index.flush()
+    reopened = UserMemoryIndex(dim=32, directory=str(tmp_path), quantize=True)
+    hit = reopened.search("u", vectors[150], k=1)[0]
+    assert hit["id"] == "m150" and abs(hit["distance"]) < 1e-5
+
+def test_resident_count_follows_compaction_on_save(tmp_path):
+    index = UserMemoryIndex(dim=8, directory=str(tmp_path), quantize=True)
+    index.add_many("a", [(f"m{i}", "", {}) for i in range(80)], unit_vectors(80, dim=8))
+    for i in range(30):
+        index.delete("a", f"m{i}")
+    assert index.count("a") == 50
+    index.flush()
+    assert index.stats()["resident_vectors"] == 50
+    index.add_many("b", [(f"n{i}", "", {}) for i in range(60)], unit_vectors(60, dim=8, seed=1))
+    assert index.stats()["resident_vectors"] == 110
+    # Spilling "a" releases exactly what it held
+    index.max_resident_vectors = 60
+    index._evict()
+    assert index.stats()["resident_vectors"] == 60 and list(index._partitions) == ["b"]
@@ -0,0 +1,93 @@
+import numpy as np
+from text_service import vector_index
+from text_service.vector_index import HashingEmbedder, NumpyVectorIndex, documents_fingerprint
+from text_service.knowledge_base import KNOWLEDGE_BASE
+
+class RandomEmbedder:
+    name = "random-16"
+    dim = 16
+
+    def encode(self, texts):
+        rng = np.random.default_rng(abs(hash(tuple(texts))) % 2**32)
+        vectors = rng.normal(size=(len(texts), self.dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_knowledge_base_retrieval_is_query_dependent():
+    index = NumpyVectorIndex(HashingEmbedder())
+    index.add_documents(KNOWLEDGE_BASE)
+    assert index.search_similar_documents("I'm constantly worried and restless", 1)[0]["id"] == "mhk_002"
+    assert index.search_similar_documents("deep breathing and mindfulness for stress", 1)[0]["id"] == "mhk_005"
+    doc = index.get_document_by_id("mhk_001")
+    assert doc["metadata"] == {"category": "depression", "severity": "high"}
+    assert index.get_document_by_id("missing") is None
+
+def test_top_k_matches_brute_force():
+    embedder = RandomEmbedder()
+    index = NumpyVectorIndex(embedder)
+    index.add_documents([{"id": f"d{i}", "content": f"doc {i}", "metadata": {"n": i}} for i in range(200)])
+    query = embedder.encode(["query"])[0]
+    hits = index.search_by_embedding(query, n_results=5)
+    scores = index._snapshot.vectors @ query
+    expected = [f"d{i}" for i in np.argsort(-scores)[:5]]
+    assert [hit["id"] for hit in hits] == expected
+    assert hits[0]["distance"] <= hits[-1]["distance"]
+
+def test_lookups_during_a_write_see_the_previous_snapshot(monkeypatch):
+    index = NumpyVectorIndex(RandomEmbedder())
+    index.add_documents([{"id": "d0", "content": "doc 0"}])
+    seen = []
+    document_metadata = vector_index.document_metadata
+
+    def read_mid_write(doc):
+        # Runs inside add_documents, between rows being assigned and the new snapshot being published
+        seen.append([index.get_document_by_id(f"d{i}") for i in range(3)])
+        return document_metadata(doc)
+
+    monkeypatch.setattr(vector_index, "document_metadata", read_mid_write)
+    index.add_documents([{"id": f"d{i}", "content": f"doc {i}"} for i in range(1, 3)])
+    assert all(docs[0]["content"] == "doc 0" and docs[1:] == [None, None] for docs in seen)
+    assert index.get_document_by_id("d2")["content"] == "doc 2"
+
+def test_save_and_mmap_load(tmp_path):
+    index = NumpyVectorIndex(HashingEmbedder())
+    index.add_documents(KNOWLEDGE_BASE)
+    index.save(str(tmp_path))
+    loaded = NumpyVectorIndex.load(str(tmp_path), HashingEmbedder())
+    assert isinstance(loaded._snapshot.vectors, np.memmap)
+    query = "trouble sleeping and feeling sad"
+    assert loaded.search_similar_documents(query, 3) == index.search_similar_documents(query, 3)
+    # Writes after a read-only load go to a fresh in-memory matrix
+    loaded.add_documents([{"id": "mhk_001", "content": "replaced", "category": "depression", "severity": "high"}])
+    assert len(loaded) == len(KNOWLEDGE_BASE)
+    assert loaded.get_document_by_id("mhk_001")["content"] == "replaced"
+
+def test_batches_cover_every_document_in_order():
+    index = NumpyVectorIndex(RandomEmbedder())
+    index.add_documents([{"id": f"d{i}", "content": f"doc {i}", "metadata": {"n": i}} for i in range(5)])
+    batches = list(index.batches(batch_size=2))
+    assert [ids for ids, _, _, _ in batches] == [["d0", "d1"], ["d2", "d3"], ["d4"]]
+    ids, contents, metadatas, vectors = batches[1]
+    assert contents == ["doc 2", "doc 3"] and metadatas == [{"n": 2}, {"n": 3}]
+    assert vectors.shape == (2, 16) and index.search_by_embedding(vectors[1], 1)[0]["id"] == "d3"
+
+def test_open_or_build_rebuilds_when_documents_change(tmp_path):
+    NumpyVectorIndex.open_or_build(str(tmp_path), KNOWLEDGE_BASE[:2], HashingEmbedder())
+    index = NumpyVectorIndex.open_or_build(str(tmp_path), KNOWLEDGE_BASE, HashingEmbedder())
+    assert len(index) == len(KNOWLEDGE_BASE)
+    reopened = NumpyVectorIndex.open_or_build(str(tmp_path), KNOWLEDGE_BASE, HashingEmbedder())
+    assert isinstance(reopened._snapshot.vectors, np.memmap)
+
+def test_open_or_build_rebuilds_when_content_or_metadata_change(tmp_path):
+    documents = [dict(doc) for doc in KNOWLEDGE_BASE]
+    NumpyVectorIndex.open_or_build(str(tmp_path), documents, HashingEmbedder())
+    # Same ids, edited metadata
+    documents[0]["severity"] = "critical"
+    index = NumpyVectorIndex.open_or_build(str(tmp_path), documents, HashingEmbedder())
+    assert index.get_document_by_id(documents[0]["id"])["metadata"]["severity"] == "critical"
+    # Same ids, edited content
+    documents[1]["content"] = "Panic attacks and constant worry"
+    index = NumpyVectorIndex.open_or_build(str(tmp_path), documents, HashingEmbedder())
+    assert index.search_similar_documents("panic attacks", 1)[0]["id"] == documents[1]["id"]
+    reopened = NumpyVectorIndex.open_or_build(str(tmp_path), list(reversed(documents)), HashingEmbedder())
+    assert isinstance(reopened._snapshot.vectors, np.memmap)
+    assert reopened.fingerprint == documents_fingerprint(documents)
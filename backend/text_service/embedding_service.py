@@ -0,0 +1,267 @@
+"""
+Shared Embedding Service
+One embedding model per process, batched encoding and an on-disk content-hash cache
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vector_index import default_embedder
+
+
+class EmbeddingCache:
+    """
+    SQLite table of float32 vectors keyed by sha256(model name, text)
+
+    Survives restarts and is shared by every worker on the host (WAL mode),
+    so re-indexing or replaying history only encodes text never seen before.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def set_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Request:
+    __slots__ = ("texts", "vectors", "error", "done", "promoted")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.vectors: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+        # Set (with ``done``) when this waiting caller is handed leadership
+        self.promoted = False
+
+
+class EmbeddingService:
+    """
+    Process-wide embedding model with write coalescing and a persistent cache
+
+    Concurrent ``encode`` calls from different threads are merged: the first
+    caller becomes the leader, waits up to ``max_wait_ms`` for others (only
+    if calls have overlapped within the last ``busy_window`` seconds, so a
+    lone caller never waits), then encodes everything queued in chunks
+    of ``batch_size`` while the rest block on the result. The leader makes
+    one pass and returns; requests queued meanwhile are led by the oldest
+    of their callers, so no caller encodes on behalf of others indefinitely.
+    Texts already in the cache are never sent to the model.
+
+    Exposes the embedder interface (``name``, ``dim``, ``encode``) so it can
+    back NumpyVectorIndex and UserMemoryIndex directly; see
+    ``chroma_function`` and ``langchain_embeddings`` for the other clients.
+    """
+
+    busy_window = 1.0
+
+    def __init__(self, embedder=None, cache_path: Optional[str] = None,
+                 batch_size: int = 64, max_wait_ms: float = 2.0):
+        self.embedder = embedder or default_embedder()
+        self.name = self.embedder.name
+        self.dim = self.embedder.dim
+        self.cache = None
+        if cache_path:
+            try:
+                self.cache = EmbeddingCache(cache_path)
+            except (OSError, sqlite3.Error) as e:
+                # Read-only or ephemeral filesystems: encode without the disk cache
+                print(f"[EMBEDDINGS] Embedding cache at {cache_path} unavailable, continuing without it: {e}")
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: List[_Request] = []
+        self._queue_lock = threading.Lock()
+        self._leader_active = False
+        self._callers = 0
+        self._busy_until = 0.0
+        self.encoded = 0
+        self.cache_hits = 0
+
+    @classmethod
+    def from_env(cls, embedder=None) -> "EmbeddingService":
+        return cls(
+            embedder,
+            cache_path=os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3") or None,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+            max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "2"))
+        )
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized float32 embeddings, one row per text"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        request = _Request(texts)
+        with self._queue_lock:
+            self._queue.append(request)
+            if self._callers:
+                # Another call is in progress: batching pays off for a while
+                self._busy_until = time.monotonic() + self.busy_window
+            self._callers += 1
+            lead = not self._leader_active
+            if lead:
+                self._leader_active = True
+        try:
+            if not lead:
+                request.done.wait()
+                lead = request.promoted
+            if lead:
+                self._lead()
+        finally:
+            with self._queue_lock:
+                self._callers -= 1
+        if request.error is not None:
+            raise request.error
+        return request.vectors
+
+    def encode_one(self, text: str) -> np.ndarray:
+        return self.encode([text])[0]
+
+    def _lead(self):
+        """
+        Encode everything queued (the leader's own request included) in one
+        pass, then pass leadership to the oldest request queued since
+        """
+        if self.max_wait and (self._callers > 1 or time.monotonic() < self._busy_until):
+            # Calls are overlapping: give the others a moment to join this batch
+            time.sleep(self.max_wait)
+        with self._queue_lock:
+            batch, self._queue = self._queue, []
+        try:
+            vectors = self._encode_cached([text for request in batch for text in request.texts])
+            offset = 0
+            for request in batch:
+                request.vectors = vectors[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+        except BaseException as e:
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
+            with self._queue_lock:
+                if self._queue:
+                    successor = self._queue[0]
+                    successor.promoted = True
+                    successor.done.set()
+                else:
+                    self._leader_active = False
+
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        result = np.zeros((len(texts), self.dim), dtype=np.float32)
+        keys = [EmbeddingCache.key(self.name, text) for text in texts]
+        cached = self.cache.get_many(list(set(keys))) if self.cache else {}
+
+        # Identical texts in one batch are encoded once
+        missing: Dict[str, str] = {}
+        for i, key in enumerate(keys):
+            if key in cached:
+                result[i] = cached[key]
+                self.cache_hits += 1
+            else:
+                missing.setdefault(key, texts[i])
+
+        if missing:
+            miss_keys = list(missing)
+            computed: Dict[str, np.ndarray] = {}
+            for start in range(0, len(miss_keys), self.batch_size):
+                chunk = miss_keys[start:start + self.batch_size]
+                vectors = self.embedder.encode([missing[key] for key in chunk])
+                computed.update(zip(chunk, vectors))
+            self.encoded += len(computed)
+            for i, key in enumerate(keys):
+                if key in computed:
+                    result[i] = computed[key]
+            if self.cache:
+                try:
+                    self.cache.set_many(computed)
+                except sqlite3.Error as e:
+                    print(f"[EMBEDDINGS] Could not write to the embedding cache: {e}")
+        return result
+
+    def chroma_function(self) -> "ChromaEmbeddingFunction":
+        return ChromaEmbeddingFunction(self)
+
+    def langchain_embeddings(self) -> "LangChainEmbeddings":
+        return LangChainEmbeddings(self)
+
+    def stats(self) -> Dict:
+        return {"model": self.name, "encoded": self.encoded, "cache_hits": self.cache_hits}
+
+
+class ChromaEmbeddingFunction:
+    """Chroma embedding_function backed by the shared service"""
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.service.encode(input).tolist()
+
+
+class LangChainEmbeddings:
+    """LangChain Embeddings interface backed by the shared service"""
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.service.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.service.encode_one(text).tolist()
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """The process-wide embedding service, created on first use"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService.from_env()
+    return _service
@@ -0,0 +1,305 @@
+"""
+Hybrid Lexical + Dense Retrieval
+BM25 inverted index over the knowledge corpus fused with dense top-k by reciprocal rank
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .knowledge_base import document_metadata
+    from .semantic_cache import SemanticQueryCache
+except ImportError:
+    from knowledge_base import document_metadata
+    from semantic_cache import SemanticQueryCache
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Dropped before indexing and from queries; pronouns such as "myself" are
+# kept on purpose because they carry crisis phrases ("kill myself")
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could do does doing did for from had has have how i i'm im is it its
+just me my of on or so than that the their them then there these they this to too very was we were what
+when where which who will with would you your am feel feeling felt really about
+""".split())
+
+_SUFFIXES = ("ingly", "edly", "ness", "ment", "ing", "ful", "ety", "ity", "ous", "ive", "ion",
+             "ied", "ies", "al", "ed", "ly", "es", "y", "s", "e")
+
+
+def stem(word: str) -> str:
+    """
+    Light suffix stripping so inflections share a term
+    ("suicidal"/"suicide" -> "suicid", "anxious"/"anxiety" -> "anxi", "worried"/"worry" -> "worr")
+    """
+    for suffix in _SUFFIXES:
+        if suffix == "s" and word.endswith("ss"):
+            break
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Stemmed content words plus bigrams of adjacent content words
+
+    Bigrams ("kill_myself", "end_life") let a phrase outscore documents that
+    merely share one of its words.
+    """
+    words = [stem(word) for word in _WORD.findall(text.lower().replace("'", "")) if word not in STOPWORDS]
+    return words + [f"{first}_{second}" for first, second in zip(words, words[1:])]
+
+
+def corpus_fingerprint(documents: List[Dict]) -> str:
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(f"{doc['id']}\0{doc['content']}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index of term -> (doc rows, weights)
+
+    The BM25 weight of every posting is computed at build time, since it
+    only depends on the term frequency and the document length, so a query
+    is one scatter-add per query term into a score vector followed by
+    ``argpartition``. Cost grows with the postings of the query terms, not
+    with the size of the corpus.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[Dict] = []
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.fingerprint = corpus_fingerprint([])
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add_documents(self, documents: List[Dict]):
+        """Insert or replace documents and rebuild the postings"""
+        by_id = {doc["id"]: doc for doc in self.documents}
+        for doc in documents:
+            by_id[doc["id"]] = {"id": doc["id"], "content": doc["content"], "metadata": document_metadata(doc)}
+        self._build(list(by_id.values()))
+
+    def _build(self, documents: List[Dict]):
+        term_counts = [Counter(tokenize(doc["content"])) for doc in documents]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        norms = self.k1 * (1 - self.b + self.b * lengths / average)
+
+        rows: Dict[str, List[int]] = {}
+        freqs: Dict[str, List[int]] = {}
+        for row, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                rows.setdefault(term, []).append(row)
+                freqs.setdefault(term, []).append(tf)
+
+        count = len(documents)
+        postings = {}
+        for term, term_rows in rows.items():
+            term_rows = np.array(term_rows, dtype=np.int32)
+            tf = np.array(freqs[term], dtype=np.float32)
+            idf = math.log(1 + (count - len(term_rows) + 0.5) / (len(term_rows) + 0.5))
+            postings[term] = (term_rows, (idf * tf * (self.k1 + 1) / (tf + norms[term_rows])).astype(np.float32))
+
+        self.documents = documents
+        self.postings = postings
+        self.fingerprint = corpus_fingerprint(documents)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        return scores
+
+    def search(self, query: str, n_results: int = 10, min_score: float = 0.0) -> List[Tuple[Dict, float]]:
+        """(document, score) pairs with score above ``min_score``, best first"""
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores > min_score)
+        if len(candidates) == 0 or n_results <= 0:
+            return []
+        if len(candidates) > n_results:
+            candidates = candidates[np.argpartition(-scores[candidates], n_results - 1)[:n_results]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.documents[row], float(scores[row])) for row in candidates]
+
+    def save(self, path: str):
+        """Write the documents and postings as JSON (temp file, then rename)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "fingerprint": self.fingerprint,
+                "documents": self.documents,
+                "postings": {term: [rows.tolist(), weights.tolist()] for term, (rows, weights) in self.postings.items()}
+            }, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        index.documents = data["documents"]
+        index.fingerprint = data["fingerprint"]
+        index.postings = {
+            term: (np.array(rows, dtype=np.int32), np.array(weights, dtype=np.float32))
+            for term, (rows, weights) in data["postings"].items()
+        }
+        return index
+
+    @classmethod
+    def open_or_build(cls, path: Optional[str], documents: List[Dict]) -> "BM25Index":
+        """Load the index at ``path`` if it was built from ``documents``; otherwise build and save it"""
+        if path and os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.fingerprint == corpus_fingerprint(documents):
+                    return index
+            except Exception as e:
+                print(f"[BM25] Rebuilding index at {path}: {e}")
+        index = cls()
+        index.add_documents(documents)
+        if path:
+            try:
+                index.save(path)
+            except OSError as e:
+                print(f"[BM25] Could not persist index to {path}: {e}")
+        return index
+
+
+def cosine_distance_similarity(distance: float) -> float:
+    """Similarity for backends reporting 1 - cosine (NumpyVectorIndex)"""
+    return 1.0 - distance
+
+
+def l2_distance_similarity(distance: float) -> float:
+    """Similarity for backends reporting squared L2 between unit vectors (Chroma's default space)"""
+    return 1.0 - distance / 2.0
+
+
+class HybridRetriever:
+    """
+    BM25 and dense retrieval fused by reciprocal rank
+
+    Each retriever contributes ``1 / (rrf_k + rank)`` for every document in
+    its top list, so a document both retrievers agree on beats one that only
+    a single retriever ranks first, and neither score scale needs
+    calibrating against the other.
+
+    Fused hits are then kept only if one retriever is confident on its own
+    (BM25 >= ``min_bm25`` or similarity >= ``min_similarity``) or both weakly
+    agree (any BM25 match and at least half of ``min_similarity``). A
+    generic message therefore retrieves nothing rather than the nearest
+    documents regardless of distance, and severity-based risk scoring only
+    sees knowledge that actually matches the text.
+
+    ``dense`` is any backend with ``search_by_embedding`` or
+    ``search_similar_documents``; ``similarity`` converts its distances.
+
+    Dense results for an embedding are served from ``cache`` when a query
+    close enough to it was searched before, so paraphrases cost one
+    vector-store search. BM25 always runs on the actual text, so the exact
+    wording (crisis phrases in particular) still decides lexical matches.
+    Call ``invalidate()`` when documents are added.
+    """
+
+    def __init__(self, dense, bm25: BM25Index, dense_k: int = 10, lexical_k: int = 10, rrf_k: int = 60,
+                 min_bm25: float = 2.0, min_similarity: float = 0.3,
+                 similarity: Callable[[float], float] = cosine_distance_similarity,
+                 cache: Optional[SemanticQueryCache] = None):
+        self.dense = dense
+        self.bm25 = bm25
+        self.dense_k = dense_k
+        self.lexical_k = lexical_k
+        self.rrf_k = rrf_k
+        self.min_bm25 = min_bm25
+        self.min_similarity = min_similarity
+        self.similarity = similarity
+        self.cache = cache
+
+    @classmethod
+    def from_env(cls, dense, bm25: BM25Index, cache: Optional[SemanticQueryCache] = None,
+                 **kwargs) -> "HybridRetriever":
+        return cls(
+            dense,
+            bm25,
+            dense_k=int(os.getenv("HYBRID_DENSE_K", "10")),
+            lexical_k=int(os.getenv("HYBRID_LEXICAL_K", "10")),
+            rrf_k=int(os.getenv("HYBRID_RRF_K", "60")),
+            min_bm25=float(os.getenv("HYBRID_MIN_BM25", "2.0")),
+            min_similarity=float(os.getenv("HYBRID_MIN_SIMILARITY", "0.3")),
+            cache=cache or SemanticQueryCache.from_env(),
+            **kwargs
+        )
+
+    def invalidate(self):
+        """Drop cached dense results (the documents changed)"""
+        if self.cache is not None:
+            self.cache.clear()
+
+    def embed_query(self, query: str):
+        return self.dense.embed_query(query)
+
+    def search(self, query: str, embedding=None, n_results: int = 3) -> List[Dict]:
+        """
+        Fused top ``n_results`` as ``{"id", "content", "metadata", "distance",
+        "score"}``; ``distance`` is None for documents only BM25 found
+        """
+        if embedding is None and hasattr(self.dense, "embed_query"):
+            embedding = self.dense.embed_query(query)
+        if embedding is not None and hasattr(self.dense, "search_by_embedding"):
+            dense_hits = self.cache.get(embedding, self.dense_k) if self.cache is not None else None
+            if dense_hits is None:
+                dense_hits = self.dense.search_by_embedding(embedding, n_results=self.dense_k)
+                if self.cache is not None:
+                    self.cache.put(embedding, self.dense_k, dense_hits)
+        else:
+            dense_hits = self.dense.search_similar_documents(query, n_results=self.dense_k)
+        lexical_hits = self.bm25.search(query, self.lexical_k)
+
+        fused: Dict[str, Dict] = {}
+        similarities: Dict[str, float] = {}
+        lexical: Dict[str, float] = {}
+        for rank, doc in enumerate(dense_hits, 1):
+            fused[doc["id"]] = dict(doc, score=1.0 / (self.rrf_k + rank))
+            if doc.get("distance") is not None:
+                similarities[doc["id"]] = self.similarity(doc["distance"])
+        for rank, (doc, bm25_score) in enumerate(lexical_hits, 1):
+            hit = fused.get(doc["id"])
+            if hit is None:
+                hit = fused[doc["id"]] = {
+                    "id": doc["id"], "content": doc["content"], "metadata": dict(doc["metadata"]),
+                    "distance": None, "score": 0.0
+                }
+            hit["score"] += 1.0 / (self.rrf_k + rank)
+            lexical[doc["id"]] = bm25_score
+
+        relevant = [hit for hit in fused.values() if self._relevant(lexical.get(hit["id"], 0.0),
+                                                                    similarities.get(hit["id"], -1.0))]
+        return sorted(relevant, key=lambda hit: hit["score"], reverse=True)[:n_results]
+
+    def _relevant(self, bm25_score: float, similarity: float) -> bool:
+        if bm25_score >= self.min_bm25 or similarity >= self.min_similarity:
+            return True
+        return bm25_score > 0 and similarity >= self.min_similarity / 2
+
+    def search_similar_documents(self, query: str, n_results: int = 3) -> List[Dict]:
+        return self.search(query, n_results=n_results)
@@ -0,0 +1,340 @@
+"""
+Knowledge Base Ingestion
+Streams JSONL/Markdown corpora through chunking, near-duplicate removal and batched
+embedding into a versioned index artifact
+
+Usage:
+    python ingest.py corpus.jsonl guides/*.md --out ./knowledge_index
+    KNOWLEDGE_INDEX_DIR=./knowledge_index uvicorn main:app
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from embedding_service import EmbeddingService
+from hybrid_retrieval import BM25Index
+from knowledge_artifact import BM25_FILE, CURRENT_FILE, MANIFEST_FILE, publish
+from knowledge_base import KNOWLEDGE_BASE, document_metadata
+from vector_index import NumpyVectorIndex
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_SHINGLE_WORD = re.compile(r"[a-z0-9']+")
+
+
+# ---------------------------------------------------------------- readers
+
+def read_jsonl(path: str, defaults: Dict) -> Iterator[Dict]:
+    """
+    One document per line: {"id"?, "content" | "text", "category"?,
+    "severity"?, "metadata"?, ...}; other fields become metadata
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            content = record.pop("content", None) or record.pop("text", None)
+            if not content:
+                continue
+            doc_id = str(record.pop("id", f"{stem}:{line_number}"))
+            metadata = dict(defaults)
+            metadata.update(document_metadata(record))
+            metadata["source"] = path
+            yield {"id": doc_id, "content": content, "metadata": metadata}
+
+
+def read_markdown(path: str, defaults: Dict) -> Iterator[Dict]:
+    """One document per heading section; the heading becomes the title"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    title, lines, section = stem, [], 0
+
+    def flush():
+        content = " ".join(line.strip() for line in lines if line.strip())
+        if content:
+            metadata = dict(defaults, source=path, title=title)
+            return {"id": f"{stem}#{section}", "content": content, "metadata": metadata}
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            heading = _HEADING.match(line.rstrip())
+            if heading:
+                doc = flush()
+                if doc:
+                    yield doc
+                    section += 1
+                title, lines = heading.group(2).strip(), []
+            else:
+                lines.append(line)
+    doc = flush()
+    if doc:
+        yield doc
+
+
+def read_sources(paths: Iterable[str], defaults: Dict) -> Iterator[Dict]:
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            if path.endswith((".jsonl", ".ndjson")):
+                yield from read_jsonl(path, defaults)
+            elif path.endswith((".md", ".markdown", ".txt")):
+                yield from read_markdown(path, defaults)
+            else:
+                print(f"[INGEST] Skipping {path}: expected .jsonl or .md")
+
+
+# ---------------------------------------------------------------- chunking
+
+def chunk_text(text: str, max_words: int = 180, overlap_words: int = 30) -> List[str]:
+    """
+    Pack whole sentences into chunks of at most ``max_words``; each chunk
+    starts with the last ``overlap_words`` words of the previous one.
+    Sentences longer than a chunk are split on word boundaries.
+    """
+    words_per_sentence = []
+    for sentence in _SENTENCE.split(text.strip()):
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            words_per_sentence.append(words[start:start + max_words])
+
+    chunks, current = [], []
+    for words in words_per_sentence:
+        if current and len(current) + len(words) > max_words:
+            chunks.append(" ".join(current))
+            current = current[-overlap_words:] if overlap_words else []
+            if len(current) + len(words) > max_words:
+                current = []
+        current.extend(words)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_documents(documents: Iterable[Dict], max_words: int, overlap_words: int) -> Iterator[Dict]:
+    """Split documents into chunks; a document that fits in one chunk keeps its id"""
+    for doc in documents:
+        pieces = chunk_text(doc["content"], max_words, overlap_words)
+        metadata = document_metadata(doc)
+        for i, piece in enumerate(pieces):
+            chunk_metadata = dict(metadata)
+            if len(pieces) > 1:
+                chunk_metadata.update(parent_id=doc["id"], chunk=i)
+            yield {
+                "id": doc["id"] if len(pieces) == 1 else f"{doc['id']}:{i}",
+                "content": piece,
+                "metadata": chunk_metadata
+            }
+
+
+# ---------------------------------------------------------------- dedup
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash over word shingles"""
+    words = _SHINGLE_WORD.findall(text.lower())
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    digests = b"".join(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest() for gram in grams)
+    # One row of 64 bits per shingle; each bit votes +1/-1
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(len(grams), 8), axis=1)
+    votes = 2 * bits.sum(axis=0, dtype=np.int64) - len(grams)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+
+class NearDuplicateFilter:
+    """
+    Drops chunks whose SimHash is within ``max_distance`` bits of one seen
+    before
+
+    Fingerprints are split into ``max_distance + 1`` bands; two hashes that
+    close must agree exactly on at least one band (pigeonhole), so only
+    fingerprints sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = 64 // self.bands
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+        self._exact = set()
+
+    def _band_keys(self, value: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(value >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def is_duplicate(self, text: str) -> bool:
+        """True if ``text`` repeats a previous chunk; otherwise remember it"""
+        digest = hashlib.sha256(" ".join(text.split()).lower().encode("utf-8")).digest()
+        if digest in self._exact:
+            return True
+        value = simhash(text)
+        keys = self._band_keys(value)
+        for band, key in enumerate(keys):
+            for other in self._buckets[band].get(key, ()):
+                if bin(value ^ other).count("1") <= self.max_distance:
+                    return True
+        self._exact.add(digest)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(value)
+        return False
+
+
+# ---------------------------------------------------------------- artifact
+
+def build_artifact(documents: Iterable[Dict], out_root: str, embedder, batch_size: int = 256,
+                   max_words: int = 180, overlap_words: int = 30, dedup_distance: int = 3,
+                   keep_versions: int = 3) -> Dict:
+    """
+    Chunk, dedup and embed ``documents`` into ``{out_root}/{version}`` and
+    publish it as CURRENT. Vectors are streamed to disk batch by batch, so
+    memory holds one batch of vectors plus the chunk texts.
+    Returns the manifest.
+    """
+    os.makedirs(out_root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".ingest-", dir=out_root)
+    raw_path = os.path.join(staging, "vectors.f32")
+    dedup = NearDuplicateFilter(dedup_distance) if dedup_distance >= 0 else None
+    fingerprint = hashlib.sha256()
+    ids, contents, metadatas = [], [], []
+    seen_ids = set()
+    stats = {"chunks_read": 0, "duplicates_skipped": 0, "id_collisions": 0}
+    batch: List[Dict] = []
+    started = time.time()
+
+    def flush(raw):
+        if batch:
+            raw.write(np.ascontiguousarray(embedder.encode([doc["content"] for doc in batch]), dtype=np.float32).tobytes())
+            batch.clear()
+
+    try:
+        with open(raw_path, "wb") as raw:
+            for doc in chunk_documents(documents, max_words, overlap_words):
+                stats["chunks_read"] += 1
+                if doc["id"] in seen_ids:
+                    stats["id_collisions"] += 1
+                    continue
+                if dedup is not None and dedup.is_duplicate(doc["content"]):
+                    stats["duplicates_skipped"] += 1
+                    continue
+                seen_ids.add(doc["id"])
+                ids.append(doc["id"])
+                contents.append(doc["content"])
+                metadatas.append(doc["metadata"])
+                fingerprint.update(f"{doc['id']}\0{doc['content']}\0".encode("utf-8"))
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    flush(raw)
+                    print(f"[INGEST] {len(ids)} chunks embedded")
+            flush(raw)
+
+        # Raw float32 rows -> vectors.npy, copied in slices
+        count = len(ids)
+        raw_vectors = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(count, embedder.dim)) if count else None
+        vectors = np.lib.format.open_memmap(os.path.join(staging, NumpyVectorIndex.VECTORS_FILE), mode="w+",
+                                            dtype=np.float32, shape=(count, embedder.dim))
+        for start in range(0, count, 8192):
+            vectors[start:start + 8192] = raw_vectors[start:start + 8192]
+        vectors.flush()
+        del vectors, raw_vectors
+        os.remove(raw_path)
+
+        columns: Dict[str, List] = {}
+        for row, metadata in enumerate(metadatas):
+            for key, value in metadata.items():
+                columns.setdefault(key, [None] * count)[row] = value
+        with open(os.path.join(staging, NumpyVectorIndex.META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"embedder": embedder.name, "dim": embedder.dim, "ids": ids,
+                       "contents": contents, "columns": columns}, f)
+
+        bm25 = BM25Index()
+        bm25.add_documents([{"id": i, "content": c, "metadata": m} for i, c, m in zip(ids, contents, metadatas)])
+        bm25.save(os.path.join(staging, BM25_FILE))
+
+        version = time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + "-" + fingerprint.hexdigest()[:8]
+        manifest = {
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "embedder": embedder.name,
+            "dim": embedder.dim,
+            "chunks": count,
+            "fingerprint": fingerprint.hexdigest(),
+            "chunking": {"max_words": max_words, "overlap_words": overlap_words},
+            "dedup_max_distance": dedup_distance,
+            "build_seconds": round(time.time() - started, 2),
+            **stats
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        final = os.path.join(out_root, version)
+        os.replace(staging, final)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    publish(out_root, version)
+    _prune(out_root, keep_versions, version)
+    return manifest
+
+
+def _prune(out_root: str, keep: int, current: str):
+    """Remove all but the newest ``keep`` versions (never the current one)"""
+    if keep <= 0:
+        return
+    versions = sorted(
+        name for name in os.listdir(out_root)
+        if not name.startswith(".") and name != CURRENT_FILE and os.path.isdir(os.path.join(out_root, name))
+    )
+    for name in versions[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(out_root, name), ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build a versioned knowledge index from JSONL/Markdown files")
+    parser.add_argument("sources", nargs="*", help="JSONL or Markdown files (globs allowed)")
+    parser.add_argument("--out", default=os.getenv("KNOWLEDGE_INDEX_DIR", "./knowledge_index"),
+                        help="artifact root; each run adds a version and repoints CURRENT")
+    parser.add_argument("--category", default="general", help="default category for documents without one")
+    parser.add_argument("--severity", default="low", help="default severity for documents without one")
+    parser.add_argument("--no-builtin", action="store_true", help="leave out the built-in knowledge base")
+    parser.add_argument("--max-words", type=int, default=180)
+    parser.add_argument("--overlap-words", type=int, default=30)
+    parser.add_argument("--dedup-distance", type=int, default=3,
+                        help="max SimHash Hamming distance treated as duplicate (-1 disables)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--keep", type=int, default=3, help="versions to keep (0 keeps all)")
+    args = parser.parse_args(argv)
+
+    if not args.sources and args.no_builtin:
+        parser.error("nothing to ingest")
+
+    def documents():
+        if not args.no_builtin:
+            # The curated knowledge (including crisis guidance) is always indexed first
+            yield from KNOWLEDGE_BASE
+        yield from read_sources(args.sources, {"category": args.category, "severity": args.severity})
+
+    # Cache-backed, batched model shared with the services (same embedder name)
+    embedder = EmbeddingService.from_env()
+    manifest = build_artifact(
+        documents(), args.out, embedder, batch_size=args.batch_size, max_words=args.max_words,
+        overlap_words=args.overlap_words, dedup_distance=args.dedup_distance, keep_versions=args.keep
+    )
+    print(json.dumps(manifest, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
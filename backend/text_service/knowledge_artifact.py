@@ -0,0 +1,82 @@
+"""
+Knowledge Index Artifacts
+Versioned index directories written by ingest.py and memory-mapped by the services
+"""
+
+import json
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from hybrid_retrieval import BM25Index
+from vector_index import NumpyVectorIndex
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+BM25_FILE = "bm25.json"
+
+
+class KnowledgeArtifact(NamedTuple):
+    """One published version: the dense index (memory-mapped), BM25 and the manifest"""
+    directory: str
+    manifest: Dict
+    index: NumpyVectorIndex
+    bm25: BM25Index
+
+    def batches(self, batch_size: int = 512) -> Iterator[Tuple[List[str], List[str], List[Dict], np.ndarray]]:
+        """(ids, contents, metadatas, vectors) in slices, for loading into another store"""
+        return self.index.batches(batch_size)
+
+
+def current_version_dir(root: Optional[str]) -> Optional[str]:
+    """Directory of the version named in ``{root}/CURRENT``, or None if nothing is published"""
+    if not root:
+        return None
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    directory = os.path.join(root, version)
+    return directory if version and os.path.isdir(directory) else None
+
+
+def publish(root: str, version: str):
+    """Point CURRENT at ``version`` (temp file, then rename, so readers never see a partial name)"""
+    path = os.path.join(root, CURRENT_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def load_artifact(root: Optional[str], embedder=None) -> Optional[KnowledgeArtifact]:
+    """
+    Open the published version under ``root``; None when there is none.
+    Raises ValueError if it was built with a different embedder.
+    """
+    directory = current_version_dir(root)
+    if directory is None:
+        return None
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    index = NumpyVectorIndex.load(directory, embedder)
+    bm25 = BM25Index.load(os.path.join(directory, BM25_FILE))
+    return KnowledgeArtifact(directory, manifest, index, bm25)
+
+
+def load_configured_artifact(embedder=None) -> Optional[KnowledgeArtifact]:
+    """
+    The artifact under KNOWLEDGE_INDEX_DIR, or None (with a warning if one
+    exists but cannot be used) so callers fall back to the built-in knowledge
+    """
+    root = os.getenv("KNOWLEDGE_INDEX_DIR")
+    try:
+        artifact = load_artifact(root, embedder)
+    except (OSError, ValueError) as e:
+        print(f"[KNOWLEDGE] Ignoring index at {root}: {e}")
+        return None
+    if artifact is not None:
+        print(f"[KNOWLEDGE] Using index version {artifact.manifest.get('version')} "
+              f"({artifact.manifest.get('chunks')} chunks)")
+    return artifact
@@ -0,0 +1,58 @@
+"""
+Mental Health Knowledge Base
+Documents loaded into every vector database backend
+"""
+
+from typing import Dict
+
+
+def document_metadata(doc: Dict) -> Dict:
+    """
+    Metadata of a document in either accepted shape: {"id", "content",
+    "metadata"} or the flat knowledge-base shape ({"id", "content",
+    "category", "severity", ...})
+    """
+    metadata = doc.get("metadata")
+    if metadata is None:
+        metadata = {key: value for key, value in doc.items() if key not in ("id", "content")}
+    return metadata
+
+
+KNOWLEDGE_BASE = [
+    {
+        "id": "mhk_001",
+        "content": "Depression symptoms include persistent sadness, loss of interest in activities, fatigue, changes in appetite or sleep patterns, feelings of worthlessness or guilt, difficulty concentrating, and thoughts of death or suicide.",
+        "category": "depression",
+        "severity": "high"
+    },
+    {
+        "id": "mhk_002",
+        "content": "Anxiety symptoms include excessive worry, restlessness, fatigue, difficulty concentrating, irritability, muscle tension, and sleep disturbances. Panic attacks are sudden surges of intense fear with a racing heart, shortness of breath, trembling or dizziness, and can wake people at night.",
+        "category": "anxiety",
+        "severity": "medium"
+    },
+    {
+        "id": "mhk_003",
+        "content": "Stress is the strain of pressure from exams, work deadlines, money or relationships. Signs of stress include feeling overwhelmed, tension headaches, irritability, racing thoughts, and trouble switching off.",
+        "category": "stress",
+        "severity": "medium"
+    },
+    {
+        "id": "mhk_005",
+        "content": "Healthy coping strategies for stress include deep breathing exercises, regular physical activity, maintaining social connections, getting adequate sleep, and practicing mindfulness or meditation.",
+        "category": "coping",
+        "severity": "low"
+    },
+    {
+        "id": "mhk_007",
+        "content": "Self-care practices for mental wellness include maintaining a regular sleep schedule, eating a balanced diet, engaging in regular exercise, practicing relaxation techniques, and seeking social support.",
+        "category": "self-care",
+        "severity": "low"
+    },
+    {
+        "id": "mhk_009",
+        "content": "Suicidal crisis warning signs include talking about suicide or wanting to die, saying \"I want to kill myself\" or \"I want to end my life\", self-harm or urges to hurt myself, and feeling there is no reason to live. Anyone at risk of suicide should contact a crisis helpline or emergency services immediately.",
+        "category": "crisis",
+        "severity": "critical"
+    },
+]
@@ -15,12 +15,23 @@ import text_analyzer
 from models import TextInput, TextAnalysisResult, TextAnalysisResponse, ContextualAnalysisRequest, ContextualAnalysisResponse
 from text_analyzer import analyzer
 from shared.mongodb import text_collection, fix_id
+from shared.batching import MicroBatcher
+from shared.cache import cache_result
+from shared.inference_executor import InferenceExecutor, InferenceSaturatedError, saturated_exception
+from shared.lazy import add_readiness_endpoint
+from shared.monitoring import add_metrics_endpoint, span
+from shared.rate_limiter import RateLimitPolicy, add_rate_limiting
 
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(title="Text Analysis Service (MongoDB)", version="3.0.0")
 
+# Per-user limits (before CORS so preflights skip them); RAG answers cost the most
+add_rate_limiting(app, service="text", route_policies={
+    "/v1/analyze/text/contextual": RateLimitPolicy(20, 60, algorithm="token_bucket", burst=5)
+})
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,8 +41,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing and Prometheus metrics at /metrics
+add_metrics_endpoint(app)
+
+# Models load in the background after startup; /ready reports when they are warm
+add_readiness_endpoint(app, ["text_analyzer", "vector_db", "rag_system"])
+
 router = APIRouter()
 
+# Model calls run on a bounded pool so the event loop stays responsive
+inference_executor = InferenceExecutor.from_env("text")
+
+# Concurrent /analyze/text requests share one padded forward pass
+emotion_batcher = MicroBatcher.from_env(
+    analyzer.method("analyze_batch"), prefix="TEXT", max_batch_size=32, max_wait_ms=5, executor=inference_executor
+)
+
 # Routes
 @router.post("/analyze/text", response_model=TextAnalysisResponse)
 async def analyze_text(input_data: TextInput):
@@ -40,7 +65,7 @@ async def analyze_text(input_data: TextInput):
     """
     try:
         # Perform text analysis
-        emotion_label, emotion_score, confidence = analyzer.analyze_emotion(input_data.text)
+        emotion_label, emotion_score, confidence = await emotion_batcher.submit(input_data.text)
         
         # Save to MongoDB
         doc = {
@@ -52,7 +77,8 @@ async def analyze_text(input_data: TextInput):
             "created_at": datetime.utcnow()
         }
         
-        result = await text_collection.insert_one(doc)
+        with span("mongo_insert"):
+            result = await text_collection.insert_one(doc)
         doc_id = str(result.inserted_id)
         
         # Create result object
@@ -69,6 +95,8 @@ async def analyze_text(input_data: TextInput):
             result=analysis_result,
             message="Text analysis completed successfully"
         )
+    except InferenceSaturatedError as e:
+        raise saturated_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Text analysis failed: {str(e)}")
 
@@ -79,7 +107,7 @@ async def analyze_text_contextual(input_data: ContextualAnalysisRequest):
     """
     try:
         # Perform contextual analysis
-        contextual_result = analyzer.analyze_with_context(input_data.text)
+        contextual_result = await inference_executor.run(analyzer.method("analyze_with_context"), input_data.text)
         
         # Save to MongoDB
         emotion_data = contextual_result["emotion_analysis"]
@@ -93,7 +121,8 @@ async def analyze_text_contextual(input_data: ContextualAnalysisRequest):
             "risk_level": contextual_result["risk_level"],
             "created_at": datetime.utcnow()
         }
-        await text_collection.insert_one(doc)
+        with span("mongo_insert"):
+            await text_collection.insert_one(doc)
         
         # Format knowledge documents
         knowledge_docs = []
@@ -118,10 +147,13 @@ async def analyze_text_contextual(input_data: ContextualAnalysisRequest):
             result=result,
             message="Contextual text analysis completed successfully"
         )
+    except InferenceSaturatedError as e:
+        raise saturated_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Contextual text analysis failed: {str(e)}")
 
 @router.get("/analyze/emotion/history")
+@cache_result(ttl_seconds=int(os.getenv("HISTORY_CACHE_TTL", "5")))
 async def get_emotion_history(user_id: str, days: int = 30):
     """
     Get emotion history for a user from MongoDB
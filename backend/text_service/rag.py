@@ -1,6 +1,5 @@
 from langchain.chains import RetrievalQA
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.llms import HuggingFacePipeline
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
@@ -8,14 +7,27 @@ from transformers import pipeline
 import torch
 from typing import List, Dict
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from ai_models.assistant.response_catalogue import get_catalogue
+from shared.lazy import lazy
+from shared.monitoring import span
+from embedding_service import get_embedding_service
+from hybrid_retrieval import BM25Index, HybridRetriever, l2_distance_similarity
+from knowledge_artifact import load_configured_artifact
+from knowledge_base import KNOWLEDGE_BASE
+from retrieval import RetrievalContext, response_key, risk_from_documents
 
 class MentalHealthRAG:
     def __init__(self, vector_db_path: str = "./chroma_db"):
         """
         Initialize the RAG system for mental health analysis
         """
-        # Initialize embedding model
-        self.embedding_function = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+        # Embedding model shared with the vector databases
+        self.embedding_function = get_embedding_service().langchain_embeddings()
         
         # Initialize vector store
         self.vector_store = Chroma(
@@ -24,95 +36,14 @@ class MentalHealthRAG:
             collection_name="mental_health_knowledge"
         )
         
-        # Create a simple prompt template for mental health analysis
-        self.prompt_template = PromptTemplate(
-            input_variables=["context", "question"],
-            template="""
-            You are a mental health assistant. Based on the following mental health knowledge and the user's question, 
-            provide a helpful and empathetic response. Always encourage users to seek professional help when needed.
-            
-            Mental Health Knowledge:
-            {context}
-            
-            User Question:
-            {question}
-            
-            Response:
-            """
-        )
-        
-        # For this implementation, we'll use a rule-based approach instead of a full LLM
-        # to keep it lightweight and avoid requiring large model downloads
-        self.rule_based_responses = {
-            "depression": "It sounds like you might be experiencing symptoms of depression. Depression can include persistent sadness, loss of interest in activities, and changes in sleep or appetite. Please consider speaking with a mental health professional for proper evaluation and support.",
-            "anxiety": "Your description suggests anxiety symptoms. Anxiety can manifest as excessive worry, restlessness, and physical tension. Deep breathing exercises and mindfulness techniques may help, but professional guidance is recommended.",
-            "stress": "You seem to be dealing with stress. Healthy coping strategies include regular exercise, adequate sleep, and connecting with supportive friends or family. If stress becomes overwhelming, professional support can be very beneficial.",
-            "suicide": "I'm concerned about what you've shared. If you're having thoughts of self-harm, please reach out to a crisis helpline or emergency services immediately. You deserve support and care.",
-            "coping": "It's great that you're looking for coping strategies. Regular self-care practices like exercise, proper nutrition, and mindfulness can significantly improve mental wellness.",
-            "general": "Thank you for sharing your feelings. Mental health is important, and seeking support is a positive step. Consider speaking with a mental health professional for personalized guidance."
-        }
-    
-    def retrieve_relevant_context(self, query: str, k: int = 3) -> List[Dict]:
-        """
-        Retrieve relevant context from the vector database
-        """
-        # Search for similar documents
-        results = self.vector_store.similarity_search_with_score(query, k=k)
-        
-        # Format results
-        context = []
-        for doc, score in results:
-            context.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "similarity_score": float(score)
-            })
-        
-        return context
-    
-    def generate_response(self, user_input: str, emotion_label: str = None) -> str:
-        """
-        Generate a response using RAG approach
-        """
-        # Retrieve relevant context
-        context_docs = self.retrieve_relevant_context(user_input, k=3)
-        
-        # Extract context content
-        context_content = "\n".join([doc["content"] for doc in context_docs])
-        
-        # Use rule-based approach for response generation
-        if emotion_label and emotion_label.lower() in self.rule_based_responses:
-            base_response = self.rule_based_responses[emotion_label.lower()]
+        # Prebuilt BM25 index over the same knowledge (the ingested corpus when
+        # KNOWLEDGE_INDEX_DIR is set), fused with the dense search
+        artifact = load_configured_artifact(get_embedding_service())
+        if artifact is not None:
+            self.bm25 = artifact.bm25
         else:
-            # Determine response based on keywords in user input
-            input_lower = user_input.lower()
-            if any(word in input_lower for word in ["depress", "sad", "hopeless"]):
-                base_response = self.rule_based_responses["depression"]
-from langchain.chains import RetrievalQA
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.llms import HuggingFacePipeline
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from transformers import pipeline
-import torch
-from typing import List, Dict
-import os
-
-class MentalHealthRAG:
-    def __init__(self, vector_db_path: str = "./chroma_db"):
-        """
-        Initialize the RAG system for mental health analysis
-        """
-        # Initialize embedding model
-        self.embedding_function = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-        
-        # Initialize vector store
-        self.vector_store = Chroma(
-            persist_directory=vector_db_path,
-            embedding_function=self.embedding_function,
-            collection_name="mental_health_knowledge"
-        )
+            self.bm25 = BM25Index.open_or_build(os.path.join(vector_db_path, "bm25.json"), KNOWLEDGE_BASE)
+        self.hybrid = HybridRetriever.from_env(self, self.bm25, similarity=l2_distance_similarity)
         
         # Create a simple prompt template for mental health analysis
         self.prompt_template = PromptTemplate(
@@ -132,62 +63,63 @@ class MentalHealthRAG:
         )
         
         # For this implementation, we'll use a rule-based approach instead of a full LLM
-        # to keep it lightweight and avoid requiring large model downloads
-        self.rule_based_responses = {
-            "depression": "It sounds like you might be experiencing symptoms of depression. Depression can include persistent sadness, loss of interest in activities, and changes in sleep or appetite. Please consider speaking with a mental health professional for proper evaluation and support.",
-            "anxiety": "Your description suggests anxiety symptoms. Anxiety can manifest as excessive worry, restlessness, and physical tension. Deep breathing exercises and mindfulness techniques may help, but professional guidance is recommended.",
-            "stress": "You seem to be dealing with stress. Healthy coping strategies include regular exercise, adequate sleep, and connecting with supportive friends or family. If stress becomes overwhelming, professional support can be very beneficial.",
-            "suicide": "I'm concerned about what you've shared. If you're having thoughts of self-harm, please reach out to a crisis helpline or emergency services immediately. You deserve support and care.",
-            "coping": "It's great that you're looking for coping strategies. Regular self-care practices like exercise, proper nutrition, and mindfulness can significantly improve mental wellness.",
-            "general": "Thank you for sharing your feelings. Mental health is important, and seeking support is a positive step. Consider speaking with a mental health professional for personalized guidance."
-        }
+        # to keep it lightweight and avoid requiring large model downloads.
+        # The response copy lives in the hot-reloadable response catalogue.
+        self.catalogue = get_catalogue()
     
     def retrieve_relevant_context(self, query: str, k: int = 3) -> List[Dict]:
         """
         Retrieve relevant context from the vector database
+        (hybrid search; paraphrased queries are served from the semantic cache)
         """
-        # Search for similar documents
-        results = self.vector_store.similarity_search_with_score(query, k=k)
-        
-        # Format results
-        context = []
-        for doc, score in results:
-            context.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "similarity_score": float(score)
-            })
-        
-        return context
+        return [
+            {"content": doc["content"], "metadata": doc["metadata"], "similarity_score": doc["distance"]}
+            for doc in RetrievalContext(query, self, k=k).documents
+        ]
+    
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedding_function.embed_query(query)
     
-    def generate_response(self, user_input: str, emotion_label: str = None) -> str:
+    def search_by_embedding(self, embedding: List[float], n_results: int = 3) -> List[Dict]:
+        """Top-k knowledge documents for a precomputed query embedding"""
+        results = self.vector_store.similarity_search_by_vector_with_relevance_scores(embedding, k=n_results)
+        return [self._format_document(doc, score) for doc, score in results]
+    
+    def search_similar_documents(self, query: str, n_results: int = 3) -> List[Dict]:
+        results = self.vector_store.similarity_search_with_score(query, k=n_results)
+        return [self._format_document(doc, score) for doc, score in results]
+    
+    def hybrid_search(self, query: str, embedding=None, n_results: int = 3) -> List[Dict]:
+        """BM25 and dense results fused by reciprocal rank"""
+        return self.hybrid.search(query, embedding, n_results)
+    
+    @staticmethod
+    def _format_document(doc, score: float) -> Dict:
+        return {
+            "id": doc.metadata.get("id"),
+            "content": doc.page_content,
+            "metadata": doc.metadata,
+            "distance": float(score)
+        }
+    
+    def generate_response(self, user_input: str, emotion_label: str = None,
+                          context_docs: List[Dict] = None) -> str:
         """
         Generate a response using RAG approach
         """
-        # Retrieve relevant context
-        context_docs = self.retrieve_relevant_context(user_input, k=3)
+        # Retrieve relevant context, unless the caller already has it
+        if context_docs is None:
+            context_docs = self.hybrid_search(user_input, n_results=3)
         
         # Extract context content
         context_content = "\n".join([doc["content"] for doc in context_docs])
         
         # Use rule-based approach for response generation
-        if emotion_label and emotion_label.lower() in self.rule_based_responses:
-            base_response = self.rule_based_responses[emotion_label.lower()]
-        else:
-            # Determine response based on keywords in user input
-            input_lower = user_input.lower()
-            if any(word in input_lower for word in ["depress", "sad", "hopeless"]):
-                base_response = self.rule_based_responses["depression"]
-            elif any(word in input_lower for word in ["anxious", "worry", "nervous", "panic"]):
-                base_response = self.rule_based_responses["anxiety"]
-            elif any(word in input_lower for word in ["stress", "overwhelm", "pressure"]):
-                base_response = self.rule_based_responses["stress"]
-            elif any(word in input_lower for word in ["suicid", "kill myself", "end my life"]):
-                base_response = self.rule_based_responses["suicide"]
-            elif any(word in input_lower for word in ["cope", "manage", "handle"]):
-                base_response = self.rule_based_responses["coping"]
-            else:
-                base_response = self.rule_based_responses["general"]
+        base_response = None
+        if emotion_label:
+            base_response = self.catalogue.rag_response(emotion_label.lower())
+        if base_response is None:
+            base_response = self.catalogue.rag_response(response_key(context_docs, emotion_label))
         
         # Enhance response with context
         if context_content:
@@ -197,17 +129,28 @@ class MentalHealthRAG:
         
         return enhanced_response
     
-    def analyze_with_rag(self, text: str, emotion_label: str = None, user_id: int = None) -> Dict:
+    def analyze_with_rag(self, text: str, emotion_label: str = None, user_id: int = None,
+                         retrieval: RetrievalContext = None) -> Dict:
         """
         Perform comprehensive analysis using RAG
+        
+        Pass the request's RetrievalContext to reuse its single search;
+        otherwise one is created against this system's own vector store.
         """
-        # Retrieve context
-        context = self.retrieve_relevant_context(text)
+        # Retrieve context (one search, shared with response generation)
+        if retrieval is None:
+            retrieval = RetrievalContext(text, self, k=3)
+        context = [
+            {"content": doc["content"], "metadata": doc["metadata"], "similarity_score": doc["distance"]}
+            for doc in retrieval.documents
+        ]
+        knowledge = list(context)
         
         # Retrieve user memory if user_id is provided
         if user_id:
             from .vector_db import vector_db
-            user_memory = vector_db.get_user_memory(user_id, query=text, n_results=2)
+            with span("user_memory"):
+                user_memory = vector_db.get_user_memory(user_id, query=text, n_results=2)
             
             # Add memory to context
             for mem in user_memory:
@@ -218,16 +161,11 @@ class MentalHealthRAG:
                 })
         
         # Generate response
-        response = self.generate_response(text, emotion_label)
+        with span("response_generation"):
+            response = self.generate_response(text, emotion_label, context_docs=knowledge)
         
         # Determine risk level based on context
-        risk_level = "low"
-        if context:
-            severities = [doc["metadata"].get("severity", "low") for doc in context]
-            if "critical" in severities:
-                risk_level = "high"
-            elif "high" in severities:
-                risk_level = "medium"
+        risk_level = risk_from_documents(context)
         
         return {
             "response": response,
@@ -236,5 +174,5 @@ class MentalHealthRAG:
             "emotion_label": emotion_label
         }
 
-# Global instance
-rag_system = MentalHealthRAG()
\ No newline at end of file
+# Global instance, built on first use or by warmup()
+rag_system = lazy("rag_system", MentalHealthRAG)
\ No newline at end of file
@@ -1,12 +1,28 @@
 # Mock RAG system when dependencies are not available
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.lazy import lazy
+from shared.monitoring import span
+from retrieval import max_risk
 
 class MockRAGSystem:
     def __init__(self):
         """Mock RAG system that doesn't require external dependencies"""
         print("Warning: Using mock RAG system")
         
-    def analyze_with_rag(self, text: str, emotion_label: str) -> dict:
+    def analyze_with_rag(self, text: str, emotion_label: str, retrieval=None) -> dict:
         """Generate mock RAG response"""
+        with span("response_generation"):
+            result = self._generate(text, emotion_label)
+        # Escalate on retrieved knowledge the same way the real RAG system does
+        if retrieval is not None:
+            result["risk_level"] = max_risk(result["risk_level"], retrieval.risk_level)
+        return result
+    
+    def _generate(self, text: str, emotion_label: str) -> dict:
         risk_level = "low"
         
         # Simple keyword-based risk assessment
@@ -41,11 +57,12 @@ try:
             print("Loaded real RAG system")
             self.mock_rag = MockRAGSystem()
         
-        def analyze_with_rag(self, text: str, emotion_label: str) -> dict:
+        def analyze_with_rag(self, text: str, emotion_label: str, retrieval=None) -> dict:
             """Use mock for now"""
-            return self.mock_rag.analyze_with_rag(text, emotion_label)
+            return self.mock_rag.analyze_with_rag(text, emotion_label, retrieval=retrieval)
     
-    rag_system = RAGSystem()
+    # Global instance, built on first use or by warmup()
+    rag_system = lazy("rag_system", RAGSystem)
 except Exception as e:
     print(f"Error loading RAG system: {e}. Using mock RAG system.")
-    rag_system = MockRAGSystem()
+    rag_system = lazy("rag_system", MockRAGSystem)
\ No newline at end of file
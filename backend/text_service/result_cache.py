@@ -0,0 +1,95 @@
+"""
+Content-Addressed Result Cache for Text Analysis
+Reuses predictions for repeated inputs, keyed on normalized text and model version
+"""
+
+import copy
+import hashlib
+import os
+import re
+import sys
+import threading
+import unicodedata
+from typing import Any, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.cache import create_cache
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: Unicode NFKC, trimmed, whitespace collapsed.
+    Case is preserved because the emotion model is case-sensitive.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+class TextResultCache:
+    """
+    LRU + TTL cache of analysis results with a memory cap in bytes.
+
+    Keys are SHA-256 digests of (model version, analysis kind, normalized text)
+    plus an optional ``variant`` naming anything else the result was rendered
+    from (e.g. the response catalogue's fingerprint). When the model version
+    passed in differs from the one the cache was filled under, every entry is
+    dropped, so a model swap never serves stale labels.
+    """
+
+    def __init__(self, max_entries: int = 50000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.cache = create_cache(
+            "text_results",
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            ttl_seconds=ttl_seconds,
+            metrics_name="text_result_cache"
+        )
+        self.model_version: Optional[str] = None
+        self._version_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TextResultCache":
+        return cls(
+            max_entries=int(os.getenv("TEXT_RESULT_CACHE_MAX_ENTRIES", "50000")),
+            max_bytes=int(os.getenv("TEXT_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            ttl_seconds=float(os.getenv("TEXT_RESULT_CACHE_TTL", "3600"))
+        )
+
+    @staticmethod
+    def make_key(kind: str, text: str, model_version: str, variant: str = "") -> str:
+        payload = f"{model_version}\0{kind}\0{normalize_text(text)}"
+        if variant:
+            payload += f"\0{variant}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _check_version(self, model_version: str):
+        if model_version == self.model_version:
+            return
+        with self._version_lock:
+            if model_version != self.model_version:
+                # Keys embed the version, so old entries are already unreachable;
+                # clearing just frees their memory. On first use there is nothing
+                # of ours to clear (and a shared backend may hold other workers' entries)
+                if self.model_version is not None:
+                    print(f"[CACHE] Model changed ({self.model_version} -> {model_version}), clearing text results")
+                    self.cache.clear()
+                self.model_version = model_version
+
+    def get(self, kind: str, text: str, model_version: str, variant: str = "") -> Optional[Any]:
+        self._check_version(model_version)
+        value = self.cache.get(self.make_key(kind, text, model_version, variant))
+        # Hand out copies so callers can't mutate the cached dicts
+        return copy.deepcopy(value) if isinstance(value, dict) else value
+
+    def set(self, kind: str, text: str, model_version: str, value: Any, variant: str = "") -> None:
+        self._check_version(model_version)
+        self.cache.set(
+            self.make_key(kind, text, model_version, variant),
+            copy.deepcopy(value) if isinstance(value, dict) else value
+        )
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "model_version": self.model_version}
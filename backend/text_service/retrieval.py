@@ -0,0 +1,127 @@
+"""
+Per-Request Retrieval Context
+Embeds the query once and runs a single top-k search shared by every consumer
+"""
+
+import os
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.monitoring import span
+
+# Severity of retrieved knowledge -> risk level it implies
+SEVERITY_RISK = {"critical": "high", "high": "medium"}
+RISK_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+# Knowledge category of the best retrieved document -> rule-based response
+CATEGORY_RESPONSES = {
+    "crisis": "suicide",
+    "depression": "depression",
+    "anxiety": "anxiety",
+    "stress": "stress",
+    "coping": "coping",
+    "self-care": "coping"
+}
+
+# Emotion label -> rule-based response, when nothing relevant was retrieved
+EMOTION_RESPONSES = {
+    "sadness": "depression",
+    "fear": "anxiety",
+    "anger": "stress"
+}
+
+
+class RetrievalContext:
+    """
+    Lazily computed retrieval results for one request
+
+    ``backend`` is anything with ``search_similar_documents(query, n_results)``
+    returning ``{"id", "content", "metadata", "distance"}`` dicts. Backends
+    that also provide ``embed_query(text)`` and
+    ``search_by_embedding(embedding, n_results)`` get the embedding computed
+    once and reused. Backends with ``hybrid_search(query, embedding,
+    n_results)`` (BM25 fused with dense retrieval) are searched through it.
+
+    Response generation, risk scoring and the relevant_knowledge payload all
+    read ``documents`` (or a prefix of it), so the vector store is queried
+    exactly once per request however many of them run.
+
+    Usage:
+        retrieval = RetrievalContext(text, vector_db, k=3)
+        rag_result = rag_system.analyze_with_rag(text, emotion_label, retrieval=retrieval)
+        relevant_knowledge = retrieval.top(2)
+    """
+
+    def __init__(self, text: str, backend: Any, k: int = 3):
+        self.text = text
+        self.backend = backend
+        self.k = k
+        self._embedding = None
+        self._documents: Optional[List[Dict]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def embedding(self):
+        """Query embedding, or None when the backend does its own embedding"""
+        if self._embedding is None and hasattr(self.backend, "embed_query"):
+            with span("embed"):
+                self._embedding = self.backend.embed_query(self.text)
+        return self._embedding
+
+    @property
+    def documents(self) -> List[Dict]:
+        """Top-k documents for the query, best first"""
+        if self._documents is None:
+            with self._lock:
+                if self._documents is None:
+                    self._documents = self._search()
+        return self._documents
+
+    def top(self, n: int) -> List[Dict]:
+        """The best ``n`` documents; ``n`` beyond ``k`` is capped at ``k``"""
+        return self.documents[:n]
+
+    def _search(self) -> List[Dict]:
+        embedding = self.embedding
+        with span("retrieval"):
+            if hasattr(self.backend, "hybrid_search"):
+                return self.backend.hybrid_search(self.text, embedding, n_results=self.k)
+            if embedding is not None and hasattr(self.backend, "search_by_embedding"):
+                return self.backend.search_by_embedding(embedding, n_results=self.k)
+            return self.backend.search_similar_documents(self.text, n_results=self.k)
+
+    @property
+    def risk_level(self) -> str:
+        """Highest risk implied by the severity of the retrieved documents"""
+        return risk_from_documents(self.documents)
+
+
+def risk_from_documents(documents: List[Dict]) -> str:
+    severities = {(doc.get("metadata") or {}).get("severity", "low") for doc in documents}
+    for severity in ("critical", "high"):
+        if severity in severities:
+            return SEVERITY_RISK[severity]
+    return "low"
+
+
+def max_risk(*levels: str) -> str:
+    return max(levels, key=lambda level: RISK_ORDER.get(level, 0))
+
+
+def response_key(documents: List[Dict], emotion_label: Optional[str] = None) -> str:
+    """
+    Rule-based response for what was retrieved: any critical (crisis)
+    document wins, then the best document's category, then the emotion
+    label, so text the knowledge does not cover still gets a specific
+    response
+    """
+    if any((doc.get("metadata") or {}).get("severity") == "critical" for doc in documents):
+        return "suicide"
+    for doc in documents:
+        category = (doc.get("metadata") or {}).get("category")
+        if category in CATEGORY_RESPONSES:
+            return CATEGORY_RESPONSES[category]
+    return EMOTION_RESPONSES.get((emotion_label or "").lower(), "general")
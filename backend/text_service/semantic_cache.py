@@ -0,0 +1,154 @@
+"""
+Semantic Query Cache
+Reuses vector-store results for queries whose embeddings are near-identical
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.monitoring import monitor
+
+
+class SemanticQueryCache:
+    """
+    LRU cache of top-k search results keyed on the query embedding
+
+    A lookup first tries the int8-quantized embedding as an exact key (the
+    same text, or text differing only in case or spacing for most models),
+    then compares the query against every cached embedding with one
+    matrix-vector product and reuses the best entry if its cosine similarity
+    is at least ``threshold``. Paraphrases such as "I feel so anxious" and
+    "feeling very anxious" therefore share one vector-store search.
+
+    An entry stored for top ``k`` serves any request for ``k`` or fewer
+    results. Hits, near hits, misses and evictions are counted and reported
+    to the performance monitor as ``{metrics_name}.hit`` / ``.near_hit`` /
+    ``.miss`` / ``.eviction``. Call ``clear()`` whenever the indexed
+    documents change.
+    """
+
+    def __init__(self, capacity: int = 1024, threshold: float = 0.95, metrics_name: Optional[str] = "semantic_cache"):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.metrics_name = metrics_name
+        self._vectors: Optional[np.ndarray] = None   # (capacity, dim) unit rows
+        self._filled = np.zeros(capacity, dtype=bool)
+        self._entries: "OrderedDict[bytes, int]" = OrderedDict()  # {quantized key: slot}, LRU order
+        self._slots: List[Optional[tuple]] = [None] * capacity   # slot -> (key, k, results)
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SemanticQueryCache":
+        return cls(
+            capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _record(self, event: str):
+        if self.metrics_name:
+            monitor.increment_counter(f"{self.metrics_name}.{event}")
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else vector
+
+    @staticmethod
+    def _key(unit: np.ndarray) -> bytes:
+        return np.round(unit * 127).astype(np.int8).tobytes()
+
+    def get(self, embedding, k: int) -> Optional[List[Dict]]:
+        """Cached top-``k`` for this embedding or a close neighbour, else None"""
+        if not self.enabled:
+            return None
+        unit = self._unit(embedding)
+        with self.lock:
+            slot = self._entries.get(self._key(unit))
+            event = "hit"
+            if slot is None and self._vectors is not None and len(self._entries):
+                scores = self._vectors @ unit
+                scores[~self._filled] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    slot, event = best, "near_hit"
+            if slot is not None and self._slots[slot][1] < k:
+                slot = None   # cached for a shorter list
+            if slot is None:
+                self.misses += 1
+                self._record("miss")
+                return None
+            key, _, results = self._slots[slot]
+            self._entries.move_to_end(key)
+            if event == "hit":
+                self.hits += 1
+            else:
+                self.near_hits += 1
+        self._record(event)
+        return [dict(doc) for doc in results[:k]]
+
+    def put(self, embedding, k: int, results: List[Dict]):
+        """Store the top-``k`` results of a search, evicting the least recently used entry if full"""
+        if not self.enabled:
+            return
+        unit = self._unit(embedding)
+        key = self._key(unit)
+        evicted = False
+        with self.lock:
+            if self._vectors is None or self._vectors.shape[1] != len(unit):
+                self._vectors = np.zeros((self.capacity, len(unit)), dtype=np.float32)
+                self._filled[:] = False
+                self._entries.clear()
+                self._slots = [None] * self.capacity
+            slot = self._entries.get(key)
+            if slot is None:
+                if len(self._entries) >= self.capacity:
+                    _, slot = self._entries.popitem(last=False)
+                    self.evictions += 1
+                    evicted = True
+                else:
+                    slot = int(np.argmin(self._filled))
+            self._vectors[slot] = unit
+            self._filled[slot] = True
+            self._slots[slot] = (key, k, [dict(doc) for doc in results])
+            self._entries[key] = slot
+            self._entries.move_to_end(key)
+        if evicted:
+            self._record("eviction")
+
+    def clear(self):
+        with self.lock:
+            self._filled[:] = False
+            self._entries.clear()
+            self._slots = [None] * self.capacity
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0
+        }
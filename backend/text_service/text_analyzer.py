@@ -1,6 +1,4 @@
-import torch
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-from typing import Tuple
+from typing import List, Tuple
 import os
 import sys
 
@@ -10,13 +8,16 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-try:
-    from ai_models.text.inference.text_analyzer import TextAnalyzer as SharedTextAnalyzer
-except ImportError as e:
-    print(f"Warning: Could not import shared TextAnalyzer: {e}")
-    SharedTextAnalyzer = None
+def _load_shared_analyzer():
+    """Import the shared model wrapper (pulls in torch/transformers) on first construction"""
+    try:
+        from ai_models.text.inference.text_analyzer import TextAnalyzer
+        return TextAnalyzer
+    except ImportError as e:
+        print(f"Warning: Could not import shared TextAnalyzer: {e}")
+        return None
 
-# Import vector database and RAG modules
+# Import vector database and RAG modules (their globals are lazy, see shared.lazy)
 try:
     from .vector_db import vector_db
     from .rag import rag_system
@@ -34,14 +35,26 @@ except ImportError:
         vector_db = vector_db_mock.vector_db
         rag_system = rag_mock.rag_system
 
+from ai_models.assistant.response_catalogue import get_catalogue
+from result_cache import TextResultCache
+from retrieval import RetrievalContext
+from shared.lazy import lazy
+from shared.monitoring import span
+
 class TextEmotionAnalyzer:
     def __init__(self):
         # Initialize the emotion analysis model
+        SharedTextAnalyzer = _load_shared_analyzer()
         if SharedTextAnalyzer:
             self.analyzer = SharedTextAnalyzer()
+            # Report tokenize/forward time as request stages
+            self.analyzer.span = span
         else:
             print("Using fallback mock analyzer due to import error")
             self.analyzer = None
+        
+        # Repeated inputs are answered from cache until the model changes
+        self.result_cache = TextResultCache.from_env()
             
         # Fallback mock weights
         self.mock_weights = {
@@ -54,15 +67,55 @@ class TextEmotionAnalyzer:
             "neutral": ["normal", "okay", "fine", "regular", "standard", "typical", "usual", "common"]
         }
     
+    @property
+    def model_version(self) -> str:
+        """Identifier of the weights currently answering requests"""
+        if self.analyzer:
+            return getattr(self.analyzer, "model_version", "unknown")
+        return "keyword-fallback"
+    
     def analyze_emotion(self, text: str) -> Tuple[str, float, float]:
         """
         Analyze text for emotional content
         Returns: (emotion_label, emotion_score, confidence)
         """
+        model_version = self.model_version
+        cached = self.result_cache.get("emotion", text, model_version)
+        if cached is not None:
+            return cached
+        
         if self.analyzer:
-            return self.analyzer.analyze_emotion(text)
-            
-        # Fallback implementation
+            result = self.analyzer.analyze_emotion(text)
+        else:
+            result = self._analyze_fallback(text)
+        
+        self.result_cache.set("emotion", text, model_version, result)
+        return result
+    
+    def analyze_batch(self, texts: List[str]) -> List[Tuple[str, float, float]]:
+        """
+        Analyze several texts in one model call
+        Returns: list of (emotion_label, emotion_score, confidence), in input order
+        """
+        model_version = self.model_version
+        results = [self.result_cache.get("emotion", text, model_version) for text in texts]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        
+        miss_texts = [texts[i] for i in misses]
+        if self.analyzer:
+            computed = self.analyzer.analyze_batch(miss_texts)
+        else:
+            computed = [self._analyze_fallback(text) for text in miss_texts]
+        
+        for i, result in zip(misses, computed):
+            results[i] = result
+            self.result_cache.set("emotion", texts[i], model_version, result)
+        return results
+    
+    def _analyze_fallback(self, text: str) -> Tuple[str, float, float]:
+        """Keyword-based fallback used when the shared model is unavailable"""
         text_lower = text.lower()
         emotion_scores = {}
         total_matches = 0
@@ -88,16 +141,27 @@ class TextEmotionAnalyzer:
         Analyze text with vector database and RAG context
         Returns comprehensive analysis with recommendations
         """
+        model_version = self.model_version
+        # Responses and recommendations are catalogue copy: a reload must not serve old text
+        catalogue_version = get_catalogue().fingerprint
+        cached = self.result_cache.get("context", text, model_version, variant=catalogue_version)
+        if cached is not None:
+            return cached
+        
         # Get emotion analysis
         emotion_label, emotion_score, confidence = self.analyze_emotion(text)
         
+        # One embedding and one top-k search, shared by response generation,
+        # risk scoring and the relevant_knowledge payload
+        retrieval = RetrievalContext(text, vector_db, k=3)
+        
         # Get RAG-based response
-        rag_result = rag_system.analyze_with_rag(text, emotion_label)
+        rag_result = rag_system.analyze_with_rag(text, emotion_label, retrieval=retrieval)
         
-        # Search for similar documents in vector database
-        similar_docs = vector_db.search_similar_documents(text, n_results=2)
+        # Similar documents come from the same search
+        similar_docs = retrieval.top(2)
         
-        return {
+        result = {
             "emotion_analysis": {
                 "emotion_label": emotion_label,
                 "emotion_score": emotion_score,
@@ -108,35 +172,16 @@ class TextEmotionAnalyzer:
             "risk_level": rag_result["risk_level"],
             "recommendations": self._generate_recommendations(emotion_label, rag_result["risk_level"])
         }
+        
+        self.result_cache.set("context", text, model_version, result, variant=catalogue_version)
+        return result
     
     def _generate_recommendations(self, emotion_label: str, risk_level: str) -> list:
         """
         Generate personalized recommendations based on emotion and risk level
         """
-        recommendations = []
-        
-        if risk_level == "high":
-            recommendations.append("Immediate professional help is recommended. Please contact a mental health crisis helpline.")
-            recommendations.append("Reach out to trusted friends or family members for support.")
-        elif risk_level == "medium":
-            recommendations.append("Consider scheduling an appointment with a mental health professional.")
-            recommendations.append("Practice stress-reduction techniques like deep breathing or meditation.")
-        else:
-            recommendations.append("Continue practicing self-care and mindfulness.")
-            recommendations.append("Maintain regular communication with supportive friends or family.")
-        
-        # Add emotion-specific recommendations
-        if emotion_label == "sadness":
-            recommendations.append("Engage in activities that usually bring you joy or comfort.")
-            recommendations.append("Consider journaling your thoughts and feelings.")
-        elif emotion_label == "anxiety":
-            recommendations.append("Try progressive muscle relaxation or grounding techniques.")
-            recommendations.append("Limit caffeine intake which can increase anxiety.")
-        elif emotion_label == "anger":
-            recommendations.append("Practice deep breathing or counting to ten before reacting.")
-            recommendations.append("Consider physical exercise to release tension.")
-        
-        return recommendations
+        # Pre-rendered per (emotion, risk level) in the response catalogue
+        return get_catalogue().recommendations(emotion_label, risk_level)
 
-# Global instance
-analyzer = TextEmotionAnalyzer()
\ No newline at end of file
+# Global instance, built on first use or by warmup()
+analyzer = lazy("text_analyzer", TextEmotionAnalyzer)
\ No newline at end of file
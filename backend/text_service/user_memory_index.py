@@ -0,0 +1,542 @@
+"""
+Shared Per-User Memory Index
+One ANN store for every user's conversational memory, partitioned by user_id
+"""
+
+import atexit
+import bisect
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def quantize_rows(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 scalar quantization with one scale per row: row ~= codes * scale"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def asymmetric_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray, block: int = 8192) -> np.ndarray:
+    """
+    Dot products of a float query with int8 rows, without dequantizing the
+    matrix: each block of codes is widened once, multiplied by the query,
+    and the result scaled per row
+    """
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), block):
+        stop = min(start + block, len(codes))
+        scores[start:stop] = (codes[start:stop].astype(np.float32) @ query) * scales[start:stop]
+    return scores
+
+
+class _UserPartition:
+    """
+    One user's posting list: vectors in a growable float32 matrix plus
+    row-aligned ids, texts and metadata. Deletes are tombstones until
+    compaction. Large partitions also carry an IVF layout (k-means
+    centroids and a list assignment per row) so a query only scores the
+    rows of the closest lists.
+
+    Alongside the vectors it keeps a time-sorted (timestamp, row) list and
+    per-label counters, both maintained on every insert and delete, so
+    "most recent N" and label distributions never scan the partition.
+
+    Quantized partitions hold int8 codes and a float32 scale per row
+    instead (a quarter of the memory). The exact vectors of rows already
+    written to disk are read back through a memory map of the spill file
+    (``exact``, rows ``[0, exact_rows)``); rows added since are kept in
+    ``tail`` until the next save. Without ``keep_exact`` they are dropped
+    altogether and search ranks by the quantized scores only.
+    """
+
+    def __init__(self, dim: int, time_field: str = "timestamp", count_field: str = "emotion",
+                 quantized: bool = False, keep_exact: bool = True):
+        self.quantized = quantized
+        self.keep_exact = keep_exact
+        self.vectors = np.zeros((16, dim), dtype=np.int8 if quantized else np.float32)
+        self.scales = np.ones(16, dtype=np.float32) if quantized else None
+        self.exact: Optional[np.ndarray] = None
+        self.exact_rows = 0
+        self.tail: List[np.ndarray] = []
+        self.alive = np.zeros(16, dtype=bool)
+        self.size = 0
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.deleted = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(16, dtype=np.int32)
+        self.trained_size = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.time_field = time_field
+        self.count_field = count_field
+        self.recency: List[Tuple[str, int]] = []
+        self.counts: Dict[str, int] = {}
+
+    @property
+    def live_count(self) -> int:
+        return self.size - self.deleted
+
+    @property
+    def has_exact(self) -> bool:
+        return not self.quantized or self.keep_exact
+
+    @property
+    def resident_bytes(self) -> int:
+        """Memory held by the vectors (the memory-mapped exact rows are not counted)"""
+        total = self.vectors.nbytes + sum(row.nbytes for row in self.tail)
+        return total + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _grow(self, needed: int):
+        capacity = len(self.vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=self.vectors.dtype)
+        vectors[:self.size] = self.vectors[:self.size]
+        if self.quantized:
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[:self.size] = self.scales[:self.size]
+            self.scales = scales
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        assignments = np.zeros(capacity, dtype=np.int32)
+        assignments[:self.size] = self.assignments[:self.size]
+        self.vectors, self.alive, self.assignments = vectors, alive, assignments
+
+    def dense(self, rows) -> np.ndarray:
+        """Float32 vectors of ``rows`` as stored (dequantized for quantized partitions)"""
+        if not self.quantized:
+            return self.vectors[rows]
+        return self.vectors[rows].astype(np.float32) * self.scales[rows][:, None]
+
+    def exact_vectors(self, rows) -> np.ndarray:
+        """Full-precision vectors of ``rows``; dequantized if the exact ones were not kept"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not self.quantized:
+            return self.vectors[rows]
+        if not self.keep_exact:
+            return self.dense(rows)
+        out = np.empty((len(rows), self.vectors.shape[1]), dtype=np.float32)
+        on_disk = rows < self.exact_rows
+        if on_disk.any():
+            out[on_disk] = self.exact[rows[on_disk]]
+        for i in np.flatnonzero(~on_disk):
+            out[i] = self.tail[rows[i] - self.exact_rows]
+        return out
+
+    def persisted(self, exact: np.ndarray):
+        """The partition was just written with ``exact`` as its rows; serve them from there"""
+        if self.quantized and self.keep_exact:
+            self.exact, self.exact_rows, self.tail = exact, len(exact), []
+
+    def append(self, items: List[Tuple[str, str, Dict]], vectors: np.ndarray):
+        for memory_id, _, _ in items:
+            if memory_id in self.rows:
+                self.remove(memory_id)
+        start = self.size
+        self._grow(start + len(items))
+        if self.quantized:
+            codes, scales = quantize_rows(vectors)
+            self.vectors[start:start + len(items)] = codes
+            self.scales[start:start + len(items)] = scales
+            if self.keep_exact:
+                self.tail.extend(np.array(vectors, dtype=np.float32))
+        else:
+            self.vectors[start:start + len(items)] = vectors
+        self.alive[start:start + len(items)] = True
+        for offset, (memory_id, text, metadata) in enumerate(items):
+            self.rows[memory_id] = start + offset
+            self.ids.append(memory_id)
+            self.texts.append(text)
+            self.metadata.append(metadata)
+            self._track(start + offset, metadata, 1)
+            entry = (str(metadata.get(self.time_field, "")), start + offset)
+            if not self.recency or entry >= self.recency[-1]:
+                self.recency.append(entry)  # the usual case: arriving in time order
+            else:
+                bisect.insort(self.recency, entry)
+        self.size += len(items)
+        if self.centroids is not None:
+            self.assignments[start:self.size] = np.argmax(vectors @ self.centroids.T, axis=1)
+        self.dirty = True
+
+    def remove(self, memory_id: str) -> bool:
+        row = self.rows.pop(memory_id, None)
+        if row is None:
+            return False
+        self.alive[row] = False
+        self._track(row, self.metadata[row], -1)
+        self.deleted += 1
+        self.dirty = True
+        return True
+
+    def compact(self):
+        """Drop tombstoned rows"""
+        keep = np.flatnonzero(self.alive[:self.size])
+        renumber = {int(old): new for new, old in enumerate(keep)}
+        self.recency = [(stamp, renumber[row]) for stamp, row in self.recency if row in renumber]
+        if self.quantized:
+            if self.keep_exact:
+                # Row numbers change, so the exact rows move to the tail until the next save
+                self.tail, self.exact, self.exact_rows = list(self.exact_vectors(keep)), None, 0
+            self.scales = self.scales[keep]
+        self.vectors = np.ascontiguousarray(self.vectors[keep])
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.assignments = self.assignments[keep]
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadata = [self.metadata[i] for i in keep]
+        self.rows = {memory_id: row for row, memory_id in enumerate(self.ids)}
+        self.size = len(keep)
+        self.deleted = 0
+        if self.size == 0:
+            self.vectors = np.zeros((16, self.vectors.shape[1]), dtype=self.vectors.dtype)
+            if self.quantized:
+                self.scales = np.ones(16, dtype=np.float32)
+            self.alive = np.zeros(16, dtype=bool)
+            self.assignments = np.zeros(16, dtype=np.int32)
+        self.dirty = True
+
+    def _track(self, row: int, metadata: Dict[str, Any], delta: int):
+        label = str(metadata.get(self.count_field, "unknown"))
+        count = self.counts.get(label, 0) + delta
+        if count:
+            self.counts[label] = count
+        else:
+            self.counts.pop(label, None)
+
+    def recent(self, n: int) -> List[int]:
+        """Rows of the ``n`` newest live memories, newest first"""
+        rows = []
+        for _, row in reversed(self.recency):
+            if self.alive[row]:
+                rows.append(row)
+                if len(rows) == n:
+                    break
+        return rows
+
+    def train(self, iterations: int = 8, seed: int = 0):
+        """k-means (spherical) over the live rows; sqrt(n) lists"""
+        live = np.flatnonzero(self.alive[:self.size])
+        nlist = int(min(1024, max(16, np.sqrt(len(live)))))
+        rng = np.random.default_rng(seed)
+        sample = self.dense(live[rng.choice(len(live), size=min(len(live), nlist * 64), replace=False)])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    if norm > 0:
+                        centroids[c] = centroid / norm
+        self.centroids = centroids.astype(np.float32)
+        for start in range(0, self.size, 65536):
+            block = self.dense(np.arange(start, min(self.size, start + 65536)))
+            self.assignments[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        self.trained_size = self.live_count
+
+    def search(self, query: np.ndarray, k: int, nprobe: int, rerank: int = 4) -> List[Tuple[int, float]]:
+        """
+        Top-k (row, cosine) pairs. Quantized partitions score every candidate
+        against the int8 codes, then re-score the best ``k * rerank`` with the
+        exact vectors.
+        """
+        if self.centroids is not None:
+            probe = np.argpartition(-(self.centroids @ query), min(nprobe, len(self.centroids)) - 1)[:nprobe]
+            candidates = np.flatnonzero(self.alive[:self.size] & np.isin(self.assignments[:self.size], probe))
+        else:
+            candidates = np.flatnonzero(self.alive[:self.size])
+        if len(candidates) == 0:
+            return []
+        if not self.quantized:
+            scores = self.vectors[candidates] @ query
+        else:
+            scores = asymmetric_scores(self.vectors[candidates], self.scales[candidates], query)
+            shortlist = min(len(candidates), k * rerank)
+            if self.keep_exact and rerank > 1 and shortlist > 0:
+                top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+                candidates = candidates[top]
+                scores = self.exact_vectors(candidates) @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+class UserMemoryIndex:
+    """
+    Single vector store for all users' memories with a bounded working set
+
+    Each user's memories form one partition (a posting list), so a query
+    for a user only scores that user's vectors: exact search for typical
+    users, IVF (``nprobe`` of ~sqrt(n) k-means lists) once a partition
+    passes ``ivf_threshold`` memories. Inserts are incremental (amortized
+    O(1) appends, assigned to the nearest existing list), deletes are
+    tombstones compacted once a quarter of a partition is dead, and the
+    IVF layout is retrained when a partition doubles in size.
+
+    At most ``max_resident_vectors`` vectors stay in memory. The least
+    recently used partitions are spilled to ``directory`` (one .npy matrix
+    and a JSON sidecar per user) and loaded again on demand. Without a
+    directory nothing is evicted.
+
+    With ``quantize`` the resident vectors are int8 codes with a float32
+    scale per row (about 4x less memory for MiniLM-sized embeddings).
+    Queries stay float32 and are scored against the codes directly
+    (asymmetric distance); the best ``k * rerank`` candidates are then
+    re-scored with the exact vectors, which after a save are read from the
+    memory-mapped spill file rather than held in RAM. ``rerank=0`` drops
+    the exact vectors entirely.
+
+    Vectors must be L2-normalized; ``distance`` is 1 - cosine similarity.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        directory: Optional[str] = None,
+        max_resident_vectors: int = 200000,
+        ivf_threshold: int = 4096,
+        nprobe: int = 8,
+        time_field: str = "timestamp",
+        count_field: str = "emotion",
+        quantize: bool = False,
+        rerank: int = 4
+    ):
+        self.dim = dim
+        self.quantize = quantize
+        self.rerank = rerank
+        self.time_field = time_field
+        self.count_field = count_field
+        self.directory = directory
+        self.max_resident_vectors = max_resident_vectors
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._partitions: "OrderedDict[str, _UserPartition]" = OrderedDict()
+        self._resident_vectors = 0
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.spills = 0
+        if quantize and rerank > 0 and not directory:
+            print("[USER MEMORY] Quantized without a directory: exact vectors for re-ranking stay in memory")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls, dim: int) -> "UserMemoryIndex":
+        return cls(
+            dim,
+            directory=os.getenv("USER_MEMORY_INDEX_DIR", "./user_memory_index"),
+            max_resident_vectors=int(os.getenv("USER_MEMORY_MAX_RESIDENT_VECTORS", "200000")),
+            ivf_threshold=int(os.getenv("USER_MEMORY_IVF_THRESHOLD", "4096")),
+            nprobe=int(os.getenv("USER_MEMORY_IVF_NPROBE", "8")),
+            quantize=os.getenv("USER_MEMORY_QUANTIZE", "false").lower() == "true",
+            rerank=int(os.getenv("USER_MEMORY_RERANK", "4"))
+        )
+
+    def _new_partition(self) -> _UserPartition:
+        return _UserPartition(self.dim, self.time_field, self.count_field,
+                              quantized=self.quantize, keep_exact=self.rerank > 0)
+
+    # Working set
+
+    def _path(self, user_id: str) -> str:
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _partition(self, user_id: Any, create: bool = False) -> Optional[_UserPartition]:
+        user_id = str(user_id)
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is not None:
+                self._partitions.move_to_end(user_id)
+                return partition
+            partition = self._load(user_id)
+            if partition is None:
+                if not create:
+                    return None
+                partition = self._new_partition()
+            self._partitions[user_id] = partition
+            self._resident_vectors += partition.size
+            self._evict()
+            return partition
+
+    def _evict(self):
+        if not self.directory:
+            return
+        while self._resident_vectors > self.max_resident_vectors and len(self._partitions) > 1:
+            user_id, partition = self._partitions.popitem(last=False)
+            with partition.lock:
+                resident = partition.size
+                if partition.dirty:
+                    self._save(user_id, partition)
+            self._resident_vectors -= resident
+            self.spills += 1
+
+    def _save(self, user_id: str, partition: _UserPartition) -> int:
+        """Write a partition to disk; returns the rows compaction removed from memory"""
+        # Only live rows are written, so tombstones never reach disk
+        before = partition.size
+        if partition.quantized and partition.deleted:
+            partition.compact()  # the file's rows must line up with the partition's
+        keep = np.flatnonzero(partition.alive[:partition.size])
+        path = self._path(user_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".npy.tmp", "wb") as f:
+            np.save(f, partition.exact_vectors(keep))
+        with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": [partition.ids[i] for i in keep],
+                "texts": [partition.texts[i] for i in keep],
+                "metadata": [partition.metadata[i] for i in keep]
+            }, f)
+        os.replace(path + ".npy.tmp", path + ".npy")
+        os.replace(path + ".json.tmp", path + ".json")
+        partition.persisted(np.load(path + ".npy", mmap_mode="r"))
+        partition.dirty = False
+        return before - partition.size
+
+    def _load(self, user_id: str) -> Optional[_UserPartition]:
+        if not self.directory:
+            return None
+        path = self._path(user_id)
+        if not os.path.exists(path + ".json"):
+            return None
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        partition = self._new_partition()
+        if meta["ids"]:
+            vectors = np.load(path + ".npy", mmap_mode="r" if self.quantize else None)
+            partition.append(list(zip(meta["ids"], meta["texts"], meta["metadata"])), vectors)
+            partition.persisted(vectors)
+            if partition.size >= self.ivf_threshold:
+                partition.train()
+        partition.dirty = False
+        self.loads += 1
+        return partition
+
+    def flush(self):
+        """Write every modified partition to disk"""
+        if not self.directory:
+            return
+        with self._lock:
+            for user_id, partition in list(self._partitions.items()):
+                with partition.lock:
+                    if partition.dirty:
+                        self._resident_vectors -= self._save(user_id, partition)
+
+    # Memories
+
+    def add(self, user_id: Any, memory_id: str, text: str, metadata: Dict, vector: np.ndarray):
+        self.add_many(user_id, [(memory_id, text, metadata)], np.asarray(vector, dtype=np.float32)[None, :])
+
+    def add_many(self, user_id: Any, items: List[Tuple[str, str, Dict]], vectors: np.ndarray):
+        """Insert (memory_id, text, metadata) rows with their embeddings; existing ids are replaced"""
+        if not items:
+            return
+        # Writers hold the index lock so a partition can't be spilled mid-update
+        with self._lock:
+            partition = self._partition(user_id, create=True)
+            with partition.lock:
+                before = partition.size
+                partition.append(items, np.asarray(vectors, dtype=np.float32))
+                if partition.live_count >= self.ivf_threshold and partition.live_count >= 2 * partition.trained_size:
+                    partition.train()
+                self._resident_vectors += partition.size - before
+                if self.directory and len(partition.tail) >= max(1024, partition.exact_rows // 4):
+                    # Move the exact vectors added since the last save out of memory
+                    self._resident_vectors -= self._save(str(user_id), partition)
+            self._evict()
+
+    def delete(self, user_id: Any, memory_id: str) -> bool:
+        with self._lock:
+            partition = self._partition(user_id)
+            if partition is None:
+                return False
+            with partition.lock:
+                removed = partition.remove(memory_id)
+                if partition.deleted > max(64, partition.size // 4):
+                    before = partition.size
+                    partition.compact()
+                    self._resident_vectors -= before - partition.size
+                    if partition.quantized and self.directory:
+                        # Compaction pulled the exact vectors into memory; write them back out
+                        self._resident_vectors -= self._save(str(user_id), partition)
+            return removed
+
+    def search(self, user_id: Any, query: np.ndarray, k: int = 5) -> List[Dict]:
+        """Top-k of one user's memories, best first"""
+        partition = self._partition(user_id)
+        if partition is None:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        with partition.lock:
+            return [
+                {
+                    "id": partition.ids[row],
+                    "text": partition.texts[row],
+                    "metadata": partition.metadata[row],
+                    "distance": 1.0 - score
+                }
+                for row, score in partition.search(query, k, self.nprobe, self.rerank)
+            ]
+
+    def memories(self, user_id: Any) -> List[Dict]:
+        """All live memories of a user, in insertion order"""
+        partition = self._partition(user_id)
+        if partition is None:
+            return []
+        with partition.lock:
+            return [
+                {"id": partition.ids[row], "text": partition.texts[row], "metadata": partition.metadata[row]}
+                for row in np.flatnonzero(partition.alive[:partition.size])
+            ]
+
+    def recent(self, user_id: Any, n: int = 10) -> List[Dict]:
+        """The ``n`` most recent memories by timestamp, newest first"""
+        partition = self._partition(user_id)
+        if partition is None:
+            return []
+        with partition.lock:
+            return [
+                {"id": partition.ids[row], "text": partition.texts[row], "metadata": partition.metadata[row]}
+                for row in partition.recent(n)
+            ]
+
+    def label_counts(self, user_id: Any) -> Dict[str, int]:
+        """Live memories per ``count_field`` value (e.g. emotion)"""
+        partition = self._partition(user_id)
+        if partition is None:
+            return {}
+        with partition.lock:
+            return dict(partition.counts)
+
+    def count(self, user_id: Any) -> int:
+        partition = self._partition(user_id)
+        return partition.live_count if partition is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "resident_users": len(self._partitions),
+            "resident_vectors": self._resident_vectors,
+            "max_resident_vectors": self.max_resident_vectors,
+            "resident_bytes": sum(partition.resident_bytes for partition in list(self._partitions.values())),
+            "quantized": self.quantize,
+            "loads": self.loads,
+            "spills": self.spills
+        }
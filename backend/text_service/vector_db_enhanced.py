@@ -8,56 +8,120 @@ from chromadb.config import Settings
 from typing import List, Dict, Optional
 from datetime import datetime
 import json
+import os
+import re
+import sys
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.lazy import lazy
+from embedding_service import get_embedding_service
+from user_memory_index import UserMemoryIndex
+
+# Per-user Chroma collections used for memory before the shared index
+LEGACY_MEMORY_COLLECTION = re.compile(r"^user_(.+)_memory$")
 
 class EnhancedVectorDatabase:
     def __init__(self, persist_directory="./chroma_db"):
         """
-        Initialize ChromaDB with user-specific collections
+        Initialize ChromaDB for knowledge and a shared index for user memory
         """
         self.client = chromadb.Client(Settings(
             chroma_db_impl="duckdb+parquet",
             persist_directory=persist_directory
         ))
         
+        # One model instance and embedding cache for knowledge and memories
+        self.embedder = get_embedding_service()
+        
         # Main knowledge collection
         try:
-            self.knowledge_collection = self.client.get_collection("mental_health_knowledge")
+            self.knowledge_collection = self.client.get_collection(
+                "mental_health_knowledge", embedding_function=self.embedder.chroma_function()
+            )
         except:
             self.knowledge_collection = self.client.create_collection(
                 name="mental_health_knowledge",
-                metadata={"description": "General mental health knowledge base"}
+                metadata={"description": "General mental health knowledge base"},
+                embedding_function=self.embedder.chroma_function()
             )
         
-        # User memory collections (created on-demand)
-        self.user_collections = {}
+        # Every user's memories live in one shared index, partitioned by user
+        self.user_memory = UserMemoryIndex.from_env(self.embedder.dim)
+        
+        # Users whose legacy collection has been checked (and moved) in this process
+        self._migrated = set()
+        self._migration_lock = threading.Lock()
+        legacy = self._legacy_memory_collections()
+        if legacy:
+            print(f"[USER MEMORY] {len(legacy)} legacy user_<id>_memory collections found; each is moved into "
+                  "the shared index on its user's first access (migrate_legacy_user_memories() moves all now)")
     
-    def get_user_collection(self, user_id: int):
+    def _legacy_memory_collections(self) -> List[str]:
+        try:
+            names = [getattr(collection, "name", collection) for collection in self.client.list_collections()]
+        except Exception:
+            return []
+        return [name for name in names if LEGACY_MEMORY_COLLECTION.match(name)]
+    
+    def _migrate_user(self, user_id) -> int:
         """
-        Get or create user-specific memory collection
+        Move a user's memories from the old per-user Chroma collection into
+        the shared index (re-embedded, original ids kept), then drop the
+        collection. Runs once per user per process; returns memories moved.
         """
-        collection_name = f"user_{user_id}_memory"
-        
-        if collection_name not in self.user_collections:
+        user_key = str(user_id)
+        if user_key in self._migrated:
+            return 0
+        with self._migration_lock:
+            if user_key in self._migrated:
+                return 0
+            name = f"user_{user_key}_memory"
             try:
-                collection = self.client.get_collection(collection_name)
-            except:
-                collection = self.client.create_collection(
-                    name=collection_name,
-                    metadata={
-                        "description": f"Conversational memory for user {user_id}",
-                        "user_id": str(user_id)
-                    }
-                )
-            self.user_collections[collection_name] = collection
-        
-        return self.user_collections[collection_name]
+                collection = self.client.get_collection(name)
+            except Exception:
+                # No legacy collection for this user
+                self._migrated.add(user_key)
+                return 0
+            try:
+                legacy = collection.get()
+                entries = []
+                for memory_id, text, metadata in zip(legacy["ids"], legacy["documents"] or [],
+                                                     legacy["metadatas"] or [{}] * len(legacy["ids"])):
+                    metadata = dict(metadata or {})
+                    entries.append({
+                        "id": memory_id,
+                        "text": text,
+                        "emotion": metadata.pop("emotion", "unknown"),
+                        "timestamp": metadata.pop("timestamp", None),
+                        "metadata": metadata
+                    })
+                for start in range(0, len(entries), 512):
+                    self._add_memories(user_id, entries[start:start + 512])
+                self.user_memory.flush()
+                self.client.delete_collection(name)
+            except Exception as e:
+                # Left in place and retried on the next access
+                print(f"[USER MEMORY] Could not migrate {name}: {e}")
+                return 0
+            self._migrated.add(user_key)
+            if entries:
+                print(f"[USER MEMORY] Migrated {len(entries)} memories of user {user_key} from {name}")
+            return len(entries)
+    
+    def migrate_legacy_user_memories(self) -> int:
+        """Move every legacy per-user memory collection into the shared index now"""
+        return sum(
+            self._migrate_user(LEGACY_MEMORY_COLLECTION.match(name).group(1))
+            for name in self._legacy_memory_collections()
+        )
     
     def add_user_memory(self, user_id: int, text: str, emotion: str, metadata: Optional[Dict] = None):
         """
         Add a conversation to user's memory
         """
-        collection = self.get_user_collection(user_id)
-        
+        self._migrate_user(user_id)
         memory_id = f"mem_{user_id}_{datetime.now().timestamp()}"
         
         memory_metadata = {
@@ -67,67 +131,77 @@ class EnhancedVectorDatabase:
             **(metadata or {})
         }
         
-        collection.add(
-            documents=[text],
-            metadatas=[memory_metadata],
-            ids=[memory_id]
-        )
+        self.user_memory.add(user_id, memory_id, text, memory_metadata, self.embedder.encode_one(text))
         
         return memory_id
     
+    def add_user_memories_bulk(self, user_id: int, entries: List[Dict]) -> List[str]:
+        """
+        Add many conversations to a user's memory with one batched encode,
+        e.g. when backfilling or replaying chat history.
+        Each entry: {"text", "emotion", optional "timestamp", optional "metadata",
+        optional "id" (an existing id is replaced)}
+        """
+        self._migrate_user(user_id)
+        return self._add_memories(user_id, entries)
+    
+    def _add_memories(self, user_id, entries: List[Dict]) -> List[str]:
+        if not entries:
+            return []
+        
+        now = datetime.now()
+        items = []
+        for i, entry in enumerate(entries):
+            timestamp = entry.get("timestamp") or now.isoformat()
+            memory_id = entry.get("id") or f"mem_{user_id}_{now.timestamp()}_{i}"
+            items.append((memory_id, entry["text"], {
+                "user_id": str(user_id),
+                "emotion": entry.get("emotion", "unknown"),
+                "timestamp": timestamp,
+                **(entry.get("metadata") or {})
+            }))
+        
+        vectors = self.embedder.encode([text for _, text, _ in items])
+        self.user_memory.add_many(user_id, items, vectors)
+        
+        return [memory_id for memory_id, _, _ in items]
+    
+    def delete_user_memory(self, user_id: int, memory_id: str) -> bool:
+        """
+        Remove one memory from a user's history
+        """
+        self._migrate_user(user_id)
+        return self.user_memory.delete(user_id, memory_id)
+    
     def get_user_context(self, user_id: int, current_text: str, n_results: int = 5) -> List[Dict]:
         """
         Retrieve relevant context from user's memory
         """
-        collection = self.get_user_collection(user_id)
-        
         try:
-            results = collection.query(
-                query_texts=[current_text],
-                n_results=n_results
-            )
-            
-            contexts = []
-            if results['documents'] and len(results['documents']) > 0:
-                for i, doc in enumerate(results['documents'][0]):
-                    contexts.append({
-                        'text': doc,
-                        'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                        'distance': results['distances'][0][i] if results['distances'] else 0
-                    })
-            
-            return contexts
-        except:
+            self._migrate_user(user_id)
+            query = self.embedder.encode_one(current_text)
+            return [
+                {'text': hit['text'], 'metadata': hit['metadata'], 'distance': hit['distance']}
+                for hit in self.user_memory.search(user_id, query, n_results)
+            ]
+        except Exception:
             return []
     
     def get_session_continuity(self, user_id: int, session_limit: int = 10) -> List[Dict]:
         """
-        Get recent session history for continuity
+        Get recent session history for continuity (newest first)
         """
-        collection = self.get_user_collection(user_id)
-        
         try:
-            # Get all memories and sort by timestamp
-            all_memories = collection.get()
-            
-            if not all_memories['documents']:
-                return []
-            
-            # Combine and sort by timestamp
-            memories = []
-            for i, doc in enumerate(all_memories['documents']):
-                metadata = all_memories['metadatas'][i] if all_memories['metadatas'] else {}
-                memories.append({
-                    'text': doc,
-                    'metadata': metadata,
-                    'timestamp': metadata.get('timestamp', '')
-                })
-            
-            # Sort by timestamp descending
-            memories.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            return memories[:session_limit]
-        except:
+            self._migrate_user(user_id)
+            return [
+                {
+                    'text': memory['text'],
+                    'metadata': memory['metadata'],
+                    'timestamp': memory['metadata'].get('timestamp', '')
+                }
+                for memory in self.user_memory.recent(user_id, session_limit)
+            ]
+        except Exception:
             return []
     
     def search_knowledge(self, query: str, n_results: int = 3) -> List[Dict]:
@@ -177,26 +251,15 @@ class EnhancedVectorDatabase:
         """
         Get statistics about user's memory
         """
-        collection = self.get_user_collection(user_id)
-        
         try:
-            all_memories = collection.get()
-            total_memories = len(all_memories['documents']) if all_memories['documents'] else 0
-            
-            # Count emotions
-            emotion_counts = {}
-            if all_memories['metadatas']:
-                for metadata in all_memories['metadatas']:
-                    emotion = metadata.get('emotion', 'unknown')
-                    emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-            
+            self._migrate_user(user_id)
+            # Counters are maintained on write; nothing is scanned here
             return {
-                'total_memories': total_memories,
-                'emotion_distribution': emotion_counts,
-                'collection_name': collection.name
+                'total_memories': self.user_memory.count(user_id),
+                'emotion_distribution': self.user_memory.label_counts(user_id)
             }
-        except:
+        except Exception:
             return {'total_memories': 0, 'emotion_distribution': {}}
 
-# Global instance
-vector_db = EnhancedVectorDatabase()
+# Global instance, built on first use or by warmup()
+vector_db = lazy("vector_db_enhanced", EnhancedVectorDatabase)
@@ -1,39 +1,62 @@
 # Mock vector database when chromadb is not available
+import os
+import sys
+from datetime import datetime
 from typing import List, Dict
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.lazy import lazy
+
+from embedding_service import get_embedding_service
+from hybrid_retrieval import BM25Index, HybridRetriever, l2_distance_similarity
+from knowledge_artifact import load_configured_artifact
+from knowledge_base import KNOWLEDGE_BASE, document_metadata
+from vector_index import NumpyVectorIndex
+
 class MockVectorDatabase:
-    def __init__(self, persist_directory: str = "./chroma_db"):
-        """Mock vector database that doesn't require chromadb"""
-        print("Warning: Using mock vector database (chromadb not installed)")
-        self.knowledge_base = [
-            {
-                "id": "mhk_005",
-                "content": "Healthy coping strategies for stress include deep breathing exercises, regular physical activity, maintaining social connections, getting adequate sleep, and practicing mindfulness or meditation.",
-                "metadata": {"category": "coping", "severity": "low"},
-                "distance": 0.1
-            },
-            {
-                "id": "mhk_007",
-                "content": "Self-care practices for mental wellness include maintaining a regular sleep schedule, eating a balanced diet, engaging in regular exercise, practicing relaxation techniques, and seeking social support.",
-                "metadata": {"category": "self-care", "severity": "low"},
-                "distance": 0.2
-            }
-        ]
+    def __init__(self, persist_directory: str = None):
+        """
+        Vector database that doesn't require chromadb: the knowledge base is
+        served from an in-process NumPy index, memory-mapped from disk, with
+        a prebuilt BM25 index saved next to it for hybrid retrieval. When
+        KNOWLEDGE_INDEX_DIR holds an index built by ingest.py, both are
+        opened from there instead.
+        """
+        print("Warning: Using in-process vector index (chromadb not installed)")
+        if persist_directory is None:
+            persist_directory = os.getenv("VECTOR_INDEX_DIR", "./vector_index")
+        artifact = load_configured_artifact(get_embedding_service())
+        if artifact is not None:
+            self.index, self.bm25 = artifact.index, artifact.bm25
+        else:
+            self.index = NumpyVectorIndex.open_or_build(persist_directory, KNOWLEDGE_BASE, get_embedding_service())
+            self.bm25 = BM25Index.open_or_build(os.path.join(persist_directory, "bm25.json"), KNOWLEDGE_BASE)
+        self.hybrid = HybridRetriever.from_env(self.index, self.bm25)
     
     def add_documents(self, documents: List[Dict]):
-        """Mock method - does nothing"""
-        pass
+        """Add documents to the index (not persisted)"""
+        self.index.add_documents(documents)
+        self.bm25.add_documents(documents)
+        self.hybrid.invalidate()
+    
+    def hybrid_search(self, query: str, embedding=None, n_results: int = 3) -> List[Dict]:
+        """BM25 and dense results fused by reciprocal rank"""
+        return self.hybrid.search(query, embedding, n_results)
+    
+    def embed_query(self, query: str):
+        return self.index.embed_query(query)
+    
+    def search_by_embedding(self, embedding, n_results: int = 3) -> List[Dict]:
+        return self.index.search_by_embedding(embedding, n_results)
     
     def search_similar_documents(self, query: str, n_results: int = 3) -> List[Dict]:
-        """Return mock similar documents"""
-        return self.knowledge_base[:n_results]
+        """Search for similar documents in the index"""
+        return self.index.search_similar_documents(query, n_results)
     
     def get_document_by_id(self, doc_id: str) -> Dict:
-        """Mock method"""
-        for doc in self.knowledge_base:
-            if doc["id"] == doc_id:
-                return doc
-        return None
+        """Retrieve a specific document by ID"""
+        return self.index.get_document_by_id(doc_id)
     
     def add_user_memory(self, user_id: int, text: str, metadata: Dict = None):
         """Mock method - does nothing"""
@@ -43,116 +66,143 @@ class MockVectorDatabase:
         """Mock method - returns empty list"""
         return []
 
-# Try to import real implementation, otherwise use mock
-try:
-    import chromadb
-    from chromadb.utils import embedding_functions
-    from sentence_transformers import SentenceTransformer
-    from typing import List, Dict, Tuple
-    import os
-    import json
-    from datetime import datetime
-    
-    class VectorDatabase:
-        def __init__(self, persist_directory: str = "./chroma_db"):
-            """
-            Initialize the vector database for storing and retrieving mental health related text embeddings
-            """
-            self.client = chromadb.PersistentClient(path=persist_directory)
-            self.collection_name = "mental_health_knowledge"
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection_name,
-                embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(
-                    model_name="all-MiniLM-L6-v2"
-                )
+# Chroma-backed implementation; chromadb is imported when it is constructed
+class VectorDatabase:
+    def __init__(self, persist_directory: str = "./chroma_db"):
+        """
+        Initialize the vector database for storing and retrieving mental health related text embeddings
+        """
+        import chromadb
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.collection_name = "mental_health_knowledge"
+        self.collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            # Shares the process-wide model and embedding cache
+            embedding_function=get_embedding_service().chroma_function()
+        )
+        self.embeddings = get_embedding_service()
+        artifact = load_configured_artifact(self.embeddings)
+        if artifact is not None:
+            self.bm25 = artifact.bm25
+        else:
+            self.bm25 = BM25Index.open_or_build(os.path.join(persist_directory, "bm25.json"), KNOWLEDGE_BASE)
+        # Chroma reports squared L2 distances between unit vectors
+        self.hybrid = HybridRetriever.from_env(self, self.bm25, similarity=l2_distance_similarity)
+        self._initialize_knowledge_base(artifact)
+    
+    def _initialize_knowledge_base(self, artifact=None):
+        """Initialize the vector database with mental health knowledge"""
+        # The BM25 index was already opened from the same documents
+        if artifact is None:
+            self._add_to_collection(KNOWLEDGE_BASE)
+            return
+        # Ingested corpus: load the precomputed vectors instead of re-embedding
+        for ids, contents, metadatas, vectors in artifact.batches():
+            self._add_to_collection(
+                [{"id": i, "content": c, "metadata": m} for i, c, m in zip(ids, contents, metadatas)],
+                vectors
             )
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            self._initialize_knowledge_base()
-        
-        def _initialize_knowledge_base(self):
-            """Initialize the vector database with mental health knowledge"""
-            knowledge_base = [
-                {
-                    "id": "mhk_001",
-                    "content": "Depression symptoms include persistent sadness, loss of interest in activities, fatigue, changes in appetite or sleep patterns, feelings of worthlessness or guilt, difficulty concentrating, and thoughts of death or suicide.",
-                    "category": "depression",
-                    "severity": "high"
-                },
-                {
-                    "id": "mhk_002",
-                    "content": "Anxiety symptoms include excessive worry, restlessness, fatigue, difficulty concentrating, irritability, muscle tension, and sleep disturbances.",
-                    "category": "anxiety",
-                    "severity": "medium"
-                },
-                {
-                    "id": "mhk_005",
-                    "content": "Healthy coping strategies for stress include deep breathing exercises, regular physical activity, maintaining social connections, getting adequate sleep, and practicing mindfulness or meditation.",
-                    "category": "coping",
-                    "severity": "low"
-                },
-            ]
-            self.add_documents(knowledge_base)
-        
-        def add_documents(self, documents: List[Dict]):
-            """Add documents to the vector database"""
-            ids = [doc["id"] for doc in documents]
-            contents = [doc["content"] for doc in documents]
-            metadatas = [{"category": doc["category"], "severity": doc["severity"]} for doc in documents]
-            self.collection.add(ids=ids, documents=contents, metadatas=metadatas)
-        
-        def search_similar_documents(self, query: str, n_results: int = 3) -> List[Dict]:
-            """Search for similar documents in the vector database"""
-            results = self.collection.query(query_texts=[query], n_results=n_results)
+    
+    def add_documents(self, documents: List[Dict]):
+        """Add documents to the vector database"""
+        self._add_to_collection(documents)
+        self.bm25.add_documents(documents)
+        self.hybrid.invalidate()
+    
+    def _add_to_collection(self, documents: List[Dict], embeddings=None):
+        """Add documents whose ids are not in the collection yet"""
+        existing = set(self.collection.get(ids=[doc["id"] for doc in documents], include=[])["ids"])
+        rows = [row for row, doc in enumerate(documents) if doc["id"] not in existing]
+        if not rows:
+            return
+        kwargs = {}
+        if embeddings is not None:
+            kwargs["embeddings"] = [list(map(float, embeddings[row])) for row in rows]
+        self.collection.add(
+            ids=[documents[row]["id"] for row in rows],
+            documents=[documents[row]["content"] for row in rows],
+            metadatas=[document_metadata(documents[row]) for row in rows],
+            **kwargs
+        )
+    
+    def hybrid_search(self, query: str, embedding=None, n_results: int = 3) -> List[Dict]:
+        """BM25 and dense results fused by reciprocal rank"""
+        return self.hybrid.search(query, embedding, n_results)
+    
+    def search_similar_documents(self, query: str, n_results: int = 3) -> List[Dict]:
+        """Search for similar documents in the vector database"""
+        results = self.collection.query(query_texts=[query], n_results=n_results)
+        return self._format_results(results)
+    
+    def embed_query(self, query: str) -> List[float]:
+        return self.embeddings.encode_one(query).tolist()
+    
+    def search_by_embedding(self, embedding: List[float], n_results: int = 3) -> List[Dict]:
+        """Search with a query embedding computed by the caller"""
+        results = self.collection.query(query_embeddings=[embedding], n_results=n_results)
+        return self._format_results(results)
+    
+    @staticmethod
+    def _format_results(results) -> List[Dict]:
+        formatted_results = []
+        for i in range(len(results['ids'][0])):
+            formatted_results.append({
+                "id": results['ids'][0][i],
+                "content": results['documents'][0][i],
+                "metadata": results['metadatas'][0][i],
+                "distance": results['distances'][0][i] if 'distances' in results else None
+            })
+        return formatted_results
+    
+    def get_document_by_id(self, doc_id: str) -> Dict:
+        """Retrieve a specific document by ID"""
+        result = self.collection.get(ids=[doc_id])
+        if result['ids']:
+            return {
+                "id": result['ids'][0],
+                "content": result['documents'][0],
+                "metadata": result['metadatas'][0] if result['metadatas'] else None
+            }
+        return None
+    
+    def add_user_memory(self, user_id: int, text: str, metadata: Dict = None):
+        """Add a user memory to the vector database"""
+        if metadata is None:
+            metadata = {}
+        metadata["user_id"] = user_id
+        metadata["type"] = "memory"
+        metadata["timestamp"] = datetime.now().isoformat()
+        memory_id = f"mem_{user_id}_{int(datetime.now().timestamp())}"
+        self.collection.add(ids=[memory_id], documents=[text], metadatas=[metadata])
+    
+    def get_user_memory(self, user_id: int, query: str = None, n_results: int = 5) -> List[Dict]:
+        """Retrieve user memories"""
+        where_filter = {"user_id": user_id}
+        if query:
+            results = self.collection.query(query_texts=[query], n_results=n_results, where=where_filter)
             formatted_results = []
-            for i in range(len(results['ids'][0])):
-                formatted_results.append({
-                    "id": results['ids'][0][i],
-                    "content": results['documents'][0][i],
-                    "metadata": results['metadatas'][0][i],
-                    "distance": results['distances'][0][i] if 'distances' in results else None
-                })
+            if results['ids']:
+                for i in range(len(results['ids'][0])):
+                    formatted_results.append({
+                        "id": results['ids'][0][i],
+                        "content": results['documents'][0][i],
+                        "metadata": results['metadatas'][0][i],
+                        "distance": results['distances'][0][i] if 'distances' in results else None
+                    })
             return formatted_results
-        
-        def get_document_by_id(self, doc_id: str) -> Dict:
-            """Retrieve a specific document by ID"""
-            result = self.collection.get(ids=[doc_id])
-            if result['ids']:
-                return {
-                    "id": result['ids'][0],
-                    "content": result['documents'][0],
-                    "metadata": result['metadatas'][0] if result['metadatas'] else None
-                }
-            return None
-        
-        def add_user_memory(self, user_id: int, text: str, metadata: Dict = None):
-            """Add a user memory to the vector database"""
-            if metadata is None:
-                metadata = {}
-            metadata["user_id"] = user_id
-            metadata["type"] = "memory"
-            metadata["timestamp"] = datetime.now().isoformat()
-            memory_id = f"mem_{user_id}_{int(datetime.now().timestamp())}"
-            self.collection.add(ids=[memory_id], documents=[text], metadatas=[metadata])
-        
-        def get_user_memory(self, user_id: int, query: str = None, n_results: int = 5) -> List[Dict]:
-            """Retrieve user memories"""
-            where_filter = {"user_id": user_id}
-            if query:
-                results = self.collection.query(query_texts=[query], n_results=n_results, where=where_filter)
-                formatted_results = []
-                if results['ids']:
-                    for i in range(len(results['ids'][0])):
-                        formatted_results.append({
-                            "id": results['ids'][0][i],
-                            "content": results['documents'][0][i],
-                            "metadata": results['metadatas'][0][i],
-                            "distance": results['distances'][0][i] if 'distances' in results else None
-                        })
-                return formatted_results
-            return []
-    
-    vector_db = VectorDatabase()
+        return []
+
+def _create_vector_db():
+    """Chroma-backed database when chromadb is installed, otherwise the in-process index"""
+    try:
+        import chromadb
+        import sentence_transformers  # the real backend embeds with all-MiniLM-L6-v2
+    except ImportError as e:
+        print(f"Chromadb not available: {e}. Using mock vector database.")
+        return MockVectorDatabase()
+    db = VectorDatabase()
     print("Loaded real VectorDatabase with chromadb")
-except ImportError as e:
-    print(f"Chromadb not available: {e}. Using mock vector database.")
-    vector_db = MockVectorDatabase()
+    return db
+
+# Global instance, built on first use or by warmup()
+vector_db = lazy("vector_db", _create_vector_db)
@@ -0,0 +1,332 @@
+"""
+In-Process NumPy Vector Index
+Exact cosine top-k over a contiguous float32 matrix, persisted as memory-mapped .npy
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .knowledge_base import document_metadata
+except ImportError:
+    from knowledge_base import document_metadata
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    """
+    Dependency-free text embedder using the hashing trick
+
+    Words and character trigrams (so "worried" lands near "worry") are
+    hashed into ``dim`` signed buckets and the vector is L2-normalized.
+    Captures lexical overlap only, but is deterministic across processes and
+    needs no model download, which makes it suitable for offline and test
+    deployments.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str):
+        for word in _TOKEN.findall(text.lower()):
+            yield word, 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                sign = 1.0 if digest >> 63 else -1.0
+                matrix[row, digest % self.dim] += sign * weight
+        return normalize_rows(matrix)
+
+
+class SentenceTransformerEmbedder:
+    """Adapter giving a sentence-transformers model the embedder interface"""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", model=None):
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name)
+        self.model = model
+        self.dim = model.get_sentence_embedding_dimension()
+        self.name = f"sentence-transformers/{model_name}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(list(texts), convert_to_numpy=True, show_progress_bar=False)
+        return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+def default_embedder():
+    """
+    Embedder chosen by VECTOR_INDEX_EMBEDDER: "auto" (sentence-transformers
+    when installed, else hashing), "sentence-transformers" or "hashing"
+    """
+    choice = os.getenv("VECTOR_INDEX_EMBEDDER", "auto").lower()
+    if choice in ("auto", "sentence-transformers"):
+        try:
+            return SentenceTransformerEmbedder()
+        except Exception as e:
+            if choice != "auto":
+                raise
+            print(f"[VECTOR INDEX] sentence-transformers unavailable ({e}), using hashing embedder")
+    return HashingEmbedder()
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def documents_fingerprint(documents: List[Dict]) -> str:
+    """
+    Content hash of ``documents`` (ids, contents and metadata, in either
+    accepted shape); independent of their order
+    """
+    entries = []
+    for doc in documents:
+        metadata = {key: value for key, value in document_metadata(doc).items() if value is not None}
+        entries.append(json.dumps([doc["id"], doc["content"], metadata], sort_keys=True, default=str))
+    digest = hashlib.sha256()
+    for entry in sorted(entries):
+        digest.update(entry.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class _Snapshot(NamedTuple):
+    """Everything a search reads; replaced as a whole so readers never see a half-applied write"""
+    vectors: np.ndarray
+    ids: np.ndarray
+    contents: np.ndarray
+    columns: Dict[str, np.ndarray]
+    rows: Dict[str, int]  # id -> row
+
+
+class NumpyVectorIndex:
+    """
+    Exact cosine-similarity index held in one contiguous float32 matrix
+
+    Rows are L2-normalized, so a query is a single matrix-vector product
+    followed by ``argpartition`` for the top k; only those k are sorted.
+    Ids, contents and each metadata field are stored as columns (one array
+    per field) and turned back into dicts only for returned hits.
+
+    ``save`` writes ``vectors.npy`` plus a JSON sidecar headed by the
+    content hash of the documents; ``load`` maps the matrix read-only with
+    ``mmap_mode="r"`` so several workers share the page cache instead of
+    holding private copies.
+
+    Exposes the same search_similar_documents / get_document_by_id
+    interface as the Chroma-backed VectorDatabase.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    META_FILE = "metadata.json"
+
+    def __init__(self, embedder=None):
+        self.embedder = embedder or default_embedder()
+        self._snapshot = _Snapshot(
+            vectors=np.zeros((0, self.embedder.dim), dtype=np.float32),
+            ids=np.array([], dtype=object),
+            contents=np.array([], dtype=object),
+            columns={},
+            rows={}
+        )
+        self._write_lock = threading.Lock()
+        # documents_fingerprint of the contents as last saved or loaded (None after unsaved writes)
+        self.fingerprint: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids)
+
+    def add_documents(self, documents: List[Dict]):
+        """
+        Insert or replace documents. Accepts the knowledge-base shape
+        ({"id", "content", "category", "severity"}) or {"id", "content", "metadata"}.
+        """
+        if not documents:
+            return
+        vectors = self.embedder.encode([doc["content"] for doc in documents])
+        with self._write_lock:
+            snap = self._snapshot
+            matrix = np.array(snap.vectors, dtype=np.float32)
+            ids = list(snap.ids)
+            contents = list(snap.contents)
+            columns = {name: list(values) for name, values in snap.columns.items()}
+            rows = dict(snap.rows)
+
+            new_rows = []
+            for doc, vector in zip(documents, vectors):
+                metadata = document_metadata(doc)
+                row = rows.get(doc["id"])
+                if row is None:
+                    row = len(ids)
+                    rows[doc["id"]] = row
+                    ids.append(doc["id"])
+                    contents.append(doc["content"])
+                    for values in columns.values():
+                        values.append(None)
+                    new_rows.append(vector)
+                else:
+                    contents[row] = doc["content"]
+                    if row < len(matrix):
+                        matrix[row] = vector
+                    else:
+                        new_rows[row - len(matrix)] = vector
+                for key, value in metadata.items():
+                    column = columns.setdefault(key, [None] * len(ids))
+                    column[row] = value
+                for key, column in columns.items():
+                    if key not in metadata:
+                        column[row] = None
+
+            if new_rows:
+                matrix = np.vstack([matrix, np.asarray(new_rows, dtype=np.float32)])
+            self._snapshot = _Snapshot(
+                vectors=np.ascontiguousarray(matrix),
+                ids=_object_array(ids),
+                contents=_object_array(contents),
+                columns={name: _object_array(values) for name, values in columns.items()},
+                rows=rows
+            )
+            self.fingerprint = None
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embedder.encode([query])[0]
+
+    def search_by_embedding(self, embedding, n_results: int = 3) -> List[Dict]:
+        """Top-k by cosine similarity; ``distance`` is 1 - similarity"""
+        snap = self._snapshot
+        count = len(snap.ids)
+        if count == 0 or n_results <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = snap.vectors @ query
+        k = min(n_results, count)
+        if k < count:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        return [self._document(snap, row, 1.0 - float(scores[row])) for row in top]
+
+    def search_similar_documents(self, query: str, n_results: int = 3) -> List[Dict]:
+        """Search for similar documents in the index"""
+        return self.search_by_embedding(self.embed_query(query), n_results)
+
+    def get_document_by_id(self, doc_id: str) -> Optional[Dict]:
+        """Retrieve a specific document by ID"""
+        snap = self._snapshot
+        row = snap.rows.get(doc_id)
+        if row is None:
+            return None
+        document = self._document(snap, row)
+        document.pop("distance")
+        return document
+
+    def batches(self, batch_size: int = 512) -> Iterator[Tuple[List[str], List[str], List[Dict], np.ndarray]]:
+        """(ids, contents, metadatas, vectors) in slices of one consistent snapshot, for loading into another store"""
+        snap = self._snapshot
+        for start in range(0, len(snap.ids), batch_size):
+            stop = min(start + batch_size, len(snap.ids))
+            yield (
+                list(snap.ids[start:stop]),
+                list(snap.contents[start:stop]),
+                [self._document(snap, row)["metadata"] for row in range(start, stop)],
+                np.asarray(snap.vectors[start:stop])
+            )
+
+    @staticmethod
+    def _document(snap: _Snapshot, row: int, distance: Optional[float] = None) -> Dict[str, Any]:
+        metadata = {name: values[row] for name, values in snap.columns.items() if values[row] is not None}
+        return {
+            "id": snap.ids[row],
+            "content": snap.contents[row],
+            "metadata": metadata,
+            "distance": distance
+        }
+
+    def save(self, directory: str):
+        """Persist as vectors.npy + metadata.json (written to temp files, then renamed)"""
+        os.makedirs(directory, exist_ok=True)
+        snap = self._snapshot
+        fingerprint = documents_fingerprint([self._document(snap, row) for row in range(len(snap.ids))])
+        vectors_path = os.path.join(directory, self.VECTORS_FILE)
+        meta_path = os.path.join(directory, self.META_FILE)
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(snap.vectors))
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": fingerprint,
+                "embedder": self.embedder.name,
+                "dim": self.embedder.dim,
+                "ids": list(snap.ids),
+                "contents": list(snap.contents),
+                "columns": {name: list(values) for name, values in snap.columns.items()}
+            }, f)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        if snap is self._snapshot:
+            self.fingerprint = fingerprint
+
+    @classmethod
+    def load(cls, directory: str, embedder=None, mmap: bool = True) -> "NumpyVectorIndex":
+        """Open a saved index; raises ValueError if it was built with a different embedder"""
+        index = cls(embedder)
+        with open(os.path.join(directory, cls.META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["embedder"] != index.embedder.name or meta["dim"] != index.embedder.dim:
+            raise ValueError(f"Index at {directory} was built with {meta['embedder']}, not {index.embedder.name}")
+        vectors = np.load(os.path.join(directory, cls.VECTORS_FILE), mmap_mode="r" if mmap else None)
+        index._snapshot = _Snapshot(
+            vectors=vectors,
+            ids=_object_array(meta["ids"]),
+            contents=_object_array(meta["contents"]),
+            columns={name: _object_array(values) for name, values in meta["columns"].items()},
+            rows={doc_id: row for row, doc_id in enumerate(meta["ids"])}
+        )
+        index.fingerprint = meta.get("fingerprint")
+        return index
+
+    @classmethod
+    def open_or_build(cls, directory: Optional[str], documents: List[Dict], embedder=None) -> "NumpyVectorIndex":
+        """
+        Load the index saved at ``directory`` if its header fingerprint matches
+        ``documents`` (contents and metadata) and it used the same embedder;
+        otherwise build it and save it there
+        """
+        embedder = embedder or default_embedder()
+        if directory and os.path.exists(os.path.join(directory, cls.META_FILE)):
+            try:
+                index = cls.load(directory, embedder)
+                if index.fingerprint == documents_fingerprint(documents):
+                    return index
+            except Exception as e:
+                print(f"[VECTOR INDEX] Rebuilding index at {directory}: {e}")
+        index = cls(embedder)
+        index.add_documents(documents)
+        if directory:
+            try:
+                index.save(directory)
+            except OSError as e:
+                print(f"[VECTOR INDEX] Could not persist index to {directory}: {e}")
+        return index
+
+
+def _object_array(values: List[Any]) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
@@ -15,12 +15,22 @@ import voice_analyzer
 from models import VoiceAnalysisResult, VoiceAnalysisResponse
 from voice_analyzer import analyzer
 from shared.mongodb import voice_collection, fix_id
+from shared.cache import cache_result
+from shared.inference_executor import InferenceExecutor, InferenceSaturatedError, saturated_exception
+from shared.lazy import add_readiness_endpoint
+from shared.monitoring import add_metrics_endpoint
+from shared.rate_limiter import RateLimitPolicy, add_rate_limiting
 
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(title="Voice Analysis Service (MongoDB)", version="3.0.0")
 
+# Per-user limits (before CORS so preflights skip them); each clip is a full model pass
+add_rate_limiting(app, service="voice", route_policies={
+    "/v1/analyze/voice": RateLimitPolicy(20, 60, algorithm="token_bucket", burst=5)
+})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,8 +39,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing and Prometheus metrics at /metrics
+add_metrics_endpoint(app)
+
+# Models load in the background after startup; /ready reports when they are warm
+add_readiness_endpoint(app, ["voice_analyzer"])
+
 router = APIRouter()
 
+# Model calls run on a bounded pool so the event loop stays responsive
+inference_executor = InferenceExecutor.from_env("voice")
+
 @router.post("/analyze/voice", response_model=VoiceAnalysisResponse)
 async def analyze_voice(
     user_id: str = Form(...),
@@ -41,7 +60,7 @@ async def analyze_voice(
     """
     try:
         audio_data = await audio_file.read()
-        voice_label, voice_score, confidence = analyzer.analyze_stress(audio_data)
+        voice_label, voice_score, confidence = await inference_executor.run(analyzer.method("analyze_stress"), audio_data)
         
         # Save to MongoDB
         doc = {
@@ -68,11 +87,14 @@ async def analyze_voice(
             result=analysis_result,
             message="Voice analysis completed successfully"
         )
+    except InferenceSaturatedError as e:
+        raise saturated_exception(e)
     except Exception as e:
         print(f"Error saving voice analysis: {e}")
         raise HTTPException(status_code=500, detail=f"Voice analysis failed: {str(e)}")
 
 @router.get("/analyze/voice/history")
+@cache_result(ttl_seconds=int(os.getenv("HISTORY_CACHE_TTL", "5")))
 async def get_voice_history(user_id: str, days: int = 30):
     """
     Get voice analysis history for a user from MongoDB
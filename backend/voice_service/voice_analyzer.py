@@ -10,14 +10,22 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-try:
-    from ai_models.voice.inference.voice_analyzer import VoiceAnalyzer as SharedVoiceAnalyzer
-except ImportError as e:
-    print(f"Warning: Could not import shared VoiceAnalyzer: {e}")
-    SharedVoiceAnalyzer = None
+sys.path.append(os.path.dirname(current_dir))
+
+from shared.lazy import lazy
+
+def _load_shared_analyzer():
+    """Import the shared model wrapper on first construction"""
+    try:
+        from ai_models.voice.inference.voice_analyzer import VoiceAnalyzer
+        return VoiceAnalyzer
+    except ImportError as e:
+        print(f"Warning: Could not import shared VoiceAnalyzer: {e}")
+        return None
 
 class VoiceStressAnalyzer:
     def __init__(self):
+        SharedVoiceAnalyzer = _load_shared_analyzer()
         if SharedVoiceAnalyzer:
             self.analyzer = SharedVoiceAnalyzer()
         else:
@@ -80,5 +88,5 @@ class VoiceStressAnalyzer:
         
         return stress_label, stress_score, confidence
 
-# Global instance
-analyzer = VoiceStressAnalyzer()
\ No newline at end of file
+# Global instance, built on first use or by warmup()
+analyzer = lazy("voice_analyzer", VoiceStressAnalyzer)
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Benchmark Face Inference Engines
+Latency and accuracy parity of the face CNN across keras-predict, keras, tflite, onnx and numpy
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_models.face.model.inference_engine import (
+    ENGINES, NumpyEngine, create_engine, export_onnx, export_tflite
+)
+
+
+def load_model(model_path):
+    from ai_models.face.model.emotion_cnn import EmotionCNN
+    cnn = EmotionCNN(model_path)
+    if cnn.model is None:
+        raise SystemExit("TensorFlow is required to build or load the Keras model")
+    return cnn.model
+
+
+def build_engines(model, workdir, kinds, numpy_weights=None):
+    """Create each requested engine, exporting the model where the engine needs a file"""
+    engines = {}
+    for kind in kinds:
+        try:
+            path = None
+            if kind == "onnx":
+                path = export_onnx(model, os.path.join(workdir, "face_model.onnx"))
+            elif kind == "tflite" and model is not None:
+                path = export_tflite(model, os.path.join(workdir, "face_model.tflite"))
+            elif kind == "numpy":
+                path = numpy_weights or NumpyEngine.from_keras(model).save(os.path.join(workdir, "face_model.npz"))
+            engines[kind] = create_engine(kind, model=model, path=path)
+        except Exception as e:
+            print(f"  skipping {kind}: {e}")
+    return engines
+
+
+def time_engine(engine, batch, repeats):
+    engine.predict(batch)  # warm up (tracing, tensor allocation)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine.predict(batch)
+        timings.append(1000 * (time.perf_counter() - start))
+    return np.percentile(timings, 50), np.percentile(timings, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", help="trained Keras model (.h5/.keras); random weights if omitted")
+    parser.add_argument("--numpy-weights", help="exported .npz for the numpy engine (runs without TensorFlow)")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.engines.split(",") if kind.strip()]
+    model = None if args.numpy_weights and kinds == ["numpy"] else load_model(args.model)
+    rng = np.random.default_rng(0)
+    parity_batch = rng.uniform(0, 1, size=(256, 48, 48, 1)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engines = build_engines(model, workdir, kinds, args.numpy_weights)
+        if not engines:
+            raise SystemExit("No engine could be created")
+        reference_kind = "keras-predict" if "keras-predict" in engines else next(iter(engines))
+        reference = engines[reference_kind].predict(parity_batch)
+
+        print("=" * 78)
+        print(f"Parity against {reference_kind} on {len(parity_batch)} inputs")
+        print("=" * 78)
+        print(f"{'engine':<16}{'max |diff|':>14}{'top-1 agreement':>18}")
+        for kind, engine in engines.items():
+            output = engine.predict(parity_batch)
+            agreement = float(np.mean(output.argmax(axis=1) == reference.argmax(axis=1)))
+            print(f"{kind:<16}{float(np.abs(output - reference).max()):>14.2e}{agreement:>18.3f}")
+
+        print("\n" + "=" * 78)
+        print("Latency per call (ms)")
+        print("=" * 78)
+        print(f"{'engine':<16}{'batch':>8}{'p50':>10}{'p95':>10}{'ms/face':>10}")
+        for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+            batch = parity_batch[:batch_size]
+            for kind, engine in engines.items():
+                p50, p95 = time_engine(engine, batch, args.repeats)
+                print(f"{kind:<16}{batch_size:>8}{p50:>10.2f}{p95:>10.2f}{p50 / batch_size:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark Quantized User Memory
+Recall, memory and latency of int8 user-memory storage against full float32
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from text_service.user_memory_index import UserMemoryIndex
+
+
+def clustered_vectors(count: int, dim: int, clusters: int, spread: float, seed: int) -> np.ndarray:
+    """Unit vectors grouped around topics, like embeddings of real conversations"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    noise = rng.normal(size=(count, dim)).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    vectors = centers[rng.integers(0, clusters, count)] + spread * noise
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run(index: UserMemoryIndex, queries: np.ndarray, truth, k: int):
+    found = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        found += len(expected & {hit["id"] for hit in index.search("user", query, k=k)})
+    elapsed = time.perf_counter() - start
+    return found / (len(queries) * k), 1000 * elapsed / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memories", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384, help="384 = all-MiniLM-L6-v2")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.6)
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.memories, args.dim, args.clusters, args.spread, seed=0)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, args.memories, args.queries)] + 0.1 * clustered_vectors(
+        args.queries, args.dim, args.clusters, 1.0, seed=2)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [{f"m{i}" for i in np.argsort(-(vectors @ query))[:args.k]} for query in queries]
+    items = [(f"m{i}", "", {}) for i in range(args.memories)]
+
+    print("=" * 72)
+    print(f"{args.memories} memories x {args.dim} dims, recall@{args.k} over {args.queries} queries")
+    print("=" * 72)
+    print(f"{'storage':<28}{'recall':>10}{'ms/query':>12}{'resident MB':>14}")
+    # IVF is disabled so the numbers isolate the effect of quantization
+    configs = [("float32", False, 0), ("int8, no re-rank", True, 0),
+               ("int8, re-rank 2k", True, 2), ("int8, re-rank 4k", True, 4), ("int8, re-rank 10k", True, 10)]
+    for name, quantize, rerank in configs:
+        with tempfile.TemporaryDirectory() as directory:
+            index = UserMemoryIndex(args.dim, directory=directory, max_resident_vectors=args.memories * 2,
+                                    ivf_threshold=args.memories + 1, quantize=quantize, rerank=rerank)
+            index.add_many("user", items, vectors)
+            index.flush()
+            recall, latency = run(index, queries, truth, args.k)
+            megabytes = index.stats()["resident_bytes"] / 2 ** 20
+            print(f"{name:<28}{recall:>10.3f}{latency:>12.2f}{megabytes:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Evaluate Downscaled Face Detection
+Cascade detection cost and accuracy at full resolution vs a bounded working resolution
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_models.face.model.face_detection import DetectionConfig, detect_faces
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "test")
+
+
+def load_labels(path, width, height):
+    """YOLO labels (class + box, or class + polygon) as pixel (x, y, w, h) boxes"""
+    boxes = []
+    if not os.path.exists(path):
+        return np.zeros((0, 4))
+    with open(path) as f:
+        for line in f:
+            values = [float(v) for v in line.split()[1:]]
+            if len(values) == 4:
+                cx, cy, w, h = values
+                boxes.append([(cx - w / 2) * width, (cy - h / 2) * height, w * width, h * height])
+            elif len(values) >= 6:
+                points = np.array(values).reshape(-1, 2) * [width, height]
+                (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+                boxes.append([x0, y0, x1 - x0, y1 - y0])
+    return np.array(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def iou(a, b):
+    """Pairwise IoU of (x, y, w, h) boxes: (len(a), len(b))"""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y1 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def match(predicted, truth, threshold):
+    """Greedy one-to-one matching; returns the number of matched pairs"""
+    if len(predicted) == 0 or len(truth) == 0:
+        return 0
+    overlaps = iou(predicted, truth)
+    matched = 0
+    while overlaps.size and overlaps.max() >= threshold:
+        i, j = np.unravel_index(overlaps.argmax(), overlaps.shape)
+        overlaps[i, :] = -1
+        overlaps[:, j] = -1
+        matched += 1
+    return matched
+
+
+def load_frames(data_dir, frame_side, limit):
+    """Test images (grayscale) resized so the longer side is ``frame_side``, with their label boxes"""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "images", "*")))[:limit or None]:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        if frame_side:
+            scale = frame_side / float(max(gray.shape))
+            gray = cv2.resize(gray, (int(round(gray.shape[1] * scale)), int(round(gray.shape[0] * scale))),
+                              interpolation=cv2.INTER_CUBIC)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        labels = load_labels(os.path.join(data_dir, "labels", stem + ".txt"), gray.shape[1], gray.shape[0])
+        frames.append((gray, labels))
+    return frames
+
+
+def run(cascade, frames, config, repeats):
+    """Median detection time per frame (ms) and the boxes found in each"""
+    timings, detections = [], []
+    for gray, _ in frames:
+        per_frame = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            boxes = detect_faces(cascade, gray, config)
+            per_frame.append(1000 * (time.perf_counter() - start))
+        timings.append(np.median(per_frame))
+        detections.append(boxes)
+    return np.array(timings), detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="directory with images/ and labels/")
+    parser.add_argument("--frame-side", type=int, default=4000,
+                        help="upscale test images to this longer side (4000 ~ a 12MP phone frame, 0 keeps them)")
+    parser.add_argument("--max-side", type=int, default=DetectionConfig.from_env().max_side,
+                        help="working resolution of the downscaled pipeline")
+    parser.add_argument("--limit", type=int, default=0, help="evaluate only the first N images")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--iou", type=float, default=0.3, help="IoU needed for a detection to count as a match")
+    args = parser.parse_args()
+
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    frames = load_frames(args.data, args.frame_side, args.limit)
+    if not frames:
+        raise SystemExit(f"No images found under {args.data}/images")
+    base = DetectionConfig.from_env()
+    configs = {
+        "full-resolution": DetectionConfig(0, base.scale_factor, base.min_neighbors, base.min_size, base.max_size),
+        f"max-side {args.max_side}": DetectionConfig(args.max_side, base.scale_factor, base.min_neighbors,
+                                                     base.min_size, base.max_size),
+    }
+
+    shape = frames[0][0].shape
+    truth_count = sum(len(labels) for _, labels in frames)
+    print("=" * 78)
+    print(f"{len(frames)} frames of {shape[1]}x{shape[0]}, {truth_count} labelled regions")
+    print("=" * 78)
+    print(f"{'pipeline':<20}{'p50 ms':>10}{'p95 ms':>10}{'faces':>8}{'precision':>11}{'recall':>9}")
+    results = {}
+    for name, config in configs.items():
+        timings, detections = run(cascade, frames, config, args.repeats)
+        results[name] = (timings, detections)
+        found = sum(len(boxes) for boxes in detections)
+        matched = sum(match(boxes, labels, args.iou) for boxes, (_, labels) in zip(detections, frames))
+        precision = matched / found if found else 0.0
+        recall = matched / truth_count if truth_count else 0.0
+        print(f"{name:<20}{np.percentile(timings, 50):>10.1f}{np.percentile(timings, 95):>10.1f}"
+              f"{found:>8}{precision:>11.3f}{recall:>9.3f}")
+
+    (full_times, full_boxes), (small_times, small_boxes) = results.values()
+    agreed = sum(match(a, b, 0.5) for a, b in zip(small_boxes, full_boxes))
+    total = sum(len(boxes) for boxes in full_boxes)
+    print(f"\nSpeed-up (median): {np.median(full_times) / max(np.median(small_times), 1e-9):.1f}x")
+    if total:
+        print(f"Full-resolution faces also found downscaled (IoU >= 0.5): {agreed}/{total} ({agreed / total:.1%})")
+
+
+if __name__ == "__main__":
+    main()